@@ -0,0 +1,227 @@
+"""Content-hashed console assets with precompressed variants.
+
+``python -m app.assets`` builds ``app/static/dist``: every top-level ``.css``,
+``.js`` and ``.html`` file is copied under a content-hashed name next to its
+``.gz`` (and ``.br`` when the optional ``brotli`` package is installed)
+variants, HTML references to ``static/<name>`` are rewritten to the hashed
+copies, and ``manifest.json`` records the result.
+
+Hashed URLs are served with an immutable ``Cache-Control``; the original names
+(page routes, unhashed ``/static`` URLs) revalidate with ``ETag`` and get 304
+when unchanged. Without a build, callers fall back to the raw files.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_NAME = "manifest.json"
+DIST_PREFIX = "dist/"
+
+# Console assets sit behind the admin login, so shared caches must not keep them.
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+_ASSET_SUFFIXES = {".css", ".js", ".html"}
+# Preference order when the client accepts several encodings.
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_HASH_LENGTH = 12
+
+
+# Build
+def _compress_variants(path: Path, data: bytes) -> List[str]:
+    encodings = []
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            path.with_name(f"{path.name}.br").write_bytes(compressed)
+            encodings.append("br")
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        path.with_name(f"{path.name}.gz").write_bytes(compressed)
+        encodings.append("gzip")
+    return encodings
+
+
+def _rewrite_static_refs(text: str, files: Dict[str, Dict[str, Any]]) -> Tuple[str, List[str]]:
+    """Point ``static/<name>`` references at the hashed copies; also returns the names."""
+    refs = []
+    for name, entry in files.items():
+        hashed = f"static/{DIST_PREFIX}{entry['file']}"
+        for quote in ('"', "'"):
+            reference = f"{quote}static/{name}{quote}"
+            if reference in text:
+                text = text.replace(reference, f"{quote}{hashed}{quote}")
+                if name not in refs:
+                    refs.append(name)
+    return text, refs
+
+
+def build_assets(static_dir: Path = STATIC_DIR, dist_dir: Path = DIST_DIR) -> Dict[str, Any]:
+    """Rebuild ``dist_dir`` from ``static_dir`` and return the manifest."""
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+    dist_dir.mkdir(parents=True)
+    sources = sorted(
+        path
+        for path in static_dir.iterdir()
+        if path.is_file() and path.suffix in _ASSET_SUFFIXES
+    )
+    files: Dict[str, Dict[str, Any]] = {}
+    # Pages last, so their references resolve to already hashed assets.
+    for source in sorted(sources, key=lambda path: path.suffix == ".html"):
+        data = source.read_bytes()
+        refs: List[str] = []
+        if source.suffix == ".html":
+            text, refs = _rewrite_static_refs(data.decode("utf-8"), files)
+            data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()[:_HASH_LENGTH]
+        target = dist_dir / f"{source.stem}.{digest}{source.suffix}"
+        target.write_bytes(data)
+        files[source.name] = {
+            "file": target.name,
+            "hash": digest,
+            "encodings": _compress_variants(target, data),
+            "refs": refs,
+        }
+    manifest = {"files": files}
+    (dist_dir / MANIFEST_NAME).write_text(
+        json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8"
+    )
+    invalidate_manifest()
+    return manifest
+
+
+# Manifest
+_manifest_lock = threading.Lock()
+_manifest: Optional[Dict[str, Dict[str, Any]]] = None
+_manifest_by_file: Dict[str, str] = {}
+_manifest_mtime = 0.0
+
+
+def invalidate_manifest() -> None:
+    global _manifest
+    with _manifest_lock:
+        _manifest = None
+
+
+def _load_manifest() -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str], float]:
+    global _manifest, _manifest_by_file, _manifest_mtime
+    with _manifest_lock:
+        if _manifest is None:
+            path = DIST_DIR / MANIFEST_NAME
+            try:
+                files = json.loads(path.read_text(encoding="utf-8"))["files"]
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                files, mtime = {}, 0.0
+            except (ValueError, KeyError):
+                logger.warning("ignoring unreadable asset manifest %s", path)
+                files, mtime = {}, 0.0
+            _manifest = files
+            _manifest_by_file = {entry["file"]: name for name, entry in files.items()}
+            _manifest_mtime = mtime
+        return _manifest, _manifest_by_file, _manifest_mtime
+
+
+def _source_is_newer(name: str, built_at: float) -> bool:
+    try:
+        return (STATIC_DIR / name).stat().st_mtime > built_at
+    except OSError:
+        return False
+
+
+def _build_is_stale(name: str, files: Dict[str, Dict[str, Any]], built_at: float) -> bool:
+    """Whether ``name`` or an asset its built copy references changed since the build.
+
+    A page whose script changed must not be served: it would load the old
+    hashed script, which clients cache as immutable. Pages from manifests
+    without ``refs`` are checked against every built asset.
+    """
+    refs = files[name].get("refs", list(files) if name.endswith(".html") else [])
+    return any(_source_is_newer(source, built_at) for source in [name, *refs])
+
+
+# Serving
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        params = params.replace(" ", "").lower()
+        if params.startswith("q=") and params[2:] in {"0", "0.0", "0.00", "0.000"}:
+            continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def _negotiate(request: Request, encodings: List[str]) -> Tuple[Optional[str], str]:
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    for encoding, suffix in _ENCODINGS:
+        if encoding in encodings and encoding in accepted:
+            return encoding, suffix
+    return None, ""
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def asset_response(request: Request, name: str) -> Optional[Response]:
+    """Serve built asset ``name`` (relative to ``app/static``), or ``None``.
+
+    ``None`` means the asset is not in the build, or its source (or, for a
+    page, an asset it references) changed since the build ran, and the caller
+    should serve the raw file instead.
+    """
+    files, by_file, built_at = _load_manifest()
+    if name.startswith(DIST_PREFIX):
+        source = by_file.get(name[len(DIST_PREFIX):])
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        source = name if name in files and not _build_is_stale(name, files, built_at) else None
+        cache_control = REVALIDATE_CACHE_CONTROL
+    if source is None:
+        return None
+    entry = files[source]
+    encoding, suffix = _negotiate(request, entry["encodings"])
+    etag = f'"{entry["hash"]}-{encoding}"' if encoding else f'"{entry["hash"]}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    media_type = mimetypes.guess_type(source)[0] or "application/octet-stream"
+    return FileResponse(DIST_DIR / f"{entry['file']}{suffix}", media_type=media_type, headers=headers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    built = build_assets()["files"]
+    logger.info("built %d assets into %s (brotli: %s)", len(built), DIST_DIR, brotli is not None)
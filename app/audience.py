@@ -0,0 +1,275 @@
+"""Marketing campaign audience snapshots and journey state.
+
+The first dispatch of a campaign copies its segment into ``campaign_audience``
+with one ``INSERT … SELECT``; from then on membership is fixed. Each row is the
+customer's position in the journey: the ``order_no`` of the last step it went
+through and ``next_run_at``, when the following step is due (``NULL`` once the
+journey is over). Ticks read only the due rows, through the
+``(campaign_id, next_run_at, customer_id)`` index, so a long drip campaign
+costs O(due) per tick rather than O(audience).
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, case, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    CampaignAudience,
+    CampaignStep,
+    CampaignStepExecution,
+    Customer,
+    MarketingCampaign,
+    MarketingCustomerState,
+    Message,
+)
+from app.segments import segment_filters
+from app.utils import deserialize_json_dict, deserialize_json_list
+
+# (customer id, status, message id) for one customer's outcome of a step
+AudienceOutcome = Tuple[int, Optional[str], Optional[int]]
+
+
+def materialize_audience(
+    db: Session, campaign: MarketingCampaign, first_run_at: datetime, now: datetime
+) -> int:
+    """Snapshot the campaign's current segment; returns the audience size and commits.
+
+    Every member is due for the first step at ``first_run_at``.
+    """
+    filters = segment_filters(
+        deserialize_json_dict(campaign.filter_rules),
+        deserialize_json_list(campaign.target_customer_ids),
+    )
+    segment = select(
+        literal(campaign.id),
+        Customer.id,
+        literal(0),
+        literal(first_run_at),
+        literal(now),
+        literal(now),
+    ).where(*filters)
+    db.query(CampaignAudience).filter(
+        CampaignAudience.campaign_id == campaign.id
+    ).delete(synchronize_session=False)
+    db.execute(
+        CampaignAudience.__table__.insert().from_select(
+            ["campaign_id", "customer_id", "step_order", "next_run_at", "created_at", "updated_at"],
+            segment,
+        )
+    )
+    size = (
+        db.query(func.count(CampaignAudience.id))
+        .filter(CampaignAudience.campaign_id == campaign.id)
+        .scalar()
+    )
+    campaign.audience_size = size
+    campaign.audience_built_at = now
+    db.add(campaign)
+    db.commit()
+    return size
+
+
+def next_step(steps: Sequence[CampaignStep], step_order: int) -> Optional[CampaignStep]:
+    """The first of ``steps`` (sorted by ``order_no``) after ``step_order``."""
+    for step in steps:
+        if step.order_no > step_order:
+            return step
+    return None
+
+
+def due_after(steps: Sequence[CampaignStep], step_order: int, at: datetime) -> Optional[datetime]:
+    """When the step after ``step_order`` is due, for a step taken ``at``."""
+    following = next_step(steps, step_order)
+    if following is None:
+        return None
+    return at + timedelta(days=following.delay_days or 0)
+
+
+def resume_from_executions(
+    db: Session, campaign_id: int, steps: Sequence[CampaignStep]
+) -> None:
+    """Position a fresh snapshot after the steps its members already executed; commits.
+
+    Covers campaigns that ran before snapshots existed and executions recorded
+    through the API.
+    """
+    history = (
+        db.query(
+            CampaignStepExecution.customer_id,
+            func.max(CampaignStep.order_no),
+            func.max(CampaignStepExecution.created_at),
+        )
+        .join(CampaignStep, CampaignStep.id == CampaignStepExecution.step_id)
+        .filter(CampaignStepExecution.campaign_id == campaign_id)
+        .group_by(CampaignStepExecution.customer_id)
+        .all()
+    )
+    if not history:
+        return
+    step_ids = {step.order_no: step.id for step in steps}
+    table = CampaignAudience.__table__
+    db.execute(
+        update(table)
+        .where(
+            table.c.campaign_id == campaign_id,
+            table.c.customer_id == bindparam("b_customer_id"),
+        )
+        .values(
+            step_order=bindparam("b_step_order"),
+            last_step_id=bindparam("b_last_step_id"),
+            last_message_at=bindparam("b_last_message_at"),
+            next_run_at=bindparam("b_next_run_at"),
+        ),
+        [
+            {
+                "b_customer_id": customer_id,
+                "b_step_order": step_order,
+                "b_last_step_id": step_ids.get(step_order),
+                "b_last_message_at": executed_at,
+                "b_next_run_at": due_after(steps, step_order, executed_at),
+            }
+            for customer_id, step_order, executed_at in history
+        ],
+    )
+    db.commit()
+
+
+def _paused_customers(campaign_id: int):
+    return select(MarketingCustomerState.customer_id).where(
+        MarketingCustomerState.campaign_id == campaign_id,
+        MarketingCustomerState.status == "PAUSED",
+    )
+
+
+def has_active_audience(db: Session, campaign_id: int) -> bool:
+    """Whether any audience member is not paused."""
+    return (
+        db.query(CampaignAudience.id)
+        .filter(
+            CampaignAudience.campaign_id == campaign_id,
+            ~CampaignAudience.customer_id.in_(_paused_customers(campaign_id)),
+        )
+        .first()
+        is not None
+    )
+
+
+def has_pending_audience(db: Session, campaign_id: int) -> bool:
+    """Whether any unpaused member still has a step ahead of it."""
+    return (
+        db.query(CampaignAudience.id)
+        .filter(
+            CampaignAudience.campaign_id == campaign_id,
+            CampaignAudience.next_run_at.isnot(None),
+            ~CampaignAudience.customer_id.in_(_paused_customers(campaign_id)),
+        )
+        .first()
+        is not None
+    )
+
+
+def due_audience(
+    db: Session, campaign_id: int, now: datetime, limit: int
+) -> List[Tuple[int, int]]:
+    """Up to ``limit`` unpaused ``(customer_id, step_order)`` pairs due by ``now``, oldest first."""
+    return [
+        (customer_id, step_order)
+        for customer_id, step_order in db.query(
+            CampaignAudience.customer_id, CampaignAudience.step_order
+        )
+        .filter(
+            CampaignAudience.campaign_id == campaign_id,
+            CampaignAudience.next_run_at <= now,
+            ~CampaignAudience.customer_id.in_(_paused_customers(campaign_id)),
+        )
+        .order_by(CampaignAudience.next_run_at, CampaignAudience.customer_id)
+        .limit(limit)
+    ]
+
+
+def finish_audience(db: Session, campaign_id: int, customer_ids: Sequence[int]) -> None:
+    """End the journey of customers with no step left; the caller commits."""
+    if not customer_ids:
+        return
+    db.query(CampaignAudience).filter(
+        CampaignAudience.campaign_id == campaign_id,
+        CampaignAudience.customer_id.in_(list(customer_ids)),
+    ).update(
+        {CampaignAudience.next_run_at: None, CampaignAudience.updated_at: datetime.utcnow()},
+        synchronize_session=False,
+    )
+
+
+def advance_audience(
+    db: Session,
+    campaign_id: int,
+    step: CampaignStep,
+    outcomes: Sequence[AudienceOutcome],
+    now: datetime,
+    next_run_at: Optional[datetime],
+) -> None:
+    """Record that ``step`` was taken by each customer; the caller commits.
+
+    Outcomes without a message keep the customer's last message, step and time.
+    Only they get a step execution here: sent messages get theirs from the
+    batch sender, on their final attempt.
+    """
+    if not outcomes:
+        return
+    table = CampaignAudience.__table__
+    message_id = bindparam("b_message_id")
+    no_message = message_id.is_(None)
+    db.execute(
+        update(table)
+        .where(
+            table.c.campaign_id == campaign_id,
+            table.c.customer_id == bindparam("b_customer_id"),
+        )
+        .values(
+            step_order=step.order_no,
+            last_step_id=case((no_message, table.c.last_step_id), else_=step.id),
+            status=bindparam("b_status"),
+            message_id=case((no_message, table.c.message_id), else_=message_id),
+            last_message_at=case((no_message, table.c.last_message_at), else_=now),
+            next_run_at=next_run_at,
+            updated_at=now,
+        ),
+        [
+            {"b_customer_id": customer_id, "b_status": status, "b_message_id": message_id}
+            for customer_id, status, message_id in outcomes
+        ],
+    )
+    db.add_all(
+        [
+            CampaignStepExecution(
+                campaign_id=campaign_id,
+                step_id=step.id,
+                customer_id=customer_id,
+                channel=step.channel,
+                status=status or "skipped",
+                message_id=message_id,
+                created_at=now,
+                updated_at=now,
+            )
+            for customer_id, status, message_id in outcomes
+            if message_id is None
+        ]
+    )
+
+
+def audience_progress(
+    db: Session, campaign_id: int
+) -> List[Tuple[CampaignAudience, Optional[Customer], Optional[str]]]:
+    """Audience rows sent at least one message, with the message's current status."""
+    return (
+        db.query(CampaignAudience, Customer, Message.status)
+        .outerjoin(Customer, Customer.id == CampaignAudience.customer_id)
+        .outerjoin(Message, Message.id == CampaignAudience.message_id)
+        .filter(
+            CampaignAudience.campaign_id == campaign_id,
+            CampaignAudience.message_id.isnot(None),
+        )
+        .order_by(CampaignAudience.last_message_at.desc(), CampaignAudience.customer_id)
+        .all()
+    )
@@ -32,6 +32,16 @@ def _get_int(name: str, default: int) -> int:
         return default
 
 
+def _get_optional_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
 def _get_optional_bool(name: str) -> Optional[bool]:
     value = os.getenv(name)
     if value is None or value == "":
@@ -70,6 +80,9 @@ class Settings:
     sendgrid_event_webhook_verify: bool
     sendgrid_event_webhook_public_key: Optional[str]
     sendgrid_webhook_log_path: Optional[str]
+    sendgrid_batch_size: int
+    http_pool_size: int
+    http_timeout_seconds: int
     sms_default_country_code: Optional[str]
     sms_append_opt_out: bool
     sms_opt_out_text: Optional[str]
@@ -79,10 +92,41 @@ class Settings:
     sms_scheduler_interval_seconds: int
     sms_default_rate_per_minute: int
     sms_default_batch_size: int
+    sms_dispatch_workers: int
+    sms_segment_price: Optional[float]
+    sms_price_unit: str
     email_scheduler_enabled: bool
     email_scheduler_interval_seconds: int
     marketing_scheduler_enabled: bool
     marketing_scheduler_interval_seconds: int
+    campaign_dispatch_slice_size: int
+    scheduler_lease_seconds: int
+    scheduler_claim_limit: int
+    outbox_enabled: bool
+    outbox_worker_enabled: bool
+    outbox_batch_size: int
+    outbox_poll_interval_seconds: int
+    outbox_sms_concurrency: int
+    outbox_email_concurrency: int
+    outbox_whatsapp_concurrency: int
+    retry_max_attempts: int
+    retry_base_delay_seconds: int
+    retry_max_delay_seconds: int
+    circuit_breaker_enabled: bool
+    circuit_window_size: int
+    circuit_min_calls: int
+    circuit_error_rate_percent: int
+    circuit_open_seconds: int
+    provider_initial_concurrency: int
+    provider_max_concurrency: int
+    provider_latency_target_ms: int
+    sms_suppression_check_seconds: int
+    api_key_cache_seconds: int
+    api_key_usage_flush_seconds: int
+    admin_session_cache_seconds: int
+    events_broker_url: Optional[str]
+    events_heartbeat_seconds: int
+    events_queue_size: int
     cors_allow_origins: List[str]
 
 
@@ -109,6 +153,9 @@ settings = Settings(
     sendgrid_event_webhook_verify=_get_bool("SENDGRID_EVENT_WEBHOOK_VERIFY", False),
     sendgrid_event_webhook_public_key=os.getenv("SENDGRID_EVENT_WEBHOOK_PUBLIC_KEY"),
     sendgrid_webhook_log_path=os.getenv("SENDGRID_WEBHOOK_LOG_PATH") or None,
+    sendgrid_batch_size=_get_int("SENDGRID_BATCH_SIZE", 1000),
+    http_pool_size=_get_int("HTTP_POOL_SIZE", 20),
+    http_timeout_seconds=_get_int("HTTP_TIMEOUT_SECONDS", 10),
     sms_default_country_code=os.getenv("SMS_DEFAULT_COUNTRY_CODE", "1"),
     sms_append_opt_out=_get_bool("SMS_APPEND_OPT_OUT", True),
     sms_opt_out_text=os.getenv("SMS_OPT_OUT_TEXT", "Reply T to unsubscribe."),
@@ -118,9 +165,40 @@ settings = Settings(
     sms_scheduler_interval_seconds=_get_int("SMS_SCHEDULER_INTERVAL_SECONDS", 15),
     sms_default_rate_per_minute=_get_int("SMS_DEFAULT_RATE_PER_MINUTE", 30),
     sms_default_batch_size=_get_int("SMS_DEFAULT_BATCH_SIZE", 100),
+    sms_dispatch_workers=_get_int("SMS_DISPATCH_WORKERS", 4),
+    sms_segment_price=_get_optional_float("SMS_SEGMENT_PRICE"),
+    sms_price_unit=os.getenv("SMS_PRICE_UNIT", "USD"),
     email_scheduler_enabled=_get_bool("EMAIL_SCHEDULER_ENABLED", True),
     email_scheduler_interval_seconds=_get_int("EMAIL_SCHEDULER_INTERVAL_SECONDS", 30),
     marketing_scheduler_enabled=_get_bool("MARKETING_SCHEDULER_ENABLED", True),
     marketing_scheduler_interval_seconds=_get_int("MARKETING_SCHEDULER_INTERVAL_SECONDS", 30),
+    campaign_dispatch_slice_size=_get_int("CAMPAIGN_DISPATCH_SLICE_SIZE", 500),
+    scheduler_lease_seconds=_get_int("SCHEDULER_LEASE_SECONDS", 120),
+    scheduler_claim_limit=_get_int("SCHEDULER_CLAIM_LIMIT", 10),
+    outbox_enabled=_get_bool("OUTBOX_ENABLED", False),
+    outbox_worker_enabled=_get_bool("OUTBOX_WORKER_ENABLED", True),
+    outbox_batch_size=_get_int("OUTBOX_BATCH_SIZE", 200),
+    outbox_poll_interval_seconds=_get_int("OUTBOX_POLL_INTERVAL_SECONDS", 2),
+    outbox_sms_concurrency=_get_int("OUTBOX_SMS_CONCURRENCY", 8),
+    outbox_email_concurrency=_get_int("OUTBOX_EMAIL_CONCURRENCY", 2),
+    outbox_whatsapp_concurrency=_get_int("OUTBOX_WHATSAPP_CONCURRENCY", 8),
+    retry_max_attempts=_get_int("RETRY_MAX_ATTEMPTS", 5),
+    retry_base_delay_seconds=_get_int("RETRY_BASE_DELAY_SECONDS", 30),
+    retry_max_delay_seconds=_get_int("RETRY_MAX_DELAY_SECONDS", 3600),
+    circuit_breaker_enabled=_get_bool("CIRCUIT_BREAKER_ENABLED", True),
+    circuit_window_size=_get_int("CIRCUIT_WINDOW_SIZE", 20),
+    circuit_min_calls=_get_int("CIRCUIT_MIN_CALLS", 10),
+    circuit_error_rate_percent=_get_int("CIRCUIT_ERROR_RATE_PERCENT", 50),
+    circuit_open_seconds=_get_int("CIRCUIT_OPEN_SECONDS", 30),
+    provider_initial_concurrency=_get_int("PROVIDER_INITIAL_CONCURRENCY", 4),
+    provider_max_concurrency=_get_int("PROVIDER_MAX_CONCURRENCY", 16),
+    provider_latency_target_ms=_get_int("PROVIDER_LATENCY_TARGET_MS", 2000),
+    sms_suppression_check_seconds=_get_int("SMS_SUPPRESSION_CHECK_SECONDS", 5),
+    api_key_cache_seconds=_get_int("API_KEY_CACHE_SECONDS", 60),
+    api_key_usage_flush_seconds=_get_int("API_KEY_USAGE_FLUSH_SECONDS", 30),
+    admin_session_cache_seconds=_get_int("ADMIN_SESSION_CACHE_SECONDS", 30),
+    events_broker_url=os.getenv("EVENTS_BROKER_URL") or None,
+    events_heartbeat_seconds=_get_int("EVENTS_HEARTBEAT_SECONDS", 15),
+    events_queue_size=_get_int("EVENTS_QUEUE_SIZE", 1000),
     cors_allow_origins=_get_csv_list("CORS_ALLOW_ORIGINS"),
 )
@@ -0,0 +1,218 @@
+"""Conversation summary per (user address, channel), maintained on write.
+
+Every path that inserts into ``broadcast_messages`` (``insert_messages``,
+``enqueue_messages`` and the inbound webhooks) calls ``record_messages`` after
+its flush, so the summary commits with the messages; ``/api/chat/mark-read``
+calls ``record_reads``. Each user also has an ``ALL_CHANNELS`` rollup row, so
+the chat user list is one index scan with or without a channel filter.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, case, func, update
+from sqlalchemy.orm import Session
+
+from app.models import Conversation, Message
+
+
+ALL_CHANNELS = "*"
+SNIPPET_LENGTH = 255
+
+_REBUILD_CHUNK = 1000
+
+ConversationKey = Tuple[str, str]
+
+
+def conversation_address(message: Message) -> Optional[str]:
+    """The counterpart address a message belongs to in the chat view."""
+    if message.direction == "inbound":
+        return message.from_address
+    return message.to_address
+
+
+def user_address_expr():
+    """SQL form of ``conversation_address``."""
+    return case(
+        (Message.direction == "inbound", Message.from_address),
+        else_=Message.to_address,
+    )
+
+
+def _snippet(message: Message) -> Optional[str]:
+    text = " ".join((message.body or message.subject or "").split())
+    return text[:SNIPPET_LENGTH] or None
+
+
+def _merge_row(
+    rows: Dict[ConversationKey, Dict[str, Any]],
+    key: ConversationKey,
+    *,
+    total: int,
+    unread: int,
+    last_message_id: int,
+    last_message_at: Optional[datetime],
+    last_snippet: Optional[str],
+    now: datetime,
+) -> None:
+    row = rows.get(key)
+    if row is None:
+        row = rows[key] = {
+            "user_address": key[0],
+            "channel": key[1],
+            "total_messages": 0,
+            "unread_count": 0,
+            "last_message_id": 0,
+            "last_message_at": None,
+            "last_snippet": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    row["total_messages"] += total
+    row["unread_count"] += unread
+    if last_message_id > row["last_message_id"]:
+        row["last_message_id"] = last_message_id
+        row["last_message_at"] = last_message_at
+        row["last_snippet"] = last_snippet
+
+
+def _upsert(db: Session, rows: Sequence[Dict[str, Any]]) -> None:
+    table = Conversation.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(table)
+    new = stmt.inserted if dialect == "mysql" else stmt.excluded
+    newer = new.last_message_id > table.c.last_message_id
+    # MySQL applies assignments left to right, so last_message_id goes last.
+    assignments = [
+        ("total_messages", table.c.total_messages + new.total_messages),
+        ("unread_count", table.c.unread_count + new.unread_count),
+        ("last_message_at", case((newer, new.last_message_at), else_=table.c.last_message_at)),
+        ("last_snippet", case((newer, new.last_snippet), else_=table.c.last_snippet)),
+        ("updated_at", new.updated_at),
+        ("last_message_id", case((newer, new.last_message_id), else_=table.c.last_message_id)),
+    ]
+    if dialect == "mysql":
+        stmt = stmt.on_duplicate_key_update(assignments)
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_address", "channel"], set_=dict(assignments)
+        )
+    db.execute(stmt, list(rows))
+
+
+def record_messages(db: Session, messages: Iterable[Message]) -> None:
+    """Fold flushed ``messages`` into the summary; the caller commits."""
+    now = datetime.utcnow()
+    rows: Dict[ConversationKey, Dict[str, Any]] = {}
+    for message in messages:
+        address = conversation_address(message)
+        if not address or message.id is None:
+            continue
+        snippet = _snippet(message)
+        for channel in (message.channel, ALL_CHANNELS):
+            _merge_row(
+                rows,
+                (address, channel),
+                total=1,
+                unread=1 if message.read_at is None else 0,
+                last_message_id=message.id,
+                last_message_at=message.created_at,
+                last_snippet=snippet,
+                now=now,
+            )
+    if rows:
+        _upsert(db, list(rows.values()))
+
+
+def unread_counts(db: Session, *filters: Any) -> Dict[ConversationKey, int]:
+    """Unread messages matching ``filters``, per conversation, before marking them read."""
+    user_address = user_address_expr()
+    rows = (
+        db.query(user_address, Message.channel, func.count(Message.id))
+        .filter(Message.read_at.is_(None), *filters)
+        .group_by(user_address, Message.channel)
+        .all()
+    )
+    return {(address, channel): count for address, channel, count in rows if address}
+
+
+def record_reads(db: Session, counts: Mapping[ConversationKey, int]) -> None:
+    """Subtract messages newly marked read from the unread counters; the caller commits."""
+    totals: Dict[ConversationKey, int] = defaultdict(int)
+    for (address, channel), count in counts.items():
+        totals[(address, channel)] += count
+        totals[(address, ALL_CHANNELS)] += count
+    if not totals:
+        return
+    table = Conversation.__table__
+    count = bindparam("b_count")
+    db.execute(
+        update(table)
+        .where(
+            table.c.user_address == bindparam("b_user_address"),
+            table.c.channel == bindparam("b_channel"),
+        )
+        .values(
+            unread_count=case(
+                (table.c.unread_count > count, table.c.unread_count - count), else_=0
+            ),
+            updated_at=datetime.utcnow(),
+        ),
+        [
+            {"b_user_address": address, "b_channel": channel, "b_count": count}
+            for (address, channel), count in totals.items()
+        ],
+    )
+
+
+def rebuild_conversations(db: Session) -> int:
+    """Recompute the whole summary from ``broadcast_messages``; returns the row count."""
+    now = datetime.utcnow()
+    user_address = user_address_expr()
+    grouped = (
+        db.query(
+            user_address,
+            Message.channel,
+            func.count(Message.id),
+            func.sum(case((Message.read_at.is_(None), 1), else_=0)),
+            func.max(Message.id),
+        )
+        .filter(user_address.isnot(None), user_address != "")
+        .group_by(user_address, Message.channel)
+        .all()
+    )
+    last_ids = [row[4] for row in grouped]
+    last_messages: Dict[int, Tuple[Optional[datetime], Optional[str]]] = {}
+    for start in range(0, len(last_ids), _REBUILD_CHUNK):
+        chunk = last_ids[start : start + _REBUILD_CHUNK]
+        for message in db.query(Message).filter(Message.id.in_(chunk)):
+            last_messages[message.id] = (message.created_at, _snippet(message))
+        db.expunge_all()
+
+    rows: Dict[ConversationKey, Dict[str, Any]] = {}
+    for address, channel, total, unread, last_id in grouped:
+        last_at, snippet = last_messages.get(last_id, (None, None))
+        for key in ((address, channel), (address, ALL_CHANNELS)):
+            _merge_row(
+                rows,
+                key,
+                total=total,
+                unread=int(unread or 0),
+                last_message_id=last_id,
+                last_message_at=last_at,
+                last_snippet=snippet,
+                now=now,
+            )
+    db.query(Conversation).delete(synchronize_session=False)
+    values: List[Dict[str, Any]] = list(rows.values())
+    for start in range(0, len(values), _REBUILD_CHUNK):
+        db.execute(Conversation.__table__.insert(), values[start : start + _REBUILD_CHUNK])
+    db.commit()
+    return len(values)
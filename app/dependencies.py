@@ -1,17 +1,21 @@
 """Authentication and dependency injection utilities."""
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import base64
 import hashlib
 import hmac
 import json
 import secrets
+import threading
+import time
 from typing import Any, Dict, Optional, Tuple
 
 from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import bindparam, update
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.models import AdminSession, AdminUser, ApiKey
 
 
@@ -236,6 +240,61 @@ def get_admin_session_from_jwt(token: str, db: Session) -> Optional[AdminSession
     return session
 
 
+# Admin session cache
+# sha256(session token) -> (admin_user_id, session expires_at, monotonic cache deadline)
+_admin_session_cache: Dict[str, Tuple[int, datetime, float]] = {}
+_admin_session_lock = threading.Lock()
+
+
+def _session_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def invalidate_admin_session_cache(
+    *, token: Optional[str] = None, admin_user_id: Optional[int] = None
+) -> None:
+    """Drop cached sessions by token or user; the whole cache when neither is given."""
+    with _admin_session_lock:
+        if token is None and admin_user_id is None:
+            _admin_session_cache.clear()
+            return
+        if token is not None:
+            _admin_session_cache.pop(_session_cache_key(token), None)
+        if admin_user_id is not None:
+            for key, entry in list(_admin_session_cache.items()):
+                if entry[0] == admin_user_id:
+                    del _admin_session_cache[key]
+
+
+def has_admin_session(request: Request) -> bool:
+    """Whether the session cookie is valid, for page and static routes.
+
+    A validated session is trusted in memory for ``ADMIN_SESSION_CACHE_SECONDS``
+    (never past its own expiry); only a miss opens a database session.
+    """
+    token = request.cookies.get(ADMIN_COOKIE_NAME)
+    if not token:
+        return False
+    key = _session_cache_key(token)
+    with _admin_session_lock:
+        entry = _admin_session_cache.get(key)
+    if entry and entry[2] > time.monotonic() and entry[1] > datetime.utcnow():
+        return True
+    with SessionLocal() as db:
+        session = get_admin_session_by_token(token, db)
+        if not session:
+            invalidate_admin_session_cache(token=token)
+            return False
+        entry = (
+            session.admin_user_id,
+            session.expires_at,
+            time.monotonic() + settings.admin_session_cache_seconds,
+        )
+    with _admin_session_lock:
+        _admin_session_cache[key] = entry
+    return True
+
+
 # Admin dependencies
 def require_admin(request: Request, db: Session = Depends(get_db)) -> AdminSession:
     session = get_admin_session(request, db)
@@ -254,12 +313,43 @@ def require_admin_api(request: Request, db: Session = Depends(get_db)) -> AdminS
     return session
 
 
-# API Key dependency
-def _require_api_key(request: Request, db: Session, required_scope: str) -> ApiKey:
-    api_key = extract_api_key(request)
-    if not api_key:
-        raise HTTPException(status_code=401, detail="api_key is required")
-    key_hash = hash_api_key(api_key)
+# API Key cache
+@dataclass(frozen=True)
+class _CachedApiKey:
+    id: int
+    name: Optional[str]
+    prefix: str
+    scope: Optional[str]
+    admin_user_id: Optional[int]
+    expires_at: Optional[datetime]
+    created_at: datetime
+
+
+_api_key_cache: Dict[str, Tuple[_CachedApiKey, float]] = {}
+_api_key_usage: Dict[int, datetime] = {}
+_api_key_lock = threading.Lock()
+
+
+def invalidate_api_key_cache(
+    *, key_id: Optional[int] = None, admin_user_id: Optional[int] = None
+) -> None:
+    """Drop cached keys by id or owner; the whole cache when neither is given."""
+    with _api_key_lock:
+        if key_id is None and admin_user_id is None:
+            _api_key_cache.clear()
+            return
+        for key_hash, (cached, _) in list(_api_key_cache.items()):
+            if cached.id == key_id or (
+                admin_user_id is not None and cached.admin_user_id == admin_user_id
+            ):
+                del _api_key_cache[key_hash]
+
+
+def _load_api_key(db: Session, key_hash: str) -> _CachedApiKey:
+    with _api_key_lock:
+        entry = _api_key_cache.get(key_hash)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
     record = (
         db.query(ApiKey)
         .filter(ApiKey.key_hash == key_hash, ApiKey.revoked_at.is_(None))
@@ -267,22 +357,70 @@ def _require_api_key(request: Request, db: Session, required_scope: str) -> ApiK
     )
     if not record:
         raise HTTPException(status_code=401, detail="api_key is invalid")
-    if record.expires_at and record.expires_at <= datetime.utcnow():
-        raise HTTPException(status_code=401, detail="api_key is expired")
     if record.admin_user_id is not None:
         user = db.query(AdminUser).filter(AdminUser.id == record.admin_user_id).first()
         if not user or user.disabled_at:
             raise HTTPException(status_code=401, detail="api_key is invalid")
+    cached = _CachedApiKey(
+        id=record.id,
+        name=record.name,
+        prefix=record.prefix,
+        scope=record.scope,
+        admin_user_id=record.admin_user_id,
+        expires_at=record.expires_at,
+        created_at=record.created_at,
+    )
+    with _api_key_lock:
+        _api_key_cache[key_hash] = (cached, time.monotonic() + settings.api_key_cache_seconds)
+    return cached
+
+
+def flush_api_key_usage(db: Session) -> int:
+    """Write buffered ``last_used_at`` values in one executemany; returns how many."""
+    with _api_key_lock:
+        pending = dict(_api_key_usage)
+        _api_key_usage.clear()
+    if not pending:
+        return 0
+    table = ApiKey.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(last_used_at=bindparam("b_last_used_at")),
+        [{"b_id": key_id, "b_last_used_at": used_at} for key_id, used_at in pending.items()],
+    )
+    db.commit()
+    return len(pending)
+
+
+# API Key dependency
+def _require_api_key(request: Request, db: Session, required_scope: str) -> ApiKey:
+    api_key = extract_api_key(request)
+    if not api_key:
+        raise HTTPException(status_code=401, detail="api_key is required")
+    cached = _load_api_key(db, hash_api_key(api_key))
+    now = datetime.utcnow()
+    if cached.expires_at and cached.expires_at <= now:
+        raise HTTPException(status_code=401, detail="api_key is expired")
     scope_rank = {"read": 1, "send": 2, "manage": 3}
-    record_scope = record.scope or "manage"
+    record_scope = cached.scope or "manage"
     if record_scope not in scope_rank:
         raise HTTPException(status_code=403, detail="api_key scope is invalid")
     if scope_rank[record_scope] < scope_rank[required_scope]:
         raise HTTPException(status_code=403, detail="api_key scope is insufficient")
-    record.last_used_at = datetime.utcnow()
-    db.add(record)
-    db.commit()
-    return record
+    # Flushed in bulk by the API key usage scheduler.
+    with _api_key_lock:
+        _api_key_usage[cached.id] = now
+    return ApiKey(
+        id=cached.id,
+        name=cached.name,
+        prefix=cached.prefix,
+        scope=cached.scope,
+        admin_user_id=cached.admin_user_id,
+        expires_at=cached.expires_at,
+        created_at=cached.created_at,
+        last_used_at=now,
+    )
 
 
 def require_api_key(required_scope: str):
@@ -318,19 +456,19 @@ def clear_admin_cookie(response: Response) -> None:
 
 
 # Service instantiation
-from app.services.sendgrid_client import SendGridService
-from app.services.twilio_client import TwilioService
+from app.services.sendgrid_client import SendGridService, get_sendgrid_service
+from app.services.twilio_client import TwilioService, get_twilio_service
 
 
 def ensure_sendgrid() -> SendGridService:
     try:
-        return SendGridService()
+        return get_sendgrid_service()
     except RuntimeError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 def ensure_twilio() -> TwilioService:
     try:
-        return TwilioService()
+        return get_twilio_service()
     except RuntimeError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -0,0 +1,312 @@
+"""Concurrent, rate-paced send engine and resumable dispatch ledger."""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import CampaignDispatchLedger
+from app.schemas import SendResult
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_LEDGER_LOOKUP_CHUNK = 500
+
+
+class TokenBucket:
+    """Thread-safe token bucket that paces calls to a per-minute rate."""
+
+    def __init__(self, rate_per_minute: int, capacity: Optional[float] = None) -> None:
+        self._rate = max(rate_per_minute, 1) / 60.0
+        self._capacity = capacity if capacity is not None else max(1.0, self._rate)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+@dataclass
+class DispatchReport:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    retrying: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def messages_per_second(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.total / self.elapsed_seconds
+
+    def record(self, result: Optional[SendResult]) -> None:
+        self.total += 1
+        if result is None or result.status == "failed":
+            self.failed += 1
+        elif result.status == "blocked":
+            self.blocked += 1
+        elif result.status == "retrying":
+            self.retrying += 1
+        else:
+            self.sent += 1
+
+    def log(self, label: str) -> None:
+        logger.info(
+            "%s: %d messages (%d sent, %d failed, %d blocked, %d retrying) in %.1fs, %.2f msg/s",
+            label,
+            self.total,
+            self.sent,
+            self.failed,
+            self.blocked,
+            self.retrying,
+            self.elapsed_seconds,
+            self.messages_per_second,
+        )
+
+
+def map_paced(
+    items: Sequence[T],
+    call: Callable[[T], R],
+    *,
+    rate_per_minute: Optional[int],
+    max_workers: int,
+    label: str = "dispatch",
+    bucket: Optional[TokenBucket] = None,
+) -> List[Optional[R]]:
+    """Apply ``call`` to ``items`` on a bounded worker pool, paced by a token bucket.
+
+    Results keep the order of ``items``; a call that raises yields ``None``.
+    ``call`` runs on worker threads and must not touch the caller's database session.
+    Without ``rate_per_minute`` only ``max_workers`` bounds the throughput. Pass
+    ``bucket`` to share one pace across several calls.
+    """
+    if bucket is None and rate_per_minute:
+        bucket = TokenBucket(rate_per_minute)
+
+    def _paced(item: T) -> Optional[R]:
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return call(item)
+        except Exception:  # pragma: no cover - worker safety
+            logger.exception("%s: send failed", label)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        return list(executor.map(_paced, items))
+
+
+# Dispatch ledger
+def unique_recipients(values: Iterable[object]) -> List[str]:
+    seen = set()
+    result: List[str] = []
+    for value in values:
+        cleaned = str(value or "").strip()
+        if not cleaned or cleaned in seen:
+            continue
+        seen.add(cleaned)
+        result.append(cleaned)
+    return result
+
+
+def pending_recipients(
+    db: Session,
+    campaign_type: str,
+    campaign_id: int,
+    recipients: Sequence[str],
+    limit: int,
+    step_id: int = 0,
+) -> List[str]:
+    """Return up to ``limit`` recipients, in order, that have no ledger entry yet."""
+    return [
+        recipient
+        for _, recipient in pending_positions(
+            db, campaign_type, campaign_id, recipients, limit, step_id=step_id
+        )
+    ]
+
+
+def pending_positions(
+    db: Session,
+    campaign_type: str,
+    campaign_id: int,
+    recipients: Sequence[str],
+    limit: int,
+    step_id: int = 0,
+    start: int = 0,
+) -> List[Tuple[int, str]]:
+    """``(index, recipient)`` of up to ``limit`` unledgered recipients from ``start`` on.
+
+    With a campaign's persisted ``dispatch_offset`` as ``start``, each slice
+    only looks at the ledger past what earlier slices claimed.
+    """
+    pending: List[Tuple[int, str]] = []
+    for offset in range(max(start, 0), len(recipients), _LEDGER_LOOKUP_CHUNK):
+        chunk = list(recipients[offset:offset + _LEDGER_LOOKUP_CHUNK])
+        done = {
+            row[0]
+            for row in db.query(CampaignDispatchLedger.recipient)
+            .filter(
+                CampaignDispatchLedger.campaign_type == campaign_type,
+                CampaignDispatchLedger.campaign_id == campaign_id,
+                CampaignDispatchLedger.step_id == step_id,
+                CampaignDispatchLedger.recipient.in_(chunk),
+            )
+            .all()
+        }
+        for index, recipient in enumerate(chunk, start=offset):
+            if recipient in done:
+                continue
+            pending.append((index, recipient))
+            if len(pending) >= limit:
+                return pending
+    return pending
+
+
+def first_pending(
+    db: Session,
+    campaign_type: str,
+    campaign_id: int,
+    recipients: Sequence[str],
+    step_id: int = 0,
+) -> Optional[int]:
+    """Index of the first recipient with no ledger entry, scanning the whole list.
+
+    ``dispatch_offset`` indexes a recipient list rebuilt on every tick, so it
+    shifts when contacts are disabled or leave a group; campaigns run this
+    before completing and rewind to whatever the cursor skipped.
+    """
+    found = pending_positions(db, campaign_type, campaign_id, recipients, 1, step_id=step_id)
+    return found[0][0] if found else None
+
+
+def ledger_outcomes(
+    db: Session,
+    campaign_type: str,
+    campaign_id: int,
+    recipients: Sequence[str],
+    step_id: int = 0,
+) -> List[Tuple[str, str, Optional[int]]]:
+    """Return ``(recipient, status, message_id)`` of the ledger entries for ``recipients``."""
+    outcomes: List[Tuple[str, str, Optional[int]]] = []
+    for offset in range(0, len(recipients), _LEDGER_LOOKUP_CHUNK):
+        chunk = list(recipients[offset:offset + _LEDGER_LOOKUP_CHUNK])
+        outcomes.extend(
+            db.query(
+                CampaignDispatchLedger.recipient,
+                CampaignDispatchLedger.status,
+                CampaignDispatchLedger.message_id,
+            )
+            .filter(
+                CampaignDispatchLedger.campaign_type == campaign_type,
+                CampaignDispatchLedger.campaign_id == campaign_id,
+                CampaignDispatchLedger.step_id == step_id,
+                CampaignDispatchLedger.recipient.in_(chunk),
+            )
+            .all()
+        )
+    return outcomes
+
+
+def claim_recipients(
+    db: Session,
+    campaign_type: str,
+    campaign_id: int,
+    recipients: Sequence[str],
+    step_id: int = 0,
+) -> List[str]:
+    """Record ``recipients`` as claimed before sending; returns those claimed.
+
+    Claims are committed before any provider call, so a crash mid-slice never
+    re-sends: the worst case is a ``claimed`` entry without a message id.
+    """
+    now = datetime.utcnow()
+
+    def _entry(recipient: str) -> CampaignDispatchLedger:
+        return CampaignDispatchLedger(
+            campaign_type=campaign_type,
+            campaign_id=campaign_id,
+            step_id=step_id,
+            recipient=recipient,
+            status="claimed",
+            created_at=now,
+            updated_at=now,
+        )
+
+    try:
+        db.add_all([_entry(recipient) for recipient in recipients])
+        db.commit()
+        return list(recipients)
+    except IntegrityError:
+        db.rollback()
+    claimed: List[str] = []
+    for recipient in recipients:
+        try:
+            db.add(_entry(recipient))
+            db.commit()
+            claimed.append(recipient)
+        except IntegrityError:
+            db.rollback()
+    return claimed
+
+
+def record_dispatch_results(
+    db: Session,
+    campaign_type: str,
+    campaign_id: int,
+    results: Sequence[Tuple[str, Optional[SendResult]]],
+    step_id: int = 0,
+) -> None:
+    """Record the outcome of a whole slice in one executemany and commit."""
+    if not results:
+        return
+    table = CampaignDispatchLedger.__table__
+    now = datetime.utcnow()
+    db.execute(
+        update(table)
+        .where(
+            table.c.campaign_type == campaign_type,
+            table.c.campaign_id == campaign_id,
+            table.c.step_id == step_id,
+            table.c.recipient == bindparam("b_recipient"),
+        )
+        .values(
+            status=bindparam("b_status"),
+            message_id=bindparam("b_message_id"),
+            updated_at=now,
+        ),
+        [
+            {
+                "b_recipient": recipient,
+                "b_status": result.status if result else "skipped",
+                "b_message_id": result.message_id if result else None,
+            }
+            for recipient, result in results
+        ],
+    )
+    db.commit()
+
@@ -0,0 +1,189 @@
+"""Message events pushed to the console over Server-Sent Events.
+
+Write paths call ``queue_event`` with the session that carries the change; the
+events are published only once that session commits, so subscribers never see
+rows they cannot read yet. Delivery is in-process by default. With
+``EVENTS_BROKER_URL`` (``redis://…``, needs the optional ``redis`` package)
+every worker publishes to and listens on one Redis channel instead, so a
+browser connected to any worker sees every change.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.conversations import conversation_address
+from app.models import Message
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+
+
+logger = logging.getLogger(__name__)
+
+Event = Dict[str, Any]
+
+MESSAGE_CREATED = "message.created"
+MESSAGE_STATUS = "message.status"
+MESSAGES_READ = "messages.read"
+# Sent to a subscriber that fell too far behind; it should reload its view.
+RESYNC = "resync"
+
+_PENDING_KEY = "pending_events"
+_BROKER_CHANNEL = "twilio-ui-api:events"
+
+
+class Subscriber:
+    """One SSE connection: a bounded queue owned by the connection's event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int) -> None:
+        self.loop = loop
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, events: List[Event]) -> None:
+        for item in events:
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait({"type": RESYNC})
+                return
+
+
+class EventBus:
+    """Fans published events out to the subscribers of this process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+        self._broker: Optional["RedisBroker"] = None
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), settings.events_queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def set_broker(self, broker: Optional["RedisBroker"]) -> None:
+        self._broker = broker
+
+    def publish(self, events: List[Event]) -> None:
+        """Publish from any thread; goes through the broker when one is configured."""
+        if not events:
+            return
+        broker = self._broker
+        if broker is not None:
+            try:
+                broker.publish(events)
+                return
+            except Exception:
+                logger.exception("event broker publish failed; delivering locally")
+        self.deliver(events)
+
+    def deliver(self, events: List[Event]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, events)
+            except RuntimeError:
+                # The connection's loop is closed; it will not unsubscribe itself.
+                self.unsubscribe(subscriber)
+
+
+class RedisBroker:
+    """Relays events between workers through one Redis pub/sub channel."""
+
+    def __init__(self, url: str, bus: EventBus) -> None:
+        if redis is None:
+            raise RuntimeError("EVENTS_BROKER_URL requires the redis package")
+        self._client = redis.Redis.from_url(url)
+        self._bus = bus
+
+    def publish(self, events: List[Event]) -> None:
+        self._client.publish(_BROKER_CHANNEL, json.dumps(events, default=str))
+
+    def start(self) -> None:
+        thread = threading.Thread(target=self._listen, daemon=True)
+        thread.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_BROKER_CHANNEL)
+                for message in pubsub.listen():
+                    self._bus.deliver(json.loads(message["data"]))
+            except Exception:
+                logger.exception("event broker connection lost; reconnecting")
+                threading.Event().wait(1)
+
+
+event_bus = EventBus()
+
+
+def start_event_broker() -> None:
+    """Route events through ``EVENTS_BROKER_URL`` when it is set."""
+    if not settings.events_broker_url:
+        return
+    try:
+        broker = RedisBroker(settings.events_broker_url, event_bus)
+    except Exception:
+        logger.exception("event broker unavailable; events stay in this process")
+        return
+    broker.start()
+    event_bus.set_broker(broker)
+
+
+def queue_event(db: Session, event_type: str, **fields: Any) -> None:
+    """Publish an event after ``db`` commits; dropped if it rolls back."""
+    db.info.setdefault(_PENDING_KEY, []).append({"type": event_type, **fields})
+
+
+def queue_messages_created(db: Session, messages: Iterable[Message]) -> None:
+    for message in messages:
+        queue_event(
+            db,
+            MESSAGE_CREATED,
+            id=message.id,
+            channel=message.channel,
+            direction=message.direction,
+            status=message.status,
+            user_address=conversation_address(message),
+            created_at=message.created_at.isoformat() if message.created_at else None,
+        )
+
+
+def queue_message_status(db: Session, message: Message) -> None:
+    queue_event(
+        db,
+        MESSAGE_STATUS,
+        id=message.id,
+        channel=message.channel,
+        status=message.status,
+        user_address=conversation_address(message),
+    )
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        event_bus.publish(events)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
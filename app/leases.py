@@ -0,0 +1,160 @@
+"""Database leases that keep each campaign or outbox entry on a single worker."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+import threading
+from typing import Iterator, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+def lease_owner() -> str:
+    """Lease owner for the calling thread; unique across hosts and processes."""
+    return f"{WORKER_ID}:{threading.get_ident()}"
+
+
+def _lease_available(model, owner: str, now: datetime):
+    return or_(
+        model.lease_owner.is_(None),
+        model.lease_owner == owner,
+        model.lease_expires_at.is_(None),
+        model.lease_expires_at < now,
+    )
+
+
+def _take_lease(db: Session, model, row_id: int, owner: str, now: datetime) -> bool:
+    updated = (
+        db.query(model)
+        .filter(model.id == row_id, _lease_available(model, owner, now))
+        .update(
+            {
+                "lease_owner": owner,
+                "lease_expires_at": now + timedelta(seconds=settings.scheduler_lease_seconds),
+                "heartbeat_at": now,
+            },
+            synchronize_session=False,
+        )
+    )
+    return updated == 1
+
+
+def claim_due_rows(db: Session, model, *criteria, limit: Optional[int] = None) -> List:
+    """Lease up to ``limit`` rows of ``model`` matching ``criteria`` for this worker.
+
+    Candidate rows are locked with ``FOR UPDATE SKIP LOCKED`` so concurrent
+    workers pick disjoint rows; the conditional update keeps the claim
+    safe on databases that ignore row locks.
+    """
+    owner = lease_owner()
+    now = datetime.utcnow()
+    candidate_ids = [
+        row[0]
+        for row in db.query(model.id)
+        .filter(*criteria, _lease_available(model, owner, now))
+        .order_by(model.id)
+        .limit(limit or settings.scheduler_claim_limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    ]
+    claimed = [
+        row_id
+        for row_id in candidate_ids
+        if _take_lease(db, model, row_id, owner, now)
+    ]
+    db.commit()
+    if not claimed:
+        return []
+    return db.query(model).filter(model.id.in_(claimed)).order_by(model.id).all()
+
+
+def acquire_lease(db: Session, model, row_id: int, owner: Optional[str] = None) -> bool:
+    acquired = _take_lease(db, model, row_id, owner or lease_owner(), datetime.utcnow())
+    db.commit()
+    return acquired
+
+
+def renew_lease(db: Session, model, row_id: int, owner: str) -> bool:
+    now = datetime.utcnow()
+    updated = (
+        db.query(model)
+        .filter(model.id == row_id, model.lease_owner == owner)
+        .update(
+            {
+                "lease_expires_at": now + timedelta(seconds=settings.scheduler_lease_seconds),
+                "heartbeat_at": now,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def release_lease(db: Session, model, row_id: int, owner: str) -> None:
+    db.query(model).filter(model.id == row_id, model.lease_owner == owner).update(
+        {"lease_owner": None, "lease_expires_at": None},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+@contextmanager
+def hold_lease(model, row_id: int) -> Iterator[Optional[threading.Event]]:
+    """Hold the lease on one row for the duration of the block.
+
+    Yields ``None`` when the lease was not acquired, else an event that is set
+    once the lease is lost; dispatch loops check it between slices and stop,
+    since another worker may own the row by then. While held, a heartbeat
+    thread renews the lease every third of ``SCHEDULER_LEASE_SECONDS`` so
+    long dispatches are not taken over; the lease is released on exit.
+    """
+    owner = lease_owner()
+    with SessionLocal() as db:
+        acquired = acquire_lease(db, model, row_id, owner)
+    if not acquired:
+        yield None
+        return
+
+    stop = threading.Event()
+    lost = threading.Event()
+
+    def _heartbeat() -> None:
+        interval = max(settings.scheduler_lease_seconds / 3.0, 1.0)
+        while not stop.wait(interval):
+            try:
+                with SessionLocal() as heartbeat_db:
+                    if not renew_lease(heartbeat_db, model, row_id, owner):
+                        logger.warning(
+                            "lost lease on %s %s", model.__tablename__, row_id
+                        )
+                        lost.set()
+                        return
+            except Exception:  # pragma: no cover - heartbeat safety
+                logger.exception("lease heartbeat failed for %s %s", model.__tablename__, row_id)
+
+    thread = threading.Thread(target=_heartbeat, daemon=True)
+    thread.start()
+    try:
+        yield lost
+    finally:
+        stop.set()
+        thread.join()
+        with SessionLocal() as db:
+            release_lease(db, model, row_id, owner)
+
+
+def lease_lost(lost: Optional[threading.Event]) -> bool:
+    """Whether the lease behind ``hold_lease``'s event is gone."""
+    return lost is not None and lost.is_set()
@@ -12,12 +12,22 @@ from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import inspect, text
 
+from app.assets import asset_response
 from app.config import settings
 from app.db import SessionLocal, engine, get_db
-from app.models import AdminUser, Base
+from app.models import (
+    AdminUser,
+    Base,
+    CampaignAudience,
+    Customer,
+    EmailCampaign,
+    MarketingCampaign,
+    Message,
+    SmsCampaign,
+)
 from app.dependencies import (
     hash_password,
-    get_admin_session,
+    has_admin_session,
 )
 from app.utils import login_redirect_path
 
@@ -42,22 +52,26 @@ if settings.cors_allow_origins:
 
 
 class AuthStaticFiles(StaticFiles):
-    """Static files handler that requires admin authentication."""
+    """Static files handler that requires admin authentication.
+
+    Assets from the ``python -m app.assets`` build are served precompressed
+    with cache headers; anything else falls through to ``StaticFiles``.
+    """
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
             await super().__call__(scope, receive, send)
             return
         request = Request(scope, receive=receive)
-        db = SessionLocal()
-        try:
-            session = get_admin_session(request, db)
-        finally:
-            db.close()
-        if not session:
+        if not has_admin_session(request):
             response = RedirectResponse(url=login_redirect_path(request))
             await response(scope, receive, send)
             return
+        if scope["method"] in ("GET", "HEAD"):
+            built = asset_response(request, Path(self.get_path(scope)).as_posix())
+            if built is not None:
+                await built(scope, receive, send)
+                return
         await super().__call__(scope, receive, send)
 
 
@@ -78,6 +92,28 @@ def _ensure_table_columns(conn, inspector, table_name: str, columns: dict) -> No
         conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
 
 
+def _ensure_table_indexes(conn, inspector, table) -> None:
+    """Create the named indexes of ``table`` that an older schema lacks."""
+    if not inspector.has_table(table.name):
+        return
+    existing = {index["name"] for index in inspector.get_indexes(table.name)}
+    # Fresh inspection: columns may have been added earlier in this migration.
+    columns = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        if any(column.name not in columns for column in index.columns):
+            continue
+        index.create(conn)
+
+
+_LEASE_COLUMNS = {
+    "lease_owner": "lease_owner VARCHAR(128) NULL",
+    "lease_expires_at": "lease_expires_at DATETIME NULL",
+    "heartbeat_at": "heartbeat_at DATETIME NULL",
+}
+
+
 def _ensure_schema() -> None:
     """Ensure database schema is up to date with migrations."""
     inspector = inspect(engine)
@@ -162,6 +198,37 @@ def _ensure_schema() -> None:
             {"from_name": "from_name VARCHAR(255) NULL"},
         )
 
+        # Ensure campaign lease columns
+        for table_name in ("sms_campaigns", "email_campaigns", "marketing_campaigns"):
+            _ensure_table_columns(conn, inspector, table_name, _LEASE_COLUMNS)
+        for table_name in ("sms_campaigns", "email_campaigns"):
+            _ensure_table_columns(
+                conn,
+                inspector,
+                table_name,
+                {"dispatch_offset": "dispatch_offset INT NOT NULL DEFAULT 0"},
+            )
+        for model in (SmsCampaign, EmailCampaign, MarketingCampaign):
+            _ensure_table_indexes(conn, inspector, model.__table__)
+
+        # Ensure marketing_campaigns audience snapshot columns
+        _ensure_table_columns(
+            conn,
+            inspector,
+            "marketing_campaigns",
+            {
+                "audience_size": "audience_size INT NULL",
+                "audience_built_at": "audience_built_at DATETIME NULL",
+            },
+        )
+        _ensure_table_columns(
+            conn,
+            inspector,
+            "campaign_audience",
+            {"next_run_at": "next_run_at DATETIME NULL"},
+        )
+        _ensure_table_indexes(conn, inspector, CampaignAudience.__table__)
+
         # Ensure broadcast_messages columns
         _ensure_table_columns(
             conn,
@@ -182,8 +249,22 @@ def _ensure_schema() -> None:
                 "price": "price DECIMAL(10,4) NULL",
                 "price_unit": "price_unit VARCHAR(8) NULL",
                 "num_segments": "num_segments INT NULL",
+                "attempt_count": "attempt_count INT NOT NULL DEFAULT 0",
+                "next_attempt_at": "next_attempt_at DATETIME NULL",
             },
         )
+
+        # Ensure keyset pagination indexes
+        _ensure_table_indexes(conn, inspector, Message.__table__)
+        _ensure_table_indexes(conn, inspector, Customer.__table__)
+
+        # Ensure outbox_entries columns
+        _ensure_table_columns(
+            conn,
+            inspector,
+            "outbox_entries",
+            {"available_at": "available_at DATETIME NULL"},
+        )
         if inspector.has_table("broadcast_messages"):
             conn.execute(
                 text(
@@ -242,9 +323,28 @@ register_routes(app)
 def startup() -> None:
     """Application startup: create tables, ensure schema, start schedulers."""
     # Create database tables
+    inspector = inspect(engine)
+    conversations_missing = not inspector.has_table("conversations")
+    tag_index_missing = not (
+        inspector.has_table("customer_tags") and inspector.has_table("sms_contact_tags")
+    )
     Base.metadata.create_all(bind=engine)
     _ensure_schema()
 
+    # Backfill the conversation summary the first time its table is created
+    if conversations_missing:
+        from app.conversations import rebuild_conversations
+
+        with SessionLocal() as db:
+            rebuild_conversations(db)
+
+    # Backfill the tag index from the serialized tag columns
+    if tag_index_missing:
+        from app.tags import rebuild_tag_index
+
+        with SessionLocal() as db:
+            rebuild_tag_index(db)
+
     # Bootstrap admin user
     with SessionLocal() as db:
         _bootstrap_admin_user(db)
@@ -254,7 +354,25 @@ def startup() -> None:
         start_sms_scheduler,
         start_email_scheduler,
         start_marketing_scheduler,
+        start_outbox_workers,
+        start_api_key_usage_flusher,
     )
     start_sms_scheduler()
     start_email_scheduler()
     start_marketing_scheduler()
+    start_outbox_workers()
+    start_api_key_usage_flusher()
+
+    # Fan message events out across workers when a broker is configured
+    from app.events import start_event_broker
+
+    start_event_broker()
+
+
+@app.on_event("shutdown")
+def shutdown() -> None:
+    """Write API key usage still buffered in memory."""
+    from app.dependencies import flush_api_key_usage
+
+    with SessionLocal() as db:
+        flush_api_key_usage(db)
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, Numeric, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, Numeric, String, Text
 from sqlalchemy.orm import declarative_base
 
 
@@ -9,6 +9,14 @@ Base = declarative_base()
 
 class Message(Base):
     __tablename__ = "broadcast_messages"
+    __table_args__ = (
+        Index("ix_broadcast_messages_created_id", "created_at", "id"),
+        Index("ix_broadcast_messages_batch_created", "batch_id", "created_at", "id"),
+        Index("ix_broadcast_messages_channel_created", "channel", "created_at", "id"),
+        Index("ix_broadcast_messages_to_created", "to_address", "created_at", "id"),
+        Index("ix_broadcast_messages_from_created", "from_address", "created_at", "id"),
+        Index("ix_broadcast_messages_campaign_variant", "campaign_id", "variant", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     batch_id = Column(String(64), index=True, nullable=False)
@@ -33,6 +41,8 @@ class Message(Base):
     price_unit = Column(String(8))
     num_segments = Column(Integer)
     error = Column(Text)
+    attempt_count = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, index=True)
     read_at = Column(DateTime, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(
@@ -125,6 +135,19 @@ class SmsContact(Base):
     disabled_at = Column(DateTime)
 
 
+class SmsContactTag(Base):
+    __tablename__ = "sms_contact_tags"
+    __table_args__ = (
+        Index("ux_sms_contact_tags_contact_tag", "contact_id", "tag_lower", unique=True),
+        Index("ix_sms_contact_tags_tag_contact", "tag_lower", "contact_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    contact_id = Column(Integer, nullable=False)
+    tag = Column(String(255), nullable=False)
+    tag_lower = Column(String(255), nullable=False)
+
+
 class SmsGroup(Base):
     __tablename__ = "sms_groups"
 
@@ -167,6 +190,11 @@ class SmsCampaign(Base):
     target_groups = Column(Text)
     target_tags = Column(Text)
     target_recipients = Column(Text)
+    # Recipients before this index are already claimed in the dispatch ledger
+    dispatch_offset = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String(128), index=True)
+    lease_expires_at = Column(DateTime, index=True)
+    heartbeat_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -192,12 +220,18 @@ class EmailCampaign(Base):
     followup_subject = Column(String(255))
     followup_text = Column(Text)
     followup_html = Column(Text)
+    # Recipients before this index are already claimed in the dispatch ledger
+    dispatch_offset = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String(128), index=True)
+    lease_expires_at = Column(DateTime, index=True)
+    heartbeat_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (Index("ix_customers_created_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255))
@@ -220,6 +254,19 @@ class Customer(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
+class CustomerTag(Base):
+    __tablename__ = "customer_tags"
+    __table_args__ = (
+        Index("ux_customer_tags_customer_tag", "customer_id", "tag_lower", unique=True),
+        Index("ix_customer_tags_tag_customer", "tag_lower", "customer_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, nullable=False)
+    tag = Column(String(255), nullable=False)
+    tag_lower = Column(String(255), nullable=False)
+
+
 class CustomerGroup(Base):
     __tablename__ = "customer_groups"
 
@@ -266,6 +313,33 @@ class MarketingCampaign(Base):
     created_by = Column(String(64))
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
+    lease_owner = Column(String(128), index=True)
+    lease_expires_at = Column(DateTime, index=True)
+    heartbeat_at = Column(DateTime)
+    audience_size = Column(Integer)
+    audience_built_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class CampaignAudience(Base):
+    __tablename__ = "campaign_audience"
+    __table_args__ = (
+        Index("ux_campaign_audience_customer", "campaign_id", "customer_id", unique=True),
+        Index("ix_campaign_audience_due", "campaign_id", "next_run_at", "customer_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, nullable=False)
+    customer_id = Column(Integer, nullable=False)
+    # order_no of the last step dispatched to this customer; 0 before the first
+    step_order = Column(Integer, nullable=False, default=0)
+    last_step_id = Column(Integer)
+    status = Column(String(32))
+    message_id = Column(Integer)
+    last_message_at = Column(DateTime)
+    # When the next step is due; NULL once the customer has finished the journey
+    next_run_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -343,3 +417,61 @@ class SmsBlacklist(Base):
     phone = Column(String(32), unique=True, index=True, nullable=False)
     reason = Column(String(128))
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CampaignDispatchLedger(Base):
+    __tablename__ = "campaign_dispatch_ledger"
+    __table_args__ = (
+        Index(
+            "ux_campaign_dispatch_ledger_recipient",
+            "campaign_type",
+            "campaign_id",
+            "step_id",
+            "recipient",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_type = Column(String(16), nullable=False)
+    campaign_id = Column(Integer, nullable=False)
+    step_id = Column(Integer, nullable=False, default=0)
+    recipient = Column(String(255), nullable=False)
+    status = Column(String(32), nullable=False, default="claimed")
+    message_id = Column(Integer, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class OutboxEntry(Base):
+    __tablename__ = "outbox_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, unique=True, index=True, nullable=False)
+    channel = Column(String(16), index=True, nullable=False)
+    payload = Column(Text)
+    available_at = Column(DateTime, index=True)
+    lease_owner = Column(String(128), index=True)
+    lease_expires_at = Column(DateTime, index=True)
+    heartbeat_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ux_conversations_user_channel", "user_address", "channel", unique=True),
+        Index("ix_conversations_channel_last", "channel", "last_message_at", "last_message_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_address = Column(String(255), nullable=False)
+    channel = Column(String(16), nullable=False)
+    total_messages = Column(Integer, nullable=False, default=0)
+    unread_count = Column(Integer, nullable=False, default=0)
+    last_message_id = Column(Integer, nullable=False, default=0)
+    last_message_at = Column(DateTime)
+    last_snippet = Column(String(255))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,279 @@
+"""Batched persistence for outbound messages.
+
+The ``send_*_outbound_batch`` functions in the channel routes use these helpers
+to write a whole chunk in a handful of statements: one flush for the queued
+``Message`` rows, one executemany for their final status, one for step
+executions and one counter update per distinct outcome.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.conversations import record_messages
+from app.events import MESSAGE_STATUS, queue_event, queue_messages_created
+from app.models import CampaignStepExecution, Customer, Message, OutboxEntry
+from app.retries import CIRCUIT_OPEN, RETRYABLE, classify_error, retry_delay_seconds
+from app.schemas import SendResult
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+Mapper = Callable[[Sequence[T], Callable[[T], R]], List[Optional[R]]]
+
+_CUSTOMER_COUNTERS = {
+    "sms": ("sms_sent_count", "last_sms_status"),
+    "email": ("email_sent_count", "last_email_status"),
+    "whatsapp": ("whatsapp_sent_count", "last_whatsapp_status"),
+}
+
+
+@dataclass
+class OutboundItem:
+    recipient: str
+    body: Optional[str] = None
+    subject: Optional[str] = None
+    html: Optional[str] = None
+    customer_id: Optional[int] = None
+    variant: Optional[str] = None
+    parent_message_id: Optional[int] = None
+
+
+@dataclass
+class Delivery:
+    """A persisted queued message and the provider arguments needed to send it."""
+
+    message_id: int
+    recipient: str
+    payload: Dict[str, Any]
+    customer_id: Optional[int] = None
+    attempt_count: int = 0
+
+
+class Outcome(NamedTuple):
+    """Result of a channel's provider call for one delivery."""
+
+    status: str
+    provider_message_id: Optional[str] = None
+    error: Optional[str] = None
+    error_class: Optional[str] = None
+    retry_after: Optional[float] = None
+
+
+def failure_outcome(exc: BaseException) -> Outcome:
+    error_class, retry_after = classify_error(exc)
+    return Outcome("failed", None, str(exc), error_class, retry_after)
+
+
+def map_sequential(items: Sequence[T], call: Callable[[T], R]) -> List[Optional[R]]:
+    return [call(item) for item in items]
+
+
+def insert_messages(db: Session, messages: Sequence[Message]) -> List[int]:
+    """Insert ``messages`` in one flush and commit; returns their ids in order."""
+    if not messages:
+        return []
+    db.add_all(messages)
+    db.flush()
+    message_ids = [message.id for message in messages]
+    record_messages(db, messages)
+    queue_messages_created(db, messages)
+    db.commit()
+    for message in messages:
+        db.expunge(message)
+    return message_ids
+
+
+def complete_deliveries(
+    db: Session,
+    *,
+    channel: str,
+    deliveries: Sequence[Delivery],
+    outcomes: Sequence[Optional[Outcome]],
+    blocked: Sequence[Tuple[SendResult, Optional[int]]] = (),
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+) -> List[SendResult]:
+    """Persist provider ``outcomes`` for ``deliveries`` and return their results.
+
+    ``blocked`` carries results for messages that were never sent, with their
+    customer ids, so their step executions are written in the same commit.
+    Transient and rate-limited failures with attempts left under
+    ``RETRY_MAX_ATTEMPTS`` become ``retrying`` and are re-queued on the outbox.
+    """
+    now = datetime.utcnow()
+    results: List[SendResult] = []
+    updates: List[Dict[str, Any]] = []
+    retries: List[Dict[str, Any]] = []
+    rows = []
+    for delivery, outcome in zip(deliveries, outcomes):
+        outcome = outcome or Outcome("failed", None, "send failed")
+        status = outcome.status
+        attempt_count = delivery.attempt_count
+        # A call rejected by an open circuit breaker never reached the provider.
+        if outcome.error_class != CIRCUIT_OPEN:
+            attempt_count += 1
+        next_attempt_at = None
+        if outcome.error_class in RETRYABLE and attempt_count < settings.retry_max_attempts:
+            status = "retrying"
+            next_attempt_at = now + timedelta(
+                seconds=retry_delay_seconds(attempt_count, outcome.retry_after)
+            )
+            retries.append(
+                {
+                    "message_id": delivery.message_id,
+                    "channel": channel,
+                    "payload": json.dumps(delivery.payload),
+                    "available_at": next_attempt_at,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+        updates.append(
+            {
+                "id": delivery.message_id,
+                "status": status,
+                "provider_message_id": outcome.provider_message_id,
+                "error": outcome.error,
+                "attempt_count": attempt_count,
+                "next_attempt_at": next_attempt_at,
+                "updated_at": now,
+            }
+        )
+        results.append(
+            SendResult(
+                message_id=delivery.message_id,
+                recipient=delivery.recipient,
+                status=status,
+                provider_message_id=outcome.provider_message_id,
+                error=outcome.error,
+            )
+        )
+        rows.append((delivery.message_id, delivery.customer_id, status, status != "retrying"))
+        queue_event(
+            db,
+            MESSAGE_STATUS,
+            id=delivery.message_id,
+            channel=channel,
+            status=status,
+            user_address=delivery.recipient,
+        )
+    for result, customer_id in blocked:
+        results.append(result)
+        rows.append((result.message_id, customer_id, result.status, False))
+
+    if retries:
+        retry_ids = [entry["message_id"] for entry in retries]
+        db.query(OutboxEntry).filter(OutboxEntry.message_id.in_(retry_ids)).delete(
+            synchronize_session=False
+        )
+        db.execute(insert(OutboxEntry), retries)
+
+    finalize_messages(
+        db,
+        channel=channel,
+        updates=updates,
+        outcomes=rows,
+        marketing_campaign_id=marketing_campaign_id,
+        campaign_step_id=campaign_step_id,
+        created_at=created_at,
+    )
+    return results
+
+
+def finalize_messages(
+    db: Session,
+    *,
+    channel: str,
+    updates: Sequence[Dict[str, Any]],
+    outcomes: Sequence[Tuple[int, Optional[int], str, bool]],
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+) -> None:
+    """Apply provider outcomes for a chunk and commit once.
+
+    ``updates`` are ``Message`` column values keyed by ``id``. ``outcomes`` are
+    ``(message_id, customer_id, status, counted)`` tuples; ``counted`` marks
+    messages that reached the provider and bump customer counters. Messages
+    still ``retrying`` get no step execution until their final attempt.
+    """
+    now = datetime.utcnow()
+    if updates:
+        db.execute(update(Message), list(updates))
+
+    if marketing_campaign_id and campaign_step_id:
+        executions = [
+            {
+                "campaign_id": marketing_campaign_id,
+                "step_id": campaign_step_id,
+                "customer_id": customer_id,
+                "channel": channel.upper(),
+                "status": status,
+                "message_id": message_id,
+                "created_at": created_at or now,
+                "updated_at": now,
+            }
+            for message_id, customer_id, status, _ in outcomes
+            if customer_id and status != "retrying"
+        ]
+        if executions:
+            db.execute(insert(CampaignStepExecution), executions)
+
+    _bump_customer_counters(
+        db,
+        channel,
+        [
+            (customer_id, status)
+            for _, customer_id, status, counted in outcomes
+            if customer_id and counted
+        ],
+        marketing_campaign_id,
+        created_at or now,
+    )
+    db.commit()
+
+
+def _bump_customer_counters(
+    db: Session,
+    channel: str,
+    outcomes: Sequence[Tuple[int, str]],
+    marketing_campaign_id: Optional[int],
+    marketed_at: datetime,
+) -> None:
+    if not outcomes:
+        return
+    count_column, status_column = _CUSTOMER_COUNTERS[channel]
+    counts: Dict[int, int] = defaultdict(int)
+    last_status: Dict[int, str] = {}
+    for customer_id, status in outcomes:
+        counts[customer_id] += 1
+        last_status[customer_id] = "failed" if status == "failed" else "sent"
+
+    groups: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+    for customer_id, count in counts.items():
+        groups[(count, last_status[customer_id])].append(customer_id)
+
+    counter = getattr(Customer, count_column)
+    for (count, status), customer_ids in groups.items():
+        values: Dict[str, Any] = {
+            count_column: func.coalesce(counter, 0) + count,
+            status_column: status,
+            "updated_at": datetime.utcnow(),
+        }
+        if marketing_campaign_id:
+            values.update(
+                has_marketed=True,
+                last_campaign_id=marketing_campaign_id,
+                last_marketed_at=marketed_at,
+            )
+        db.query(Customer).filter(Customer.id.in_(customer_ids)).update(
+            values, synchronize_session=False
+        )
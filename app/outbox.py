@@ -0,0 +1,155 @@
+"""Durable outbox: API sends and retries are queued here and drained by background workers."""
+from collections import defaultdict
+from datetime import datetime
+from functools import partial
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.conversations import record_messages
+from app.events import queue_messages_created
+from app.dispatcher import map_paced
+from app.leases import claim_due_rows
+from app.models import Message, OutboxEntry
+from app.outbound import Delivery
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_CHANNELS = ("sms", "email", "whatsapp")
+
+
+def enqueue_messages(
+    db: Session,
+    channel: str,
+    messages: Sequence[Message],
+    payloads: Sequence[Optional[Dict[str, Any]]],
+) -> List[int]:
+    """Insert ``messages`` and an outbox entry for each non-empty payload in one commit."""
+    if not messages:
+        return []
+    db.add_all(messages)
+    db.flush()
+    message_ids = [message.id for message in messages]
+    record_messages(db, messages)
+    queue_messages_created(db, messages)
+    db.add_all(
+        [
+            OutboxEntry(
+                message_id=message_id,
+                channel=channel,
+                payload=json.dumps(payload, ensure_ascii=True),
+            )
+            for message_id, payload in zip(message_ids, payloads)
+            if payload is not None
+        ]
+    )
+    db.commit()
+    for message in messages:
+        db.expunge(message)
+    return message_ids
+
+
+def _channel_deliverer(channel: str) -> Callable[..., Any]:
+    if channel == "sms":
+        from app.routes.sms import deliver_sms
+        from app.services.twilio_client import get_twilio_service
+
+        return partial(
+            deliver_sms,
+            twilio=get_twilio_service(),
+            mapper=partial(
+                map_paced,
+                rate_per_minute=None,
+                max_workers=settings.outbox_sms_concurrency,
+                label="outbox_sms",
+            ),
+        )
+    if channel == "email":
+        from app.routes.email import deliver_email
+        from app.services.sendgrid_client import get_sendgrid_service
+
+        return partial(
+            deliver_email,
+            sendgrid=get_sendgrid_service(),
+            mapper=partial(
+                map_paced,
+                rate_per_minute=None,
+                max_workers=settings.outbox_email_concurrency,
+                label="outbox_email",
+            ),
+        )
+    if channel == "whatsapp":
+        from app.routes.whatsapp import deliver_whatsapp
+        from app.services.twilio_client import get_twilio_service
+
+        return partial(
+            deliver_whatsapp,
+            twilio=get_twilio_service(),
+            mapper=partial(
+                map_paced,
+                rate_per_minute=None,
+                max_workers=settings.outbox_whatsapp_concurrency,
+                label="outbox_whatsapp",
+            ),
+        )
+    raise ValueError(f"unknown outbox channel: {channel}")
+
+
+def drain_outbox(db: Session, channel: str, limit: Optional[int] = None) -> int:
+    """Lease and send up to ``limit`` due entries for ``channel``; returns how many.
+
+    Entries are deleted once their outcome is recorded; retry entries wait
+    until ``available_at``. An entry whose worker dies mid-send becomes
+    claimable again when its lease expires, so delivery is at least once.
+    """
+    now = datetime.utcnow()
+    entries = claim_due_rows(
+        db,
+        OutboxEntry,
+        OutboxEntry.channel == channel,
+        or_(OutboxEntry.available_at.is_(None), OutboxEntry.available_at <= now),
+        limit=limit or settings.outbox_batch_size,
+    )
+    if not entries:
+        return 0
+    entry_ids = [entry.id for entry in entries]
+    payloads = {entry.message_id: json.loads(entry.payload or "{}") for entry in entries}
+    messages = (
+        db.query(Message)
+        .filter(Message.id.in_(list(payloads)), Message.status.in_(("queued", "retrying")))
+        .order_by(Message.id)
+        .all()
+    )
+
+    groups: Dict[tuple, List[Delivery]] = defaultdict(list)
+    for message in messages:
+        groups[(message.marketing_campaign_id, message.campaign_step_id)].append(
+            Delivery(
+                message_id=message.id,
+                recipient=message.to_address,
+                customer_id=message.customer_id,
+                payload=payloads[message.id],
+                attempt_count=message.attempt_count or 0,
+            )
+        )
+    if groups:
+        deliver = _channel_deliverer(channel)
+        for (marketing_campaign_id, campaign_step_id), deliveries in groups.items():
+            deliver(
+                db,
+                deliveries=deliveries,
+                marketing_campaign_id=marketing_campaign_id,
+                campaign_step_id=campaign_step_id,
+            )
+
+    db.query(OutboxEntry).filter(OutboxEntry.id.in_(entry_ids)).delete(
+        synchronize_session=False
+    )
+    db.commit()
+    logger.info("outbox_%s: drained %d entries", channel, len(entry_ids))
+    return len(entry_ids)
@@ -0,0 +1,73 @@
+"""Keyset pagination over ``(created_at, id)``, newest first.
+
+Cursors are opaque to clients: the base64url form of the last row's sort key.
+A page resumes strictly after its cursor, so deep pages cost the same as the
+first one given a ``(…, created_at, id)`` index.
+"""
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="cursor is invalid")
+
+
+def row_cursor(row: Any) -> str:
+    return encode_cursor(row.created_at, row.id)
+
+
+def is_after_cursor(row: Any, cursor: Tuple[datetime, int]) -> bool:
+    return (row.created_at, row.id) < cursor
+
+
+def keyset_page(
+    query: Query,
+    model: Any,
+    *,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> Tuple[List[Any], Optional[str]]:
+    """Return one page of ``query`` and the cursor for the next, if any.
+
+    ``offset`` is only honoured without a cursor, for clients that have not
+    switched to cursors yet.
+    """
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id),
+            )
+        )
+    elif offset:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+    return page_of(rows, limit)
+
+
+def page_of(rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trim ``rows`` (fetched with one extra) to ``limit`` and derive the next cursor."""
+    page = list(rows[:limit])
+    next_cursor = row_cursor(page[-1]) if len(rows) > limit and page else None
+    return page, next_cursor
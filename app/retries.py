@@ -0,0 +1,77 @@
+"""Provider error classification and retry backoff."""
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import random
+from typing import Optional, Tuple
+
+import requests
+
+from app.config import settings
+
+
+TRANSIENT = "transient"
+RATE_LIMITED = "rate_limited"
+CIRCUIT_OPEN = "circuit_open"
+PERMANENT = "permanent"
+
+RETRYABLE = {TRANSIENT, RATE_LIMITED, CIRCUIT_OPEN}
+
+_TRANSIENT_STATUSES = {408, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+    def __init__(self, provider: str, sender: Optional[str], retry_after: float) -> None:
+        super().__init__(f"{provider} circuit open for {sender or 'default sender'}")
+        self.provider = provider
+        self.sender = sender
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def classify_error(exc: BaseException) -> Tuple[str, Optional[float]]:
+    """Classify a provider exception; returns ``(kind, retry_after_seconds)``.
+
+    Twilio raises ``TwilioRestException`` with ``status``; SendGrid calls raise
+    ``requests.HTTPError`` whose response may carry ``Retry-After``.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return CIRCUIT_OPEN, exc.retry_after
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return TRANSIENT, None
+    status = getattr(exc, "status", None)
+    retry_after = None
+    response = getattr(exc, "response", None)
+    if response is not None:
+        status = getattr(response, "status_code", status)
+        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+    if status == 429:
+        return RATE_LIMITED, retry_after
+    if status in _TRANSIENT_STATUSES:
+        return TRANSIENT, retry_after
+    return PERMANENT, None
+
+
+def retry_delay_seconds(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with jitter for the given 1-based attempt."""
+    if retry_after is not None:
+        return min(retry_after, float(settings.retry_max_delay_seconds))
+    delay = settings.retry_base_delay_seconds * (2 ** max(attempt - 1, 0))
+    delay = min(delay, settings.retry_max_delay_seconds)
+    return delay * random.uniform(0.5, 1.0)
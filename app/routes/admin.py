@@ -27,6 +27,8 @@ from app.dependencies import (
     create_api_key_record,
     normalize_scope,
     hash_password,
+    invalidate_admin_session_cache,
+    invalidate_api_key_cache,
 )
 from app.utils import field_is_set
 
@@ -173,6 +175,7 @@ def revoke_api_key(
         db.add(record)
         db.commit()
         db.refresh(record)
+    invalidate_api_key_cache(key_id=record.id)
     owner_name = None
     if record.admin_user_id:
         owner = db.query(AdminUser).filter(AdminUser.id == record.admin_user_id).first()
@@ -211,6 +214,7 @@ def update_api_key(
     db.add(record)
     db.commit()
     db.refresh(record)
+    invalidate_api_key_cache(key_id=record.id)
     owner_name = None
     if record.admin_user_id:
         owner = db.query(AdminUser).filter(AdminUser.id == record.admin_user_id).first()
@@ -275,6 +279,7 @@ def upsert_admin_user(
     db.refresh(user)
     db.query(AdminSessionModel).filter(AdminSessionModel.admin_user_id == user.id).delete()
     db.commit()
+    invalidate_admin_session_cache(admin_user_id=user.id)
     return AdminUserItem(
         id=user.id,
         username=user.username,
@@ -298,9 +303,11 @@ def disable_admin_user(
         user.disabled_at = datetime.utcnow()
         db.add(user)
         db.commit()
+    invalidate_api_key_cache(admin_user_id=user.id)
     from app.models import AdminSession as AdminSessionModel
     db.query(AdminSessionModel).filter(AdminSessionModel.admin_user_id == user.id).delete()
     db.commit()
+    invalidate_admin_session_cache(admin_user_id=user.id)
     return AdminUserItem(
         id=user.id,
         username=user.username,
@@ -355,6 +362,8 @@ def delete_admin_user(
     )
     db.delete(user)
     db.commit()
+    invalidate_api_key_cache(admin_user_id=user_id)
+    invalidate_admin_session_cache(admin_user_id=user_id)
     return item
 
 
@@ -15,6 +15,7 @@ from app.dependencies import (
     verify_password,
     issue_admin_jwt,
     get_admin_session,
+    invalidate_admin_session_cache,
     set_admin_cookie,
     clear_admin_cookie,
 )
@@ -64,6 +65,7 @@ def logout(
 ) -> LoginResponse:
     session = get_admin_session(request, db)
     if session:
+        invalidate_admin_session_cache(token=session.token)
         db.delete(session)
         db.commit()
     clear_admin_cookie(response)
@@ -94,6 +96,7 @@ def admin_token(
 def logout_page(request: Request, db: Session = Depends(get_db)) -> RedirectResponse:
     session = get_admin_session(request, db)
     if session:
+        invalidate_admin_session_cache(token=session.token)
         db.delete(session)
         db.commit()
     response = RedirectResponse(url="/login", status_code=302)
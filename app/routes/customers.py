@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.models import ApiKey, Customer, CustomerGroup, CustomerGroupMember
+from app.pagination import keyset_page
 from app.schemas import (
     CustomerCreate,
     CustomerItem,
@@ -25,8 +26,8 @@ from app.schemas import (
     CustomerGroupUpdate,
 )
 from app.dependencies import require_api_key
+from app.tags import clear_tags, has_any_tag, remove_tag, rename_tag, set_tags, tag_counts
 from app.utils import (
-    serialize_tags,
     deserialize_tags,
     normalize_customer_email,
     normalize_customer_whatsapp,
@@ -84,6 +85,8 @@ def list_customers(
     group_id: Optional[int] = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: Session = Depends(get_db),
     _: ApiKey = Depends(require_api_key("read")),
 ) -> CustomerListResponse:
@@ -109,21 +112,19 @@ def list_customers(
             CustomerGroupMember, CustomerGroupMember.customer_id == Customer.id
         ).filter(CustomerGroupMember.group_id == group_id)
 
-    customers = query.order_by(Customer.created_at.desc()).all()
-
     if tag:
-        tag_value = tag.strip().lower()
-        if tag_value:
-            customers = [
-                c for c in customers
-                if tag_value in {t.lower() for t in deserialize_tags(c.tags)}
-            ]
-
-    total = len(customers)
-    paginated = customers[offset:offset + limit]
+        tag_filter = has_any_tag(Customer, [tag])
+        if tag_filter is not None:
+            query = query.filter(tag_filter)
+
+    total = query.count() if include_total else None
+    paginated, next_cursor = keyset_page(
+        query, Customer, limit=limit, cursor=cursor, offset=offset
+    )
     return CustomerListResponse(
         customers=[_customer_to_item(c) for c in paginated],
         total=total,
+        next_cursor=next_cursor,
     )
 
 
@@ -132,15 +133,7 @@ def list_customer_tags(
     db: Session = Depends(get_db),
     _: ApiKey = Depends(require_api_key("read")),
 ) -> CustomerTagListResponse:
-    counts = {}
-    for customer in db.query(Customer).all():
-        for tag in deserialize_tags(customer.tags):
-            cleaned = tag.strip()
-            if not cleaned:
-                continue
-            counts[cleaned] = counts.get(cleaned, 0) + 1
-    items = [CustomerTagItem(tag=tag, count=count) for tag, count in counts.items()]
-    items.sort(key=lambda item: (-item.count, item.tag.lower()))
+    items = [CustomerTagItem(tag=tag, count=count) for tag, count in tag_counts(db, Customer)]
     return CustomerTagListResponse(tags=items)
 
 
@@ -156,19 +149,7 @@ def rename_customer_tag(
         raise HTTPException(status_code=400, detail="from_tag and to_tag are required")
     if from_tag.lower() == to_tag.lower():
         return CustomerTagMutationResponse(status="ok", updated=0)
-    now = datetime.utcnow()
-    updated = 0
-    for customer in db.query(Customer).all():
-        tags = deserialize_tags(customer.tags)
-        if not tags:
-            continue
-        new_tags = [to_tag if t.lower() == from_tag.lower() else t for t in tags]
-        if new_tags == tags:
-            continue
-        customer.tags = serialize_tags(new_tags)
-        customer.updated_at = now
-        db.add(customer)
-        updated += 1
+    updated = rename_tag(db, Customer, from_tag, to_tag)
     db.commit()
     return CustomerTagMutationResponse(status="ok", updated=updated)
 
@@ -182,19 +163,7 @@ def delete_customer_tag(
     tag_value = tag.strip()
     if not tag_value:
         raise HTTPException(status_code=400, detail="tag is required")
-    now = datetime.utcnow()
-    updated = 0
-    for customer in db.query(Customer).all():
-        tags = deserialize_tags(customer.tags)
-        if not tags:
-            continue
-        new_tags = [t for t in tags if t.lower() != tag_value.lower()]
-        if new_tags == tags:
-            continue
-        customer.tags = serialize_tags(new_tags)
-        customer.updated_at = now
-        db.add(customer)
-        updated += 1
+    updated = remove_tag(db, Customer, tag_value)
     db.commit()
     return CustomerTagMutationResponse(status="ok", updated=updated)
 
@@ -409,11 +378,11 @@ def create_customer(
         mobile=mobile,
         country=payload.country.strip() if payload.country else None,
         country_code=payload.country_code.strip() if payload.country_code else None,
-        tags=serialize_tags(payload.tags),
         created_at=now,
         updated_at=now,
     )
     db.add(customer)
+    set_tags(db, customer, payload.tags)
     db.commit()
     db.refresh(customer)
     return _customer_to_item(customer)
@@ -442,7 +411,7 @@ def update_customer(
     if payload.country_code is not None:
         customer.country_code = payload.country_code.strip() or None
     if payload.tags is not None:
-        customer.tags = serialize_tags(payload.tags)
+        set_tags(db, customer, payload.tags)
     customer.updated_at = datetime.utcnow()
     db.add(customer)
     db.commit()
@@ -463,6 +432,7 @@ def delete_customer(
     db.query(CustomerGroupMember).filter(
         CustomerGroupMember.customer_id == customer_id
     ).delete(synchronize_session=False)
+    clear_tags(db, Customer, [customer_id])
     db.delete(customer)
     db.commit()
     return item
@@ -1,8 +1,10 @@
 """Email sending and campaign routes."""
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from uuid import uuid4
 import html as html_lib
+import threading
+import time
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
@@ -11,8 +13,6 @@ from app.config import settings
 from app.db import get_db
 from app.models import (
     ApiKey,
-    CampaignStepExecution,
-    Customer,
     EmailCampaign,
     EmailSender,
     Message,
@@ -33,6 +33,27 @@ from app.schemas import (
     SendResult,
 )
 from app.dependencies import require_api_key, ensure_sendgrid
+from app.dispatcher import (
+    claim_recipients,
+    first_pending,
+    pending_positions,
+    record_dispatch_results,
+    unique_recipients,
+)
+from app.leases import claim_due_rows, hold_lease, lease_lost
+from app.outbox import enqueue_messages
+from app.outbound import (
+    Delivery,
+    Mapper,
+    Outcome,
+    OutboundItem,
+    complete_deliveries,
+    failure_outcome,
+    insert_messages,
+    map_sequential,
+)
+from app.services.circuit_breaker import provider_paused
+from app.services.sendgrid_client import MAX_PERSONALIZATIONS
 from app.utils import (
     serialize_json_list,
     deserialize_json_list,
@@ -44,6 +65,9 @@ from app.utils import (
 
 router = APIRouter(tags=["email"])
 
+# Parent ids per followup lookup, kept well under driver bind-parameter limits
+_FOLLOWUP_LOOKUP_CHUNK = 1000
+
 
 def _list_email_senders(db: Session) -> List[EmailSenderItem]:
     senders = []
@@ -122,96 +146,201 @@ def send_email_outbound(
     message_template_id: Optional[int] = None,
     customer_id: Optional[int] = None,
 ) -> SendResult:
-    html_payload = html
-    if not html_payload and text:
-        html_payload = text_to_html(text)
-
-    now = datetime.utcnow()
-    message = Message(
+    """Send one email through ``send_email_outbound_batch``."""
+    return send_email_outbound_batch(
+        db,
+        sendgrid=sendgrid,
+        items=[
+            OutboundItem(
+                recipient=recipient,
+                body=text,
+                subject=subject,
+                html=html,
+                customer_id=customer_id,
+                parent_message_id=parent_message_id,
+            )
+        ],
         batch_id=batch_id,
-        channel="email",
-        to_address=recipient,
-        from_address=sender.from_email,
-        subject=subject,
-        body=html or text,
-        status="queued",
-        direction="outbound",
+        sender=sender,
         campaign_id=campaign_id,
+        followup_step=followup_step,
         marketing_campaign_id=marketing_campaign_id,
         campaign_step_id=campaign_step_id,
         message_template_id=message_template_id,
-        customer_id=customer_id,
-        parent_message_id=parent_message_id,
-        followup_step=followup_step or 0,
+    )[0]
+
+
+def send_email_outbound_batch(
+    db: Session,
+    *,
+    sendgrid,
+    items: Sequence[OutboundItem],
+    batch_id: str,
+    sender: EmailSenderItem,
+    campaign_id: Optional[int] = None,
+    followup_step: Optional[int] = None,
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    message_template_id: Optional[int] = None,
+    mapper: Mapper = map_sequential,
+    outbox: bool = False,
+) -> List[SendResult]:
+    """Batched ``send_email_outbound``; each item carries its subject, text and html.
+
+    With ``outbox`` the messages are only queued for the outbox workers.
+    """
+    now = datetime.utcnow()
+    messages = [
+        Message(
+            batch_id=batch_id,
+            channel="email",
+            to_address=item.recipient,
+            from_address=sender.from_email,
+            subject=item.subject,
+            body=item.html or item.body,
+            status="queued",
+            direction="outbound",
+            campaign_id=campaign_id,
+            marketing_campaign_id=marketing_campaign_id,
+            campaign_step_id=campaign_step_id,
+            message_template_id=message_template_id,
+            customer_id=item.customer_id,
+            parent_message_id=item.parent_message_id,
+            followup_step=followup_step or 0,
+            created_at=now,
+            updated_at=now,
+        )
+        for item in items
+    ]
+    payloads = [
+        {
+            "subject": item.subject,
+            "text": item.body,
+            "html": item.html,
+            "from_email": sender.from_email,
+            "from_name": sender.from_name,
+            "batch_id": batch_id,
+        }
+        for item in items
+    ]
+    if outbox:
+        message_ids = enqueue_messages(db, "email", messages, payloads)
+        return [
+            SendResult(message_id=message_id, recipient=item.recipient, status="queued")
+            for item, message_id in zip(items, message_ids)
+        ]
+    message_ids = insert_messages(db, messages)
+
+    deliveries = [
+        Delivery(
+            message_id=message_id,
+            recipient=item.recipient,
+            customer_id=item.customer_id,
+            payload=payload,
+        )
+        for item, message_id, payload in zip(items, message_ids, payloads)
+    ]
+    return deliver_email(
+        db,
+        sendgrid=sendgrid,
+        deliveries=deliveries,
+        marketing_campaign_id=marketing_campaign_id,
+        campaign_step_id=campaign_step_id,
         created_at=now,
-        updated_at=now,
+        mapper=mapper,
     )
-    db.add(message)
-    db.commit()
-    db.refresh(message)
-
-    custom_args = {"local_message_id": str(message.id), "batch_id": batch_id}
-    try:
-        status_code, message_id = sendgrid.send_email(
-            to_email=recipient,
-            subject=subject,
-            text=text,
-            html=html_payload,
-            custom_args=custom_args,
-            from_email=sender.from_email,
-            from_name=sender.from_name,
+
+
+def deliver_email(
+    db: Session,
+    *,
+    sendgrid,
+    deliveries: Sequence[Delivery],
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+    mapper: Mapper = map_sequential,
+) -> List[SendResult]:
+    """Send already-persisted queued emails and record the outcomes.
+
+    Deliveries with identical content and sender go out as personalizations of
+    one request, up to ``SENDGRID_BATCH_SIZE`` each.
+    """
+    chunk_size = max(1, min(settings.sendgrid_batch_size, MAX_PERSONALIZATIONS))
+    groups: Dict[Tuple[Any, ...], List[int]] = {}
+    for index, delivery in enumerate(deliveries):
+        payload = delivery.payload
+        key = tuple(
+            payload.get(field) for field in ("subject", "text", "html", "from_email", "from_name")
         )
+        groups.setdefault(key, []).append(index)
+    chunks = [
+        indexes[offset:offset + chunk_size]
+        for indexes in groups.values()
+        for offset in range(0, len(indexes), chunk_size)
+    ]
+
+    def _send(chunk: List[int]) -> Outcome:
+        payload = deliveries[chunk[0]].payload
+        html_payload = payload.get("html")
+        if not html_payload and payload.get("text"):
+            html_payload = text_to_html(payload["text"])
+        recipients = [
+            (
+                deliveries[index].recipient,
+                {
+                    "local_message_id": str(deliveries[index].message_id),
+                    "batch_id": deliveries[index].payload.get("batch_id") or "",
+                },
+            )
+            for index in chunk
+        ]
+        try:
+            status_code, message_id = sendgrid.send_email_batch(
+                recipients=recipients,
+                subject=payload.get("subject") or "",
+                text=payload.get("text"),
+                html=html_payload,
+                from_email=payload.get("from_email"),
+                from_name=payload.get("from_name"),
+            )
+        except Exception as exc:
+            return failure_outcome(exc)
         if 200 <= status_code < 300:
-            message.status = "accepted"
-            message.provider_message_id = message_id
-        else:
-            message.status = "failed"
-            message.error = f"SendGrid status {status_code}"
-    except Exception as exc:
-        message.status = "failed"
-        message.error = str(exc)
-
-    message.updated_at = datetime.utcnow()
-    db.add(message)
-
-    if marketing_campaign_id and campaign_step_id and customer_id:
-        execution = CampaignStepExecution(
-            campaign_id=marketing_campaign_id,
-            step_id=campaign_step_id,
-            customer_id=customer_id,
-            channel="EMAIL",
-            status=message.status,
-            message_id=message.id,
-            created_at=now,
-            updated_at=message.updated_at,
-        )
-        db.add(execution)
-
-    if customer_id:
-        customer = db.query(Customer).filter(Customer.id == customer_id).first()
-        if customer:
-            customer.email_sent_count = (customer.email_sent_count or 0) + 1
-            if marketing_campaign_id:
-                customer.has_marketed = True
-                customer.last_campaign_id = marketing_campaign_id
-                customer.last_marketed_at = now
-            customer.last_email_status = "failed" if message.status == "failed" else "sent"
-            customer.updated_at = datetime.utcnow()
-            db.add(customer)
+            return Outcome("accepted", message_id)
+        return Outcome("failed", None, f"SendGrid status {status_code}")
 
-    db.commit()
+    outcomes: List[Optional[Outcome]] = [None] * len(deliveries)
+    for chunk, outcome in zip(chunks, mapper(chunks, _send)):
+        for index in chunk:
+            outcomes[index] = outcome
 
-    return SendResult(
-        message_id=message.id,
-        recipient=recipient,
-        status=message.status,
-        provider_message_id=message.provider_message_id,
-        error=message.error,
+    return complete_deliveries(
+        db,
+        channel="email",
+        deliveries=deliveries,
+        outcomes=outcomes,
+        marketing_campaign_id=marketing_campaign_id,
+        campaign_step_id=campaign_step_id,
+        created_at=created_at,
     )
 
 
-def dispatch_email_campaign(db: Session, campaign: EmailCampaign) -> None:
-    """Dispatch an email campaign to all recipients."""
+def dispatch_email_campaign(
+    db: Session,
+    campaign: EmailCampaign,
+    budget_seconds: Optional[float] = None,
+    lost: Optional[threading.Event] = None,
+) -> None:
+    """Dispatch slices of an email campaign until ``budget_seconds`` have passed.
+
+    ``budget_seconds`` defaults to one scheduler interval, so a tick keeps
+    sending while its lease is held instead of stopping after one slice; at
+    least one slice is always dispatched. Recipients already recorded in the
+    dispatch ledger are skipped. ``lost`` is the event from ``hold_lease``;
+    once it is set nothing more is claimed and the campaign status is left to
+    the new lease holder.
+    """
     if campaign.status not in {"scheduled", "running"}:
         return
     if not campaign.subject:
@@ -229,7 +358,7 @@ def dispatch_email_campaign(db: Session, campaign: EmailCampaign) -> None:
         db.commit()
         return
 
-    recipients = deserialize_json_list(campaign.recipients)
+    recipients = unique_recipients(deserialize_json_list(campaign.recipients))
     sender = _resolve_email_sender(db, campaign.from_email)
     if not sender:
         campaign.status = "failed"
@@ -239,20 +368,66 @@ def dispatch_email_campaign(db: Session, campaign: EmailCampaign) -> None:
         db.commit()
         return
 
+    # Resolve the client before claiming, so missing credentials leave the ledger untouched.
     sendgrid = ensure_sendgrid()
-    batch_id = f"email_campaign_{campaign.id}_{uuid4().hex}"
-    for recipient in recipients:
-        send_email_outbound(
-            db,
-            sendgrid=sendgrid,
-            recipient=recipient,
-            subject=campaign.subject,
-            text=campaign.text,
-            html=campaign.html,
-            batch_id=batch_id,
-            sender=sender,
-            campaign_id=campaign.id,
+    slice_size = settings.campaign_dispatch_slice_size
+    if budget_seconds is None:
+        budget_seconds = settings.email_scheduler_interval_seconds
+    deadline = time.monotonic() + budget_seconds
+
+    while True:
+        if lease_lost(lost):
+            return
+        if provider_paused("sendgrid", sender.from_email):
+            # Stay running; the scheduler resumes once the breaker lets a probe through.
+            return
+        positions = pending_positions(
+            db, "email", campaign.id, recipients, slice_size + 1, start=campaign.dispatch_offset or 0
         )
+        is_last_slice = len(positions) <= slice_size
+        positions = positions[:slice_size]
+        pending = claim_recipients(db, "email", campaign.id, [recipient for _, recipient in positions])
+        if positions:
+            campaign.dispatch_offset = positions[-1][0] + 1
+            db.add(campaign)
+            db.commit()
+
+        if pending:
+            results = send_email_outbound_batch(
+                db,
+                sendgrid=sendgrid,
+                items=[
+                    OutboundItem(
+                        recipient=recipient,
+                        subject=campaign.subject,
+                        body=campaign.text,
+                        html=campaign.html,
+                    )
+                    for recipient in pending
+                ],
+                batch_id=f"email_campaign_{campaign.id}_{uuid4().hex}",
+                sender=sender,
+                campaign_id=campaign.id,
+            )
+            record_dispatch_results(
+                db, "email", campaign.id, [(result.recipient, result) for result in results]
+            )
+
+        if is_last_slice:
+            if lease_lost(lost):
+                return
+            skipped = first_pending(db, "email", campaign.id, recipients)
+            if skipped is None:
+                break
+            campaign.dispatch_offset = skipped
+            db.add(campaign)
+            db.commit()
+        if time.monotonic() >= deadline:
+            return
+        # Pick up a pause or cancel issued while the slice was sending.
+        db.refresh(campaign)
+        if campaign.status not in {"scheduled", "running"}:
+            return
 
     if campaign.followup_enabled:
         campaign.status = "followup"
@@ -264,88 +439,95 @@ def dispatch_email_campaign(db: Session, campaign: EmailCampaign) -> None:
     db.commit()
 
 
-def dispatch_email_followups(db: Session, now: datetime) -> None:
-    """Process followup emails for campaigns."""
-    campaigns = (
-        db.query(EmailCampaign)
+def _dispatch_email_followup(db: Session, campaign: EmailCampaign, now: datetime) -> None:
+    """Simplified followup logic for a single campaign."""
+    delay_minutes = campaign.followup_delay_minutes or 60
+    threshold = now - timedelta(minutes=delay_minutes)
+    condition = (campaign.followup_condition or "unread").lower()
+
+    initial_messages = (
+        db.query(Message)
         .filter(
-            EmailCampaign.status == "followup",
-            EmailCampaign.followup_enabled.is_(True),
+            Message.campaign_id == campaign.id,
+            Message.direction == "outbound",
+            Message.followup_step == 0,
         )
         .all()
     )
-    for campaign in campaigns:
-        # Simplified followup logic
-        delay_minutes = campaign.followup_delay_minutes or 60
-        threshold = now - timedelta(minutes=delay_minutes)
-        condition = (campaign.followup_condition or "unread").lower()
 
-        initial_messages = (
-            db.query(Message)
-            .filter(
+    candidates = [
+        msg
+        for msg in initial_messages
+        if msg.created_at <= threshold and not (condition == "unread" and msg.read_at is not None)
+    ]
+    followed_up = set()
+    for start in range(0, len(candidates), _FOLLOWUP_LOOKUP_CHUNK):
+        chunk = [msg.id for msg in candidates[start : start + _FOLLOWUP_LOOKUP_CHUNK]]
+        followed_up.update(
+            parent_id
+            for (parent_id,) in db.query(Message.parent_message_id).filter(
                 Message.campaign_id == campaign.id,
-                Message.direction == "outbound",
-                Message.followup_step == 0,
+                Message.followup_step == 1,
+                Message.parent_message_id.in_(chunk),
             )
-            .all()
         )
+    due_messages = [msg for msg in candidates if msg.id not in followed_up]
 
-        due_messages = []
-        for msg in initial_messages:
-            if msg.created_at > threshold:
-                continue
-            has_followup = (
-                db.query(Message)
-                .filter(
-                    Message.campaign_id == campaign.id,
-                    Message.parent_message_id == msg.id,
-                    Message.followup_step == 1,
-                )
-                .first()
-            )
-            if has_followup:
-                continue
-            if condition == "unread" and msg.read_at is not None:
-                continue
-            due_messages.append(msg)
-
-        if not due_messages:
-            # Check if all messages have followups
-            total_initial = len(initial_messages)
-            total_followups = (
-                db.query(Message)
-                .filter(Message.campaign_id == campaign.id, Message.followup_step == 1)
-                .count()
-            )
-            if total_followups >= total_initial:
-                campaign.status = "completed"
-                campaign.completed_at = now
-                campaign.updated_at = now
-                db.add(campaign)
-                db.commit()
-            continue
-
-        sender = _resolve_email_sender(db, campaign.from_email)
-        if not sender:
-            continue
-        sendgrid = ensure_sendgrid()
-        batch_id = f"email_followup_{campaign.id}_{uuid4().hex}"
-        followup_subject = campaign.followup_subject or f"Re: {campaign.subject}"
-
-        for msg in due_messages:
-            send_email_outbound(
-                db,
-                sendgrid=sendgrid,
+    if not due_messages:
+        # Check if all messages have followups
+        total_initial = len(initial_messages)
+        total_followups = (
+            db.query(Message)
+            .filter(Message.campaign_id == campaign.id, Message.followup_step == 1)
+            .count()
+        )
+        if total_followups >= total_initial:
+            campaign.status = "completed"
+            campaign.completed_at = now
+            campaign.updated_at = now
+            db.add(campaign)
+            db.commit()
+        return
+
+    sender = _resolve_email_sender(db, campaign.from_email)
+    if not sender or provider_paused("sendgrid", sender.from_email):
+        return
+    sendgrid = ensure_sendgrid()
+    batch_id = f"email_followup_{campaign.id}_{uuid4().hex}"
+    followup_subject = campaign.followup_subject or f"Re: {campaign.subject}"
+
+    send_email_outbound_batch(
+        db,
+        sendgrid=sendgrid,
+        items=[
+            OutboundItem(
                 recipient=msg.to_address,
                 subject=followup_subject,
-                text=campaign.followup_text,
+                body=campaign.followup_text,
                 html=campaign.followup_html,
-                batch_id=batch_id,
-                sender=sender,
-                campaign_id=campaign.id,
                 parent_message_id=msg.id,
-                followup_step=1,
             )
+            for msg in due_messages
+        ],
+        batch_id=batch_id,
+        sender=sender,
+        campaign_id=campaign.id,
+        followup_step=1,
+    )
+
+
+def dispatch_email_followups(db: Session, now: datetime) -> None:
+    """Process followup emails for campaigns leased by this worker."""
+    campaigns = claim_due_rows(
+        db,
+        EmailCampaign,
+        EmailCampaign.status == "followup",
+        EmailCampaign.followup_enabled.is_(True),
+    )
+    for campaign in campaigns:
+        with hold_lease(EmailCampaign, campaign.id) as held:
+            if held:
+                _dispatch_email_followup(db, campaign, now)
 
 
 @router.get("/api/email/senders", response_model=EmailSendersResponse)
@@ -418,7 +600,6 @@ def send_email(
     if not request.text and not request.html:
         raise HTTPException(status_code=400, detail="text or html is required")
 
-    sendgrid = ensure_sendgrid()
     batch_id = uuid4().hex
     results: List[SendResult] = []
     sender = _resolve_email_sender(db, request.from_email)
@@ -427,6 +608,27 @@ def send_email(
     if not sender:
         raise HTTPException(status_code=400, detail="SENDGRID_FROM_EMAIL is not configured")
 
+    use_outbox = request.outbox if request.outbox is not None else settings.outbox_enabled
+    if use_outbox:
+        results = send_email_outbound_batch(
+            db,
+            sendgrid=None,
+            items=[
+                OutboundItem(
+                    recipient=recipient,
+                    subject=request.subject,
+                    body=request.text,
+                    html=request.html,
+                )
+                for recipient in request.recipients
+            ],
+            batch_id=batch_id,
+            sender=sender,
+            outbox=True,
+        )
+        return SendResponse(batch_id=batch_id, channel="email", results=results)
+
+    sendgrid = ensure_sendgrid()
     for recipient in request.recipients:
         results.append(
             send_email_outbound(
@@ -502,6 +704,8 @@ def update_email_campaign(
         campaign.name = payload.name.strip()
     if payload.recipients is not None:
         campaign.recipients = serialize_json_list(payload.recipients)
+        # The ledger still skips anyone already sent to.
+        campaign.dispatch_offset = 0
     if payload.subject is not None:
         campaign.subject = payload.subject
     if payload.text is not None:
@@ -549,7 +753,9 @@ def start_email_campaign(
     campaign.updated_at = datetime.utcnow()
     db.add(campaign)
     db.commit()
-    dispatch_email_campaign(db, campaign)
+    with hold_lease(EmailCampaign, campaign.id) as held:
+        if held:
+            dispatch_email_campaign(db, campaign, budget_seconds=0, lost=held)
     db.refresh(campaign)
     return _email_campaign_to_item(campaign)
 
@@ -1,7 +1,9 @@
 """Marketing campaign routes."""
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from uuid import uuid4
+import threading
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
@@ -10,10 +12,10 @@ from app.config import settings
 from app.db import get_db
 from app.models import (
     ApiKey,
+    CampaignAudience,
     CampaignStep,
     CampaignStepExecution,
     Customer,
-    CustomerGroupMember,
     MarketingCustomerState,
     MarketingCampaign,
     Message,
@@ -36,23 +38,46 @@ from app.schemas import (
     MarketingCustomerProgressResponse,
     MarketingCustomerStateItem,
     MarketingCampaignUpdate,
+    SendResult,
 )
 from app.dependencies import require_api_key, ensure_sendgrid, ensure_twilio
+from app.services.circuit_breaker import provider_paused
+from app.audience import (
+    advance_audience,
+    audience_progress,
+    due_after,
+    due_audience,
+    finish_audience,
+    has_active_audience,
+    has_pending_audience,
+    materialize_audience,
+    next_step,
+    resume_from_executions,
+)
+from app.dispatcher import (
+    claim_recipients,
+    ledger_outcomes,
+    pending_recipients,
+    record_dispatch_results,
+)
+from app.leases import hold_lease, lease_lost
+from app.outbound import OutboundItem
+from app.segments import segment_filters
+from app.templating import CompiledTemplate, compile_message_template
 from app.utils import (
     serialize_json_list,
     serialize_json_dict,
     deserialize_json_list,
     deserialize_json_dict,
     deserialize_tags,
-    filter_customers_by_rules,
     build_customer_context,
-    render_message_template,
 )
 
 
 router = APIRouter(tags=["marketing"])
 
 _ALLOWED_STEP_CHANNELS = {"EMAIL", "WHATSAPP", "SMS"}
+_STEP_ADDRESS_FIELDS = {"EMAIL": "email", "WHATSAPP": "whatsapp", "SMS": "mobile"}
 
 
 def _normalize_step_channel(channel: str) -> str:
@@ -146,7 +171,7 @@ def _marketing_campaign_to_item(
         created_by=campaign.created_by,
         started_at=campaign.started_at,
         completed_at=campaign.completed_at,
-        total_customers=stats.get("total_customers", 0),
+        total_customers=stats.get("total_customers", campaign.audience_size or 0),
         success_count=stats.get("success_count", 0),
         failed_count=stats.get("failed_count", 0),
         delivered_count=stats.get("delivered_count", 0),
@@ -160,8 +185,239 @@ def _marketing_campaign_to_item(
     )
 
 
-def dispatch_marketing_campaign(db: Session, campaign: MarketingCampaign, now: datetime) -> None:
-    """Dispatch a marketing campaign - simplified implementation."""
+@dataclass
+class _StepPlan:
+    """One step's send inputs, resolved once per tick."""
+
+    step: CampaignStep
+    channel: str
+    subject: CompiledTemplate
+    content: CompiledTemplate
+    address_field: Optional[str]
+    batch_id: str
+
+    def address(self, customer: Customer) -> Optional[str]:
+        return getattr(customer, self.address_field) if self.address_field else None
+
+    def build_items(self, customers: List[Customer]) -> List[OutboundItem]:
+        """Render the step for ``customers``, which must all have an address on the channel."""
+        contexts = [build_customer_context(customer) for customer in customers]
+        bodies = self.content.render_many(contexts)
+        subjects: List[Optional[str]] = [None] * len(customers)
+        if self.channel == "EMAIL":
+            subjects = self.subject.render_many(contexts)
+        return [
+            OutboundItem(
+                recipient=self.address(customer),
+                subject=subject,
+                body=body,
+                customer_id=customer.id,
+            )
+            for customer, subject, body in zip(customers, subjects, bodies)
+        ]
+
+
+class _MarketingDispatch:
+    """Per-tick cache of the templates, step plans and provider senders of a campaign."""
+
+    def __init__(self, db: Session, campaign: MarketingCampaign, steps: List[CampaignStep]) -> None:
+        self.db = db
+        self.campaign = campaign
+        self.steps = steps
+        template_ids = {step.template_id for step in steps if step.template_id}
+        self._templates: Dict[int, MessageTemplate] = {}
+        if template_ids:
+            self._templates = {
+                template.id: template
+                for template in db.query(MessageTemplate).filter(
+                    MessageTemplate.id.in_(template_ids)
+                )
+            }
+        self._plans: Dict[int, _StepPlan] = {}
+        self._senders: Dict[str, Optional[Tuple[Callable[..., List[SendResult]], Dict[str, Any]]]] = {}
+
+    def plan(self, step: CampaignStep) -> _StepPlan:
+        plan = self._plans.get(step.id)
+        if plan is None:
+            template = self._templates.get(step.template_id) if step.template_id else None
+            channel = step.channel.upper()
+            plan = self._plans[step.id] = _StepPlan(
+                step=step,
+                channel=channel,
+                subject=compile_message_template(
+                    step.subject or (template.subject if template else "") or ""
+                ),
+                content=compile_message_template(
+                    step.content or (template.content if template else "") or ""
+                ),
+                address_field=_STEP_ADDRESS_FIELDS.get(channel),
+                batch_id=f"marketing_{self.campaign.id}_{uuid4().hex}",
+            )
+        return plan
+
+    def sender(self, channel: str) -> Optional[Tuple[Callable[..., List[SendResult]], Dict[str, Any]]]:
+        """The batch send function and its provider arguments; ``None`` without a sender."""
+        if channel not in self._senders:
+            self._senders[channel] = self._resolve_sender(channel)
+        return self._senders[channel]
+
+    def _resolve_sender(
+        self, channel: str
+    ) -> Optional[Tuple[Callable[..., List[SendResult]], Dict[str, Any]]]:
+        if channel == "EMAIL":
+            from app.routes.email import send_email_outbound_batch, _resolve_email_sender
+            sendgrid = ensure_sendgrid()
+            sender = _resolve_email_sender(self.db, None)
+            if not sender:
+                return None
+            return send_email_outbound_batch, {"sendgrid": sendgrid, "sender": sender}
+        if channel == "WHATSAPP":
+            from app.routes.whatsapp import send_whatsapp_outbound_batch, _resolve_whatsapp_sender
+            twilio = ensure_twilio()
+            from_address = _resolve_whatsapp_sender(self.db, None)
+            if not from_address:
+                return None
+            return send_whatsapp_outbound_batch, {"twilio": twilio, "from_address": from_address}
+        if channel == "SMS":
+            from app.routes.sms import send_sms_outbound_batch
+            twilio = ensure_twilio()
+            from_number = settings.twilio_sms_from
+            messaging_service_sid = settings.twilio_sms_messaging_service_sid
+            if not from_number and not messaging_service_sid:
+                return None
+            return send_sms_outbound_batch, {
+                "twilio": twilio,
+                "from_number": from_number,
+                "messaging_service_sid": messaging_service_sid,
+            }
+        return None
+
+
+def _send_marketing_step(
+    dispatch: _MarketingDispatch, plan: _StepPlan, items: List[OutboundItem]
+) -> Optional[List[SendResult]]:
+    """Send one step to a chunk of customers; ``None`` when no sender is configured."""
+    if not items:
+        return []
+    resolved = dispatch.sender(plan.channel)
+    if resolved is None:
+        return None
+    send_batch, provider_args = resolved
+    step = plan.step
+    extra: Dict[str, Any] = {}
+    if plan.channel == "WHATSAPP":
+        extra = {
+            "content_sid": step.content_sid,
+            "content_variables": deserialize_json_dict(step.content_variables),
+        }
+    return send_batch(
+        dispatch.db,
+        items=items,
+        batch_id=plan.batch_id,
+        marketing_campaign_id=dispatch.campaign.id,
+        campaign_step_id=step.id,
+        message_template_id=step.template_id,
+        **provider_args,
+        **extra,
+    )
+
+
+def _dispatch_marketing_step(
+    dispatch: _MarketingDispatch, step: CampaignStep, customer_ids: List[int]
+) -> None:
+    """Send ``step`` to the due ``customer_ids`` and schedule their following step."""
+    db = dispatch.db
+    campaign = dispatch.campaign
+    plan = dispatch.plan(step)
+    if provider_paused("sendgrid" if plan.channel == "EMAIL" else "twilio"):
+        # Stay due; the scheduler resumes once the breaker lets a probe through.
+        return
+    # Resolve the provider before claiming: missing credentials raise here and
+    # leave the customers due instead of claimed without a message.
+    dispatch.sender(plan.channel)
+    now = datetime.utcnow()
+    next_run_at = due_after(dispatch.steps, step.order_no, now)
+
+    keys = [str(customer_id) for customer_id in customer_ids]
+    pending = pending_recipients(db, "marketing", campaign.id, keys, len(keys), step_id=step.id)
+    if len(pending) < len(keys):
+        # Claimed by an earlier tick that stopped before advancing the audience.
+        claimed = set(pending)
+        advance_audience(
+            db,
+            campaign.id,
+            step,
+            [
+                (int(recipient), status, message_id)
+                for recipient, status, message_id in ledger_outcomes(
+                    db,
+                    "marketing",
+                    campaign.id,
+                    [key for key in keys if key not in claimed],
+                    step_id=step.id,
+                )
+            ],
+            now,
+            next_run_at,
+        )
+        db.commit()
+    pending = claim_recipients(db, "marketing", campaign.id, pending, step_id=step.id)
+    if not pending:
+        return
+
+    # Customers outside the step's own filter_rules pass through it without a message.
+    customers_by_key = {
+        str(customer.id): customer
+        for customer in db.query(Customer).filter(
+            Customer.id.in_([int(key) for key in pending]),
+            *segment_filters(deserialize_json_dict(step.filter_rules)),
+        )
+    }
+
+    reachable: List[Customer] = []
+    item_keys: List[str] = []
+    skipped = []
+    unsent: List[Tuple[int, Optional[str], Optional[int]]] = []
+    for customer_key in pending:
+        customer = customers_by_key.get(customer_key)
+        if customer is None or not plan.address(customer):
+            skipped.append((customer_key, None))
+            unsent.append((int(customer_key), "filtered" if customer is None else "skipped", None))
+            continue
+        reachable.append(customer)
+        item_keys.append(customer_key)
+    items = plan.build_items(reachable)
+
+    results = _send_marketing_step(dispatch, plan, items) or [None] * len(item_keys)
+    sent = [
+        (int(key), result.status if result else "failed", result.message_id if result else None)
+        for key, result in zip(item_keys, results)
+    ]
+    advance_audience(db, campaign.id, step, sent + unsent, now, next_run_at)
+    record_dispatch_results(
+        db,
+        "marketing",
+        campaign.id,
+        list(zip(item_keys, results)) + skipped,
+        step_id=step.id,
+    )
+
+
+def dispatch_marketing_campaign(
+    db: Session,
+    campaign: MarketingCampaign,
+    now: datetime,
+    lost: Optional[threading.Event] = None,
+) -> None:
+    """Run the due part of a marketing campaign's journey.
+
+    The audience is snapshotted into ``campaign_audience`` on the first call,
+    due for the first step after its ``delay_days``. Each tick takes at most
+    ``CAMPAIGN_DISPATCH_SLICE_SIZE`` members whose next step is due, sends it,
+    and schedules the step after it ``delay_days`` later. The campaign
+    completes once no unpaused member has a step left. ``lost`` is the event
+    from ``hold_lease``; the tick stops between steps once it is set.
+    """
     if campaign.status not in {"DRAFT", "RUNNING"}:
         return
     
@@ -180,126 +436,44 @@ def dispatch_marketing_campaign(db: Session, campaign: MarketingCampaign, now: d
         db.commit()
         return
 
-    # Load customers
-    customer_ids = deserialize_json_list(campaign.target_customer_ids)
-    if customer_ids:
-        customers = db.query(Customer).filter(Customer.id.in_(customer_ids)).all()
-    else:
-        customers = db.query(Customer).all()
-    
-    filter_rules = deserialize_json_dict(campaign.filter_rules)
-    raw_group_ids = filter_rules.pop("group_ids", None)
-    if raw_group_ids is None:
-        raw_group_ids = filter_rules.pop("group_id", None)
-    group_ids: List[int] = []
-    if isinstance(raw_group_ids, list):
-        group_ids = [int(v) for v in raw_group_ids if str(v).isdigit()]
-    elif raw_group_ids is not None and str(raw_group_ids).isdigit():
-        group_ids = [int(raw_group_ids)]
-    if group_ids:
-        member_ids = {
-            row[0]
-            for row in db.query(CustomerGroupMember.customer_id)
-            .filter(CustomerGroupMember.group_id.in_(group_ids))
-            .all()
-        }
-        if member_ids:
-            customers = [customer for customer in customers if customer.id in member_ids]
-        else:
-            customers = []
-    eligible_customers = filter_customers_by_rules(customers, filter_rules)
-
-    if not eligible_customers:
-        campaign.status = "COMPLETED"
-        campaign.completed_at = now
-        campaign.updated_at = now
-        db.add(campaign)
-        db.commit()
+    # Snapshot the audience on the first dispatch
+    if campaign.audience_built_at is None:
+        first_run_at = now + timedelta(days=steps[0].delay_days or 0)
+        if not materialize_audience(db, campaign, first_run_at, now):
+            campaign.status = "COMPLETED"
+            campaign.completed_at = now
+            campaign.updated_at = now
+            db.add(campaign)
+            db.commit()
+            return
+        resume_from_executions(db, campaign.id, steps)
+    if not has_active_audience(db, campaign.id):
         return
 
-    paused_ids = _load_paused_customer_ids(db, campaign.id)
-    customers = [customer for customer in eligible_customers if customer.id not in paused_ids]
-    if not customers:
+    slice_size = settings.campaign_dispatch_slice_size
+    due = due_audience(db, campaign.id, now, slice_size + 1)
+    by_step: Dict[int, List[int]] = {}
+    finished: List[int] = []
+    for customer_id, step_order in due[:slice_size]:
+        step = next_step(steps, step_order)
+        if step is None:
+            finished.append(customer_id)
+        else:
+            by_step.setdefault(step.id, []).append(customer_id)
+    if lease_lost(lost):
+        return
+    if finished:
+        finish_audience(db, campaign.id, finished)
+        db.commit()
+    dispatch = _MarketingDispatch(db, campaign, steps)
+    steps_by_id = {step.id: step for step in steps}
+    for step_id, customer_ids in by_step.items():
+        if lease_lost(lost):
+            return
+        _dispatch_marketing_step(dispatch, steps_by_id[step_id], customer_ids)
+
+    if lease_lost(lost) or len(due) > slice_size or has_pending_audience(db, campaign.id):
         return
-
-    # Process first step for simplicity
-    step = steps[0]
-    channel = step.channel.upper()
-    
-    for customer in customers:
-        context = build_customer_context(customer)
-        
-        if channel == "EMAIL" and customer.email:
-            from app.routes.email import send_email_outbound, _resolve_email_sender
-            sendgrid = ensure_sendgrid()
-            sender = _resolve_email_sender(db, None)
-            if sender:
-                template = None
-                if step.template_id:
-                    template = db.query(MessageTemplate).filter(MessageTemplate.id == step.template_id).first()
-                subject = render_message_template(step.subject or (template.subject if template else ""), context)
-                content = render_message_template(step.content or (template.content if template else ""), context)
-                send_email_outbound(
-                    db,
-                    sendgrid=sendgrid,
-                    recipient=customer.email,
-                    subject=subject,
-                    text=content,
-                    html=None,
-                    batch_id=f"marketing_{campaign.id}_{uuid4().hex}",
-                    sender=sender,
-                    marketing_campaign_id=campaign.id,
-                    campaign_step_id=step.id,
-                    message_template_id=step.template_id,
-                    customer_id=customer.id,
-                )
-        elif channel == "WHATSAPP" and customer.whatsapp:
-            from app.routes.whatsapp import send_whatsapp_outbound, _resolve_whatsapp_sender
-            twilio = ensure_twilio()
-            from_address = _resolve_whatsapp_sender(db, None)
-            if from_address:
-                template = None
-                if step.template_id:
-                    template = db.query(MessageTemplate).filter(MessageTemplate.id == step.template_id).first()
-                content = render_message_template(step.content or (template.content if template else ""), context)
-                send_whatsapp_outbound(
-                    db,
-                    twilio=twilio,
-                    recipient=customer.whatsapp,
-                    body=content,
-                    batch_id=f"marketing_{campaign.id}_{uuid4().hex}",
-                    from_address=from_address,
-                    content_sid=step.content_sid,
-                    content_variables=deserialize_json_dict(step.content_variables),
-                    marketing_campaign_id=campaign.id,
-                    campaign_step_id=step.id,
-                    message_template_id=step.template_id,
-                    customer_id=customer.id,
-                )
-        elif channel == "SMS" and customer.mobile:
-            from app.routes.sms import send_sms_outbound
-            twilio = ensure_twilio()
-            template = None
-            if step.template_id:
-                template = db.query(MessageTemplate).filter(MessageTemplate.id == step.template_id).first()
-            content = render_message_template(step.content or (template.content if template else ""), context)
-            from_number = settings.twilio_sms_from
-            messaging_service_sid = settings.twilio_sms_messaging_service_sid
-            if from_number or messaging_service_sid:
-                send_sms_outbound(
-                    db,
-                    twilio=twilio,
-                    recipient=customer.mobile,
-                    body=content,
-                    batch_id=f"marketing_{campaign.id}_{uuid4().hex}",
-                    from_number=from_number,
-                    messaging_service_sid=messaging_service_sid,
-                    marketing_campaign_id=campaign.id,
-                    campaign_step_id=step.id,
-                    message_template_id=step.template_id,
-                    customer_id=customer.id,
-                )
-
     campaign.status = "COMPLETED"
     campaign.completed_at = now
     campaign.updated_at = now
@@ -390,6 +564,9 @@ def delete_marketing_campaign(
     if not campaign:
         raise HTTPException(status_code=404, detail="campaign not found")
     item = _marketing_campaign_to_item(campaign)
+    db.query(CampaignAudience).filter(CampaignAudience.campaign_id == campaign_id).delete(
+        synchronize_session=False
+    )
     db.delete(campaign)
     db.commit()
     return item
@@ -412,7 +589,9 @@ def start_marketing_campaign(
     campaign.updated_at = now
     db.add(campaign)
     db.commit()
-    dispatch_marketing_campaign(db, campaign, now)
+    with hold_lease(MarketingCampaign, campaign.id) as held:
+        if held:
+            dispatch_marketing_campaign(db, campaign, now, lost=held)
     db.refresh(campaign)
     return _marketing_campaign_to_item(campaign)
 
@@ -754,7 +933,30 @@ def get_campaign_customer_progress(
     )
     step_order = {step.id: step.order_no for step in steps}
     step_channel = {step.id: step.channel for step in steps}
+    paused_ids = _load_paused_customer_ids(db, campaign_id)
+
+    if campaign.audience_built_at is not None:
+        items = [
+            MarketingCustomerProgressItem(
+                customer_id=member.customer_id,
+                name=customer.name if customer else None,
+                email=customer.email if customer else None,
+                whatsapp=customer.whatsapp if customer else None,
+                mobile=customer.mobile if customer else None,
+                last_step_id=member.last_step_id,
+                last_step_order=step_order.get(member.last_step_id) or None,
+                last_step_channel=step_channel.get(member.last_step_id),
+                last_message_status=message_status or member.status,
+                last_message_at=member.last_message_at,
+                paused=member.customer_id in paused_ids,
+            )
+            for member, customer, message_status in audience_progress(db, campaign_id)
+        ]
+        return MarketingCustomerProgressResponse(
+            campaign_id=campaign_id, total=len(items), customers=items
+        )
 
+    # Campaigns dispatched before audience snapshots existed
     messages = (
         db.query(Message)
         .filter(
@@ -792,7 +994,6 @@ def get_campaign_customer_progress(
     customer_ids = list(progress_map.keys())
     customers = db.query(Customer).filter(Customer.id.in_(customer_ids)).all()
     customer_map = {customer.id: customer for customer in customers}
-    paused_ids = _load_paused_customer_ids(db, campaign_id)
 
     items: List[MarketingCustomerProgressItem] = []
     for customer_id, info in progress_map.items():
@@ -1,13 +1,20 @@
 """Message history and chat routes."""
+import asyncio
 from datetime import datetime
+import json
 from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy import distinct, func, case
 from sqlalchemy.orm import Session
 
-from app.db import get_db
-from app.models import ApiKey, Message
+from app.conversations import ALL_CHANNELS, record_reads, unread_counts, user_address_expr
+from app.config import settings
+from app.db import SessionLocal, get_db
+from app.events import MESSAGES_READ, RESYNC, Event, event_bus, queue_event
+from app.models import ApiKey, Conversation, Message
+from app.pagination import NEXT_CURSOR_HEADER, keyset_page
 from app.services.twilio_client import normalize_whatsapp
 from app.schemas import (
     ChatHistoryResponse,
@@ -65,13 +72,6 @@ def _message_to_chat(message: Message) -> ChatMessage:
     )
 
 
-def _user_address_expr():
-    return case(
-        (Message.direction == "inbound", Message.from_address),
-        else_=Message.to_address,
-    )
-
-
 def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
     if not value:
         return None
@@ -87,6 +87,8 @@ def _load_chat_history(
     channel: Optional[str],
     limit: int,
     offset: int,
+    cursor: Optional[str] = None,
+    approximate_total: bool = False,
 ) -> ChatHistoryResponse:
     cleaned_user = address.strip()
     normalized_user = None
@@ -109,24 +111,41 @@ def _load_chat_history(
     if channel:
         query = query.filter(Message.channel == channel)
 
-    total = query.count()
-    unread_count = query.filter(Message.read_at.is_(None)).count()
-    messages = query.order_by(Message.created_at.desc()).offset(offset).limit(limit).all()
+    if approximate_total:
+        addresses = {cleaned_user, normalized_user} - {None}
+        total, unread_count = (
+            db.query(
+                func.coalesce(func.sum(Conversation.total_messages), 0),
+                func.coalesce(func.sum(Conversation.unread_count), 0),
+            )
+            .filter(
+                Conversation.user_address.in_(addresses),
+                Conversation.channel == (channel or ALL_CHANNELS),
+            )
+            .one()
+        )
+    else:
+        total = query.count()
+        unread_count = query.filter(Message.read_at.is_(None)).count()
+    messages, next_cursor = keyset_page(query, Message, limit=limit, cursor=cursor, offset=offset)
     return ChatHistoryResponse(
         messages=[_message_to_chat(m) for m in reversed(messages)],
-        total=total,
-        unread_count=unread_count,
+        total=int(total),
+        unread_count=int(unread_count),
+        next_cursor=next_cursor,
     )
 
 
 @router.get("/api/messages", response_model=List[MessageStatus])
 def list_messages(
+    response: Response,
     batch_id: Optional[str] = None,
     channel: Optional[str] = None,
     status: Optional[str] = None,
     direction: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     _: ApiKey = Depends(require_api_key("read")),
 ) -> List[MessageStatus]:
@@ -139,7 +158,9 @@ def list_messages(
         query = query.filter(Message.status == status)
     if direction:
         query = query.filter(Message.direction == direction)
-    messages = query.order_by(Message.created_at.desc()).offset(offset).limit(limit).all()
+    messages, next_cursor = keyset_page(query, Message, limit=limit, cursor=cursor, offset=offset)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return [_message_to_status(m) for m in messages]
 
 
@@ -158,16 +179,64 @@ def get_message(
 @router.get("/api/messages/batch/{batch_id}", response_model=List[MessageStatus])
 def get_batch_messages(
     batch_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     _: ApiKey = Depends(require_api_key("read")),
 ) -> List[MessageStatus]:
-    messages = (
-        db.query(Message)
-        .filter(Message.batch_id == batch_id)
-        .order_by(Message.created_at.desc())
+    """Messages of a batch, newest first; paged by cursor when ``limit`` is given."""
+    query = db.query(Message).filter(Message.batch_id == batch_id)
+    if limit is None:
+        messages = query.order_by(Message.created_at.desc(), Message.id.desc()).all()
+    else:
+        messages, next_cursor = keyset_page(query, Message, limit=limit, cursor=cursor)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [_message_to_status(m) for m in messages]
+
+
+def _list_conversations(
+    db: Session, channel: Optional[str], limit: int, offset: int
+) -> UserListResponse:
+    """Page through the conversation summary: one index scan plus one lookup for channels."""
+    channel_key = channel or ALL_CHANNELS
+    query = db.query(Conversation).filter(Conversation.channel == channel_key)
+    total = query.count()
+    rows = (
+        query.order_by(Conversation.last_message_at.desc(), Conversation.last_message_id.desc())
+        .offset(offset)
+        .limit(limit)
         .all()
     )
-    return [_message_to_status(m) for m in messages]
+    channels: Dict[str, List[str]] = {row.user_address: [] for row in rows}
+    if channel:
+        channels = {address: [channel] for address in channels}
+    elif channels:
+        for address, row_channel in (
+            db.query(Conversation.user_address, Conversation.channel)
+            .filter(
+                Conversation.user_address.in_(list(channels)),
+                Conversation.channel != ALL_CHANNELS,
+            )
+            .order_by(Conversation.channel)
+        ):
+            channels[address].append(row_channel)
+    return UserListResponse(
+        users=[
+            UserMessageStats(
+                user_address=row.user_address,
+                total_messages=row.total_messages,
+                unread_count=row.unread_count,
+                last_message_at=row.last_message_at,
+                last_message_id=row.last_message_id or None,
+                last_snippet=row.last_snippet,
+                channels=channels[row.user_address],
+            )
+            for row in rows
+        ],
+        total=total,
+    )
 
 
 @router.get("/api/chat/users", response_model=UserListResponse)
@@ -184,65 +253,48 @@ def list_chat_users(
     """List users with message stats for chat view."""
     from_datetime = _parse_datetime(created_from)
     to_datetime = _parse_datetime(created_to)
+    if not from_datetime and not to_datetime:
+        return _list_conversations(db, channel, limit, offset)
 
-    user_address_expr = _user_address_expr().label("user_address")
-    base_query = db.query(user_address_expr)
-
+    user_address = user_address_expr()
+    filters = [user_address.isnot(None), user_address != ""]
     if channel:
-        base_query = base_query.filter(Message.channel == channel)
+        filters.append(Message.channel == channel)
     if from_datetime:
-        base_query = base_query.filter(Message.created_at >= from_datetime)
+        filters.append(Message.created_at >= from_datetime)
     if to_datetime:
-        base_query = base_query.filter(Message.created_at <= to_datetime)
-    base_query = base_query.filter(user_address_expr.isnot(None), user_address_expr != "")
-
-    distinct_users = base_query.distinct().all()
-    total_users = len(distinct_users)
-    paginated_users = distinct_users[offset : offset + limit]
-
-    user_stats_list = []
-    for (user_address,) in paginated_users:
-        user_filter = (Message.to_address == user_address) | (
-            Message.from_address == user_address
+        filters.append(Message.created_at <= to_datetime)
+
+    total_users = db.query(func.count(distinct(user_address))).filter(*filters).scalar() or 0
+
+    # One grouped pass: stats, ordering and pagination all happen in SQL.
+    last_message_at = func.max(Message.created_at)
+    rows = (
+        db.query(
+            user_address.label("user_address"),
+            func.count(Message.id),
+            func.sum(case((Message.read_at.is_(None), 1), else_=0)),
+            last_message_at,
+            func.group_concat(distinct(Message.channel)),
         )
-        user_query = db.query(Message).filter(user_filter)
-
-        if channel:
-            user_query = user_query.filter(Message.channel == channel)
-        if from_datetime:
-            user_query = user_query.filter(Message.created_at >= from_datetime)
-        if to_datetime:
-            user_query = user_query.filter(Message.created_at <= to_datetime)
-
-        total_messages = user_query.count()
-        unread_count = user_query.filter(Message.read_at.is_(None)).count()
-
-        last_message = user_query.order_by(Message.created_at.desc()).first()
-        last_message_at = last_message.created_at if last_message else None
-
-        channels_query = db.query(Message.channel).filter(user_filter).distinct()
-        if channel:
-            channels_query = channels_query.filter(Message.channel == channel)
-        if from_datetime:
-            channels_query = channels_query.filter(Message.created_at >= from_datetime)
-        if to_datetime:
-            channels_query = channels_query.filter(Message.created_at <= to_datetime)
-
-        channels = [ch[0] for ch in channels_query.all()]
+        .filter(*filters)
+        .group_by(user_address)
+        .order_by(last_message_at.desc(), user_address)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
 
-        user_stats_list.append(
-            UserMessageStats(
-                user_address=user_address,
-                total_messages=total_messages,
-                unread_count=unread_count,
-                last_message_at=last_message_at,
-                channels=channels,
-            )
+    user_stats_list = [
+        UserMessageStats(
+            user_address=address,
+            total_messages=total_messages,
+            unread_count=int(unread_count or 0),
+            last_message_at=last_at,
+            channels=sorted(channels.split(",")) if channels else [],
         )
-
-    user_stats_list.sort(
-        key=lambda item: item.last_message_at or datetime.min, reverse=True
-    )
+        for address, total_messages, unread_count, last_at, channels in rows
+    ]
     return UserListResponse(users=user_stats_list, total=total_users)
 
 
@@ -252,11 +304,15 @@ def get_chat_history(
     channel: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    approximate_total: bool = False,
     db: Session = Depends(get_db),
     _: ApiKey = Depends(require_api_key("read")),
 ) -> ChatHistoryResponse:
     """Get chat history with a specific user/address."""
-    return _load_chat_history(db, address, channel, limit, offset)
+    return _load_chat_history(
+        db, address, channel, limit, offset, cursor, approximate_total
+    )
 
 
 @router.get("/api/chat/{user_address}", response_model=ChatHistoryResponse)
@@ -265,11 +321,15 @@ def get_chat_history_by_address(
     channel: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    approximate_total: bool = False,
     db: Session = Depends(get_db),
     _: ApiKey = Depends(require_api_key("read")),
 ) -> ChatHistoryResponse:
     """Compatibility alias for chat history by address."""
-    return _load_chat_history(db, user_address, channel, limit, offset)
+    return _load_chat_history(
+        db, user_address, channel, limit, offset, cursor, approximate_total
+    )
 
 
 @router.post("/api/chat/mark-read", response_model=MarkReadResponse)
@@ -280,26 +340,70 @@ def mark_messages_read(
 ) -> MarkReadResponse:
     """Mark messages as read."""
     now = datetime.utcnow()
-    updated_count = 0
-    
-    if payload.message_ids:
-        updated_count = (
-            db.query(Message)
-            .filter(Message.id.in_(payload.message_ids), Message.read_at.is_(None))
-            .update({"read_at": now, "updated_at": now}, synchronize_session=False)
-        )
-    elif payload.address:
-        query = db.query(Message).filter(
-            Message.from_address == payload.address,
-            Message.direction == "inbound",
-            Message.read_at.is_(None),
-        )
-        if payload.channel:
-            query = query.filter(Message.channel == payload.channel)
-        updated_count = query.update({"read_at": now, "updated_at": now}, synchronize_session=False)
-    
+    selected = Message.id.in_(payload.message_ids)
+    newly_read = unread_counts(db, selected)
+    updated_count = (
+        db.query(Message)
+        .filter(selected, Message.read_at.is_(None))
+        .update({"read_at": now, "updated_at": now}, synchronize_session=False)
+    )
+    record_reads(db, newly_read)
+    queue_event(db, MESSAGES_READ, ids=list(payload.message_ids))
     db.commit()
-    return MarkReadResponse(updated_count=updated_count)
+    return MarkReadResponse(updated=updated_count)
+
+
+def _event_matches(event: Event, channel: Optional[str], address: Optional[str]) -> bool:
+    if event["type"] in (RESYNC, MESSAGES_READ):
+        return True
+    if channel and event.get("channel") != channel:
+        return False
+    if address and event.get("user_address") != address:
+        return False
+    return True
+
+
+@router.get("/api/events")
+async def stream_events(
+    request: Request,
+    channel: Optional[str] = None,
+    address: Optional[str] = None,
+) -> StreamingResponse:
+    """Server-Sent Events for new messages, status changes and reads.
+
+    Optional ``channel`` and ``address`` narrow the stream to one channel or
+    conversation. A ``resync`` event means events were dropped for this
+    client and it should reload what it shows.
+    """
+    # Authenticate with a short-lived session so the stream does not pin a connection.
+    with SessionLocal() as db:
+        require_api_key("read")(request, db)
+    subscriber = event_bus.subscribe()
+
+    async def _stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=settings.events_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if _event_matches(event, channel, address):
+                    data = json.dumps(event, ensure_ascii=False, default=str)
+                    yield f"event: {event['type']}\ndata: {data}\n\n"
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/api/sms/stats", response_model=SmsStatsResponse)
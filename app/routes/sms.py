@@ -1,9 +1,14 @@
 """SMS messaging, contacts, groups and campaign routes (placeholder)."""
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from uuid import uuid4
 import csv
+import hashlib
 import io
+import json
+import threading
+import time
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from fastapi.responses import JSONResponse, StreamingResponse
@@ -14,8 +19,6 @@ from app.config import settings
 from app.db import get_db
 from app.models import (
     ApiKey,
-    CampaignStepExecution,
-    Customer,
     Message,
     SmsCampaign,
     SmsContact,
@@ -60,27 +63,58 @@ from app.schemas import (
     SmsTemplateItem,
     SmsTemplateListResponse,
     SmsTemplateUpdate,
+    SmsVariantStats,
 )
 from app.dependencies import require_api_key, ensure_twilio
+from app.services.circuit_breaker import provider_paused
+from app.sms_encoding import GSM7, UCS2, count_segments
+from app.suppression import invalidate_suppression_index
+from app.tags import has_any_tag, set_tags
+from app.dispatcher import (
+    DispatchReport,
+    TokenBucket,
+    claim_recipients,
+    first_pending,
+    map_paced,
+    pending_positions,
+    record_dispatch_results,
+)
+from app.leases import hold_lease, lease_lost
+from app.outbox import enqueue_messages
+from app.outbound import (
+    Delivery,
+    Mapper,
+    Outcome,
+    OutboundItem,
+    complete_deliveries,
+    failure_outcome,
+    insert_messages,
+    map_sequential,
+)
 from app.utils import (
     serialize_json_list,
     serialize_json_dict,
     deserialize_json_list,
     deserialize_json_dict,
-    serialize_tags,
     deserialize_tags,
     normalize_sms_phone,
     normalize_sms_phones,
-    is_opted_out,
+    opted_out_reasons,
     append_opt_out_text,
     build_sms_status_callback,
     render_sms_body,
+    render_sms_bodies,
     collect_sms_recipients,
 )
 
 
 router = APIRouter(tags=["sms"])
 
+_ESTIMATE_CHUNK = 1000
+_AB_BUCKETS = 100
+_AB_DEFAULT_SPLIT = 50
+_PRICE_SAMPLE = 1000
+
 
 def _sms_template_to_item(template: SmsTemplate) -> SmsTemplateItem:
     return SmsTemplateItem(
@@ -175,144 +209,265 @@ def send_sms_outbound(
     message_template_id: Optional[int] = None,
     customer_id: Optional[int] = None,
 ) -> SendResult:
-    now = datetime.utcnow()
-    
-    # Check opt-out status
-    opt_out_reason = is_opted_out(db, recipient)
-    if opt_out_reason:
-        message = Message(
-            batch_id=batch_id,
-            channel="sms",
-            to_address=recipient,
-            from_address=from_number or "",
-            body=body,
-            status="blocked",
-            error=f"recipient opted out: {opt_out_reason}",
-            direction="outbound",
-            campaign_id=campaign_id,
-            template_id=template_id,
-            variant=variant,
-            marketing_campaign_id=marketing_campaign_id,
-            campaign_step_id=campaign_step_id,
-            message_template_id=message_template_id,
-            customer_id=customer_id,
-            created_at=now,
-            updated_at=now,
-        )
-        db.add(message)
-        db.commit()
-        db.refresh(message)
-        if marketing_campaign_id and campaign_step_id and customer_id:
-            execution = CampaignStepExecution(
-                campaign_id=marketing_campaign_id,
-                step_id=campaign_step_id,
-                customer_id=customer_id,
-                channel="SMS",
-                status=message.status,
-                message_id=message.id,
-                created_at=now,
-                updated_at=message.updated_at,
+    """Send one SMS through ``send_sms_outbound_batch``."""
+    return send_sms_outbound_batch(
+        db,
+        twilio=twilio,
+        items=[
+            OutboundItem(
+                recipient=recipient, body=body, customer_id=customer_id, variant=variant
             )
-            db.add(execution)
-            db.commit()
-        return SendResult(
-            message_id=message.id,
-            recipient=recipient,
-            status="blocked",
-            error=message.error,
-        )
-
-    final_body = append_opt_out_text(body, append_opt_out_flag)
-    
-    message = Message(
+        ],
         batch_id=batch_id,
-        channel="sms",
-        to_address=recipient,
-        from_address=from_number or "",
-        body=final_body,
-        status="queued",
-        direction="outbound",
+        from_number=from_number,
+        messaging_service_sid=messaging_service_sid,
         campaign_id=campaign_id,
         template_id=template_id,
-        variant=variant,
+        append_opt_out_flag=append_opt_out_flag,
+        use_proxy=use_proxy,
         marketing_campaign_id=marketing_campaign_id,
         campaign_step_id=campaign_step_id,
         message_template_id=message_template_id,
-        customer_id=customer_id,
-        created_at=now,
-        updated_at=now,
-    )
-    db.add(message)
-    db.commit()
-    db.refresh(message)
+    )[0]
 
-    status_callback = build_sms_status_callback(message.id)
 
-    try:
-        message_sid = twilio.send_sms(
-            to_number=recipient,
-            body=final_body,
-            status_callback=status_callback,
-            from_number=from_number,
-            messaging_service_sid=messaging_service_sid,
-            use_proxy=use_proxy,
-        )
-        message.provider_message_id = message_sid
-        message.status = "sent"
-    except Exception as exc:
-        message.status = "failed"
-        message.error = str(exc)
-
-    message.updated_at = datetime.utcnow()
-    db.add(message)
-
-    if marketing_campaign_id and campaign_step_id and customer_id:
-        execution = CampaignStepExecution(
-            campaign_id=marketing_campaign_id,
-            step_id=campaign_step_id,
-            customer_id=customer_id,
-            channel="SMS",
-            status=message.status,
-            message_id=message.id,
-            created_at=now,
-            updated_at=message.updated_at,
+def send_sms_outbound_batch(
+    db: Session,
+    *,
+    twilio,
+    items: Sequence[OutboundItem],
+    batch_id: str,
+    from_number: Optional[str],
+    messaging_service_sid: Optional[str],
+    campaign_id: Optional[int] = None,
+    template_id: Optional[int] = None,
+    append_opt_out_flag: bool = True,
+    use_proxy: Optional[bool] = None,
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    message_template_id: Optional[int] = None,
+    mapper: Mapper = map_sequential,
+    outbox: bool = False,
+) -> List[SendResult]:
+    """Batched ``send_sms_outbound``: two commits per chunk instead of three per message.
+
+    Provider calls go through ``mapper`` (e.g. a paced worker pool) and never
+    touch ``db``. With ``outbox`` the messages are only queued for the outbox
+    workers and ``twilio`` may be ``None``.
+    """
+    now = datetime.utcnow()
+    blocked = opted_out_reasons(db, [item.recipient for item in items])
+    messages = []
+    for item in items:
+        reason = blocked.get(item.recipient)
+        messages.append(
+            Message(
+                batch_id=batch_id,
+                channel="sms",
+                to_address=item.recipient,
+                from_address=from_number or "",
+                body=item.body if reason else append_opt_out_text(item.body or "", append_opt_out_flag),
+                status="blocked" if reason else "queued",
+                error=f"recipient opted out: {reason}" if reason else None,
+                direction="outbound",
+                campaign_id=campaign_id,
+                template_id=template_id,
+                variant=item.variant,
+                marketing_campaign_id=marketing_campaign_id,
+                campaign_step_id=campaign_step_id,
+                message_template_id=message_template_id,
+                customer_id=item.customer_id,
+                created_at=now,
+                updated_at=now,
+            )
         )
-        db.add(execution)
-
-    if customer_id:
-        customer = db.query(Customer).filter(Customer.id == customer_id).first()
-        if customer:
-            customer.sms_sent_count = (customer.sms_sent_count or 0) + 1
-            if marketing_campaign_id:
-                customer.has_marketed = True
-                customer.last_campaign_id = marketing_campaign_id
-                customer.last_marketed_at = now
-            customer.last_sms_status = "failed" if message.status == "failed" else "sent"
-            customer.updated_at = datetime.utcnow()
-            db.add(customer)
+    payloads = [
+        None
+        if item.recipient in blocked
+        else {
+            "body": message.body,
+            "from_number": from_number,
+            "messaging_service_sid": messaging_service_sid,
+            "use_proxy": use_proxy,
+        }
+        for item, message in zip(items, messages)
+    ]
+    if outbox:
+        message_ids = enqueue_messages(db, "sms", messages, payloads)
+    else:
+        message_ids = insert_messages(db, messages)
+
+    results: List[SendResult] = []
+    deliveries = []
+    blocked_results = []
+    for index, item in enumerate(items):
+        reason = blocked.get(item.recipient)
+        if reason:
+            result = SendResult(
+                message_id=message_ids[index],
+                recipient=item.recipient,
+                status="blocked",
+                error=f"recipient opted out: {reason}",
+            )
+            blocked_results.append((result, item.customer_id))
+        else:
+            result = SendResult(
+                message_id=message_ids[index], recipient=item.recipient, status="queued"
+            )
+            deliveries.append(
+                Delivery(
+                    message_id=message_ids[index],
+                    recipient=item.recipient,
+                    customer_id=item.customer_id,
+                    payload=payloads[index],
+                )
+            )
+        results.append(result)
+    if outbox:
+        return results
+    return deliver_sms(
+        db,
+        twilio=twilio,
+        deliveries=deliveries,
+        blocked=blocked_results,
+        marketing_campaign_id=marketing_campaign_id,
+        campaign_step_id=campaign_step_id,
+        created_at=now,
+        mapper=mapper,
+    )
 
-    db.commit()
 
-    return SendResult(
-        message_id=message.id,
-        recipient=recipient,
-        status=message.status,
-        provider_message_id=message.provider_message_id,
-        error=message.error,
+def deliver_sms(
+    db: Session,
+    *,
+    twilio,
+    deliveries: Sequence[Delivery],
+    blocked: Sequence[Tuple[SendResult, Optional[int]]] = (),
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+    mapper: Mapper = map_sequential,
+) -> List[SendResult]:
+    """Send already-persisted queued SMS messages and record the outcomes."""
+
+    def _send(delivery: Delivery) -> Outcome:
+        payload = delivery.payload
+        try:
+            message_sid = twilio.send_sms(
+                to_number=delivery.recipient,
+                body=payload.get("body") or "",
+                status_callback=build_sms_status_callback(delivery.message_id),
+                from_number=payload.get("from_number"),
+                messaging_service_sid=payload.get("messaging_service_sid"),
+                use_proxy=payload.get("use_proxy"),
+            )
+            return Outcome("sent", message_sid, None)
+        except Exception as exc:
+            return failure_outcome(exc)
+
+    return complete_deliveries(
+        db,
+        channel="sms",
+        deliveries=deliveries,
+        outcomes=mapper(deliveries, _send),
+        blocked=blocked,
+        marketing_campaign_id=marketing_campaign_id,
+        campaign_step_id=campaign_step_id,
+        created_at=created_at,
     )
 
 
-def dispatch_sms_campaign(db: Session, campaign: SmsCampaign) -> None:
-    """Dispatch an SMS campaign to all recipients."""
-    if campaign.status not in {"scheduled", "running"}:
-        return
-    
+def _sms_campaign_body(db: Session, campaign: SmsCampaign) -> str:
     template = None
     if campaign.template_id:
         template = db.query(SmsTemplate).filter(SmsTemplate.id == campaign.template_id).first()
+    return campaign.message or (template.body if template else "")
+
+
+def _campaign_variants(campaign: SmsCampaign, body_source: str) -> Dict[Optional[str], str]:
+    """Body source per variant: ``A``/``B`` for A/B campaigns, else ``None``."""
+    if not (campaign.variant_a or campaign.variant_b):
+        return {None: body_source}
+    return {"A": campaign.variant_a or body_source, "B": campaign.variant_b or body_source}
+
+
+def _ab_variant(campaign_id: int, phone: str, split: int) -> str:
+    """``A`` for ``split`` percent of phones, else ``B``; the same on every run."""
+    digest = hashlib.blake2b(f"{campaign_id}:{phone}".encode("utf-8"), digest_size=8).digest()
+    return "A" if int.from_bytes(digest, "big") % _AB_BUCKETS < split else "B"
+
+
+def _render_campaign_bodies(
+    campaign: SmsCampaign,
+    sources: Dict[Optional[str], str],
+    recipients: Sequence[str],
+    contexts: Sequence[Dict[str, Any]],
+) -> List[Tuple[Optional[str], str]]:
+    """``(variant, body)`` per recipient, rendering each variant's template once."""
+    if None in sources:
+        variants: List[Optional[str]] = [None] * len(recipients)
+    else:
+        split = _AB_DEFAULT_SPLIT if campaign.ab_split is None else campaign.ab_split
+        split = min(max(split, 0), _AB_BUCKETS)
+        variants = [_ab_variant(campaign.id, recipient, split) for recipient in recipients]
+    bodies: List[str] = [""] * len(recipients)
+    for variant, source in sources.items():
+        indexes = [index for index, value in enumerate(variants) if value == variant]
+        if not indexes:
+            continue
+        rendered = render_sms_bodies(source, [contexts[index] for index in indexes])
+        for index, body in zip(indexes, rendered):
+            bodies[index] = body
+    return list(zip(variants, bodies))
+
+
+def _sms_campaign_recipients(
+    db: Session, campaign: SmsCampaign
+) -> Tuple[List[str], Dict[str, SmsContact]]:
+    return collect_sms_recipients(
+        db,
+        recipients=deserialize_json_list(campaign.target_recipients),
+        group_ids=[int(v) for v in deserialize_json_list(campaign.target_groups) if str(v).isdigit()],
+        tags=deserialize_json_list(campaign.target_tags),
+    )
+
+
+def _recipient_variables(
+    template_variables: Dict[str, Any],
+    contact_map: Dict[str, SmsContact],
+    recipients: Sequence[str],
+) -> List[Dict[str, Any]]:
+    contexts = []
+    for recipient in recipients:
+        contact = contact_map.get(recipient)
+        variables = dict(template_variables)
+        if contact:
+            variables["name"] = contact.name or ""
+            variables["phone"] = contact.phone
+        contexts.append(variables)
+    return contexts
+
+
+def dispatch_sms_campaign(
+    db: Session,
+    campaign: SmsCampaign,
+    budget: Optional[int] = None,
+    lost: Optional[threading.Event] = None,
+) -> None:
+    """Dispatch ``batch_size`` slices of an SMS campaign until ``budget`` recipients are done.
+
+    ``budget`` defaults to what ``rate_per_minute`` allows in one scheduler
+    interval, so throughput follows the campaign rate rather than the tick
+    length; at least one slice is always dispatched. Recipients already
+    recorded in the dispatch ledger are skipped, so the scheduler can re-enter
+    a running campaign after a restart without resending. ``lost`` is the
+    event from ``hold_lease``; dispatch stops between slices once it is set.
+    """
+    if campaign.status not in {"scheduled", "running"}:
+        return
     
-    body_source = campaign.message or (template.body if template else "")
-    if not body_source:
+    sources = _campaign_variants(campaign, _sms_campaign_body(db, campaign))
+    if not all(sources.values()):
         campaign.status = "failed"
         campaign.updated_at = datetime.utcnow()
         db.add(campaign)
@@ -328,45 +483,88 @@ def dispatch_sms_campaign(db: Session, campaign: SmsCampaign) -> None:
         db.commit()
         return
 
-    recipients, contact_map = collect_sms_recipients(
-        db,
-        recipients=deserialize_json_list(campaign.target_recipients),
-        group_ids=[int(v) for v in deserialize_json_list(campaign.target_groups) if str(v).isdigit()],
-        tags=deserialize_json_list(campaign.target_tags),
-    )
-
-    if not recipients:
-        campaign.status = "completed"
-        campaign.completed_at = datetime.utcnow()
-        campaign.updated_at = datetime.utcnow()
-        db.add(campaign)
-        db.commit()
-        return
-
+    # Resolve the client before claiming, so missing credentials leave the ledger untouched.
     twilio = ensure_twilio()
-    batch_id = f"sms_campaign_{campaign.id}_{uuid4().hex}"
+    recipients, contact_map = _sms_campaign_recipients(db, campaign)
     template_variables = deserialize_json_dict(campaign.template_variables)
     append_opt_out_flag = campaign.append_opt_out if campaign.append_opt_out is not None else True
-
-    for recipient in recipients:
-        contact = contact_map.get(recipient)
-        variables = dict(template_variables)
-        if contact:
-            variables["name"] = contact.name or ""
-            variables["phone"] = contact.phone
-        body = render_sms_body(body_source, variables)
-        send_sms_outbound(
-            db,
-            twilio=twilio,
-            recipient=recipient,
-            body=body,
-            batch_id=batch_id,
-            from_number=from_number,
-            messaging_service_sid=messaging_service_sid,
-            campaign_id=campaign.id,
-            template_id=campaign.template_id,
-            append_opt_out_flag=append_opt_out_flag,
+    batch_size = campaign.batch_size or settings.sms_default_batch_size
+    rate_per_minute = campaign.rate_per_minute or settings.sms_default_rate_per_minute
+    if budget is None:
+        budget = rate_per_minute * settings.sms_scheduler_interval_seconds // 60
+    # One bucket across the slices keeps the pace continuous between them.
+    bucket = TokenBucket(rate_per_minute)
+    label = f"sms_campaign_{campaign.id}"
+
+    dispatched = 0
+    while True:
+        if lease_lost(lost):
+            return
+        if provider_paused("twilio", messaging_service_sid or from_number):
+            # Stay running; the scheduler resumes once the breaker lets a probe through.
+            return
+        positions = pending_positions(
+            db, "sms", campaign.id, recipients, batch_size + 1, start=campaign.dispatch_offset or 0
         )
+        is_last_slice = len(positions) <= batch_size
+        positions = positions[:batch_size]
+        pending = claim_recipients(db, "sms", campaign.id, [recipient for _, recipient in positions])
+        if positions:
+            campaign.dispatch_offset = positions[-1][0] + 1
+            db.add(campaign)
+            db.commit()
+
+        if pending:
+            contexts = _recipient_variables(template_variables, contact_map, pending)
+            items = [
+                OutboundItem(recipient=recipient, body=body, variant=variant)
+                for recipient, (variant, body) in zip(
+                    pending, _render_campaign_bodies(campaign, sources, pending, contexts)
+                )
+            ]
+            started = time.monotonic()
+            results = send_sms_outbound_batch(
+                db,
+                twilio=twilio,
+                items=items,
+                batch_id=f"sms_campaign_{campaign.id}_{uuid4().hex}",
+                from_number=from_number,
+                messaging_service_sid=messaging_service_sid,
+                campaign_id=campaign.id,
+                template_id=campaign.template_id,
+                append_opt_out_flag=append_opt_out_flag,
+                mapper=partial(
+                    map_paced,
+                    rate_per_minute=rate_per_minute,
+                    max_workers=settings.sms_dispatch_workers,
+                    label=label,
+                    bucket=bucket,
+                ),
+            )
+            record_dispatch_results(
+                db, "sms", campaign.id, [(result.recipient, result) for result in results]
+            )
+            report = DispatchReport(elapsed_seconds=time.monotonic() - started)
+            for result in results:
+                report.record(result)
+            report.log(label)
+
+        if is_last_slice:
+            if lease_lost(lost):
+                return
+            skipped = first_pending(db, "sms", campaign.id, recipients)
+            if skipped is None:
+                break
+            campaign.dispatch_offset = skipped
+            db.add(campaign)
+            db.commit()
+        dispatched += len(positions)
+        if dispatched >= budget:
+            return
+        # Pick up a pause or cancel issued while the slice was sending.
+        db.refresh(campaign)
+        if campaign.status not in {"scheduled", "running"}:
+            return
 
     campaign.status = "completed"
     campaign.completed_at = datetime.utcnow()
@@ -433,16 +631,14 @@ def list_sms_contacts(
         query = query.filter(
             (SmsContact.phone.like(search_value)) | (SmsContact.name.like(search_value))
         )
-    contacts = query.order_by(SmsContact.created_at.desc()).all()
     if tag:
-        tag_value = tag.strip().lower()
-        if tag_value:
-            contacts = [
-                c for c in contacts
-                if tag_value in {t.lower() for t in deserialize_tags(c.tags)}
-            ]
-    total = len(contacts)
-    paginated = contacts[offset:offset + limit]
+        tag_filter = has_any_tag(SmsContact, [tag])
+        if tag_filter is not None:
+            query = query.filter(tag_filter)
+    total = query.count()
+    paginated = (
+        query.order_by(SmsContact.created_at.desc()).offset(offset).limit(limit).all()
+    )
     return SmsContactListResponse(
         contacts=[_sms_contact_to_item(c) for c in paginated],
         total=total,
@@ -461,7 +657,7 @@ def create_sms_contact(
         if payload.name is not None:
             existing.name = payload.name.strip() or None
         if payload.tags is not None:
-            existing.tags = serialize_tags(payload.tags)
+            set_tags(db, existing, payload.tags)
         existing.disabled_at = None
         existing.updated_at = datetime.utcnow()
         db.add(existing)
@@ -471,11 +667,11 @@ def create_sms_contact(
     contact = SmsContact(
         phone=phone,
         name=payload.name.strip() if payload.name else None,
-        tags=serialize_tags(payload.tags),
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow(),
     )
     db.add(contact)
+    set_tags(db, contact, payload.tags)
     db.commit()
     db.refresh(contact)
     return _sms_contact_to_item(contact)
@@ -548,13 +744,33 @@ def send_sms(
         raise HTTPException(status_code=400, detail="TWILIO_SMS_FROM is not configured")
 
     append_opt_out_flag = payload.append_opt_out if payload.append_opt_out is not None else True
-    twilio = ensure_twilio()
     batch_id = uuid4().hex
-    results: List[SendResult] = []
     variables = payload.template_variables or {}
 
-    for recipient in normalize_sms_phones(payload.recipients):
+    use_outbox = payload.outbox if payload.outbox is not None else settings.outbox_enabled
+    if use_outbox:
         body = render_sms_body(body_source, variables)
+        results = send_sms_outbound_batch(
+            db,
+            twilio=None,
+            items=[
+                OutboundItem(recipient=recipient, body=body)
+                for recipient in normalize_sms_phones(payload.recipients)
+            ],
+            batch_id=batch_id,
+            from_number=from_number,
+            messaging_service_sid=messaging_service_sid,
+            template_id=payload.template_id,
+            append_opt_out_flag=append_opt_out_flag,
+            outbox=True,
+        )
+        return SendResponse(batch_id=batch_id, channel="sms", results=results)
+
+    twilio = ensure_twilio()
+    results: List[SendResult] = []
+
+    body = render_sms_body(body_source, variables)
+    for recipient in normalize_sms_phones(payload.recipients):
         results.append(
             send_sms_outbound(
                 db,
@@ -636,11 +852,198 @@ def start_sms_campaign(
     campaign.updated_at = datetime.utcnow()
     db.add(campaign)
     db.commit()
-    dispatch_sms_campaign(db, campaign)
+    with hold_lease(SmsCampaign, campaign.id) as held:
+        if held:
+            # One slice inline; the scheduler paces the rest.
+            dispatch_sms_campaign(db, campaign, budget=0, lost=held)
     db.refresh(campaign)
     return _sms_campaign_to_item(campaign)
 
 
+@router.get("/api/sms/campaigns/{campaign_id}/stats", response_model=SmsCampaignStatsResponse)
+def get_sms_campaign_stats(
+    campaign_id: int,
+    db: Session = Depends(get_db),
+    _: ApiKey = Depends(require_api_key("read")),
+) -> SmsCampaignStatsResponse:
+    """Delivery and cost totals of an SMS campaign, broken down by A/B variant."""
+    campaign = db.query(SmsCampaign).filter(SmsCampaign.id == campaign_id).first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="campaign not found")
+    rows = (
+        db.query(
+            Message.variant,
+            Message.status,
+            func.count(Message.id),
+            func.sum(Message.price),
+            func.sum(Message.num_segments),
+            func.max(Message.price_unit),
+        )
+        .filter(Message.channel == "sms", Message.campaign_id == campaign_id)
+        .group_by(Message.variant, Message.status)
+        .all()
+    )
+
+    counts: Dict[str, int] = {}
+    cost = None
+    price_unit = None
+    variants: Dict[str, Dict[str, Any]] = {}
+    for variant, status, count, price, segments, unit in rows:
+        counts[status] = counts.get(status, 0) + count
+        if price is not None:
+            cost = round((cost or 0.0) + float(price), 4)
+        price_unit = price_unit or unit
+        if not variant:
+            continue
+        totals = variants.setdefault(variant, {"counts": {}, "segments": 0, "cost": None})
+        totals["counts"][status] = totals["counts"].get(status, 0) + count
+        totals["segments"] += segments or 0
+        if price is not None:
+            totals["cost"] = round((totals["cost"] or 0.0) + float(price), 4)
+
+    return SmsCampaignStatsResponse(
+        campaign_id=campaign_id,
+        total=sum(counts.values()),
+        delivered=counts.get("delivered", 0),
+        failed=counts.get("failed", 0),
+        undelivered=counts.get("undelivered", 0),
+        queued=counts.get("queued", 0),
+        sent=counts.get("sent", 0),
+        received=counts.get("received", 0),
+        blocked=counts.get("blocked", 0),
+        cost=cost,
+        price_unit=price_unit,
+        variants={
+            variant: SmsVariantStats(
+                total=sum(totals["counts"].values()),
+                delivered=totals["counts"].get("delivered", 0),
+                failed=totals["counts"].get("failed", 0),
+                undelivered=totals["counts"].get("undelivered", 0),
+                queued=totals["counts"].get("queued", 0),
+                sent=totals["counts"].get("sent", 0),
+                blocked=totals["counts"].get("blocked", 0),
+                segments=totals["segments"],
+                cost=totals["cost"],
+            )
+            for variant, totals in sorted(variants.items())
+        }
+        or None,
+    )
+
+
+def _segment_price(db: Session) -> Tuple[Optional[float], Optional[str]]:
+    """``SMS_SEGMENT_PRICE``, else the average per-segment price of recent outbound SMS."""
+    if settings.sms_segment_price is not None:
+        return settings.sms_segment_price, settings.sms_price_unit
+    recent = (
+        db.query(Message.price, Message.num_segments, Message.price_unit)
+        .filter(
+            Message.channel == "sms",
+            Message.direction == "outbound",
+            Message.price.isnot(None),
+            Message.num_segments > 0,
+        )
+        .order_by(Message.id.desc())
+        .limit(_PRICE_SAMPLE)
+        .subquery()
+    )
+    # Twilio reports prices as negative amounts.
+    price, segments, price_unit = db.query(
+        func.sum(func.abs(recent.c.price)),
+        func.sum(recent.c.num_segments),
+        func.max(recent.c.price_unit),
+    ).one()
+    if not segments:
+        return None, None
+    return float(price) / float(segments), price_unit
+
+
+@router.get("/api/sms/campaigns/{campaign_id}/estimate")
+def estimate_sms_campaign(
+    campaign_id: int,
+    db: Session = Depends(get_db),
+    _: ApiKey = Depends(require_api_key("read")),
+) -> StreamingResponse:
+    """Dry run of an SMS campaign: segments and estimated cost per recipient.
+
+    Streams newline-delimited JSON, one line per recipient with the encoding
+    and segment count of the body it would receive (opt-out text included),
+    then a ``summary`` line with the totals. Nothing is sent or recorded.
+    ``estimated_cost`` is ``null`` when no ``SMS_SEGMENT_PRICE`` is set and no
+    priced SMS has been sent yet.
+    """
+    campaign = db.query(SmsCampaign).filter(SmsCampaign.id == campaign_id).first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="campaign not found")
+    sources = _campaign_variants(campaign, _sms_campaign_body(db, campaign))
+    if not all(sources.values()):
+        raise HTTPException(status_code=400, detail="message body is required")
+
+    recipients, contact_map = _sms_campaign_recipients(db, campaign)
+    blocked = opted_out_reasons(db, recipients)
+    price, price_unit = _segment_price(db)
+    template_variables = deserialize_json_dict(campaign.template_variables)
+    append_opt_out_flag = campaign.append_opt_out if campaign.append_opt_out is not None else True
+
+    def _cost(segments: int) -> Optional[float]:
+        return round(segments * price, 6) if price is not None else None
+
+    def _lines():
+        total_segments = 0
+        encodings = {GSM7: 0, UCS2: 0}
+        variant_segments: Dict[str, int] = {}
+        for start in range(0, len(recipients), _ESTIMATE_CHUNK):
+            chunk = recipients[start : start + _ESTIMATE_CHUNK]
+            contexts = _recipient_variables(template_variables, contact_map, chunk)
+            rendered = _render_campaign_bodies(campaign, sources, chunk, contexts)
+            lines = []
+            for recipient, (variant, body) in zip(chunk, rendered):
+                if recipient in blocked:
+                    line = {
+                        "recipient": recipient,
+                        "variant": variant,
+                        "status": "blocked",
+                        "encoding": None,
+                        "characters": 0,
+                        "segments": 0,
+                        "estimated_cost": _cost(0),
+                    }
+                else:
+                    info = count_segments(append_opt_out_text(body or "", append_opt_out_flag))
+                    total_segments += info.segments
+                    encodings[info.encoding] += 1
+                    if variant is not None:
+                        variant_segments[variant] = variant_segments.get(variant, 0) + info.segments
+                    line = {
+                        "recipient": recipient,
+                        "variant": variant,
+                        "status": "queued",
+                        "encoding": info.encoding,
+                        "characters": info.units,
+                        "segments": info.segments,
+                        "estimated_cost": _cost(info.segments),
+                    }
+                lines.append(json.dumps(line, ensure_ascii=False))
+            yield "\n".join(lines) + "\n"
+        summary = {
+            "recipients": len(recipients),
+            "blocked": len(blocked),
+            "segments": total_segments,
+            "encodings": encodings,
+            "variants": {
+                variant: {"segments": segments, "estimated_cost": _cost(segments)}
+                for variant, segments in sorted(variant_segments.items())
+            }
+            or None,
+            "segment_price": price,
+            "estimated_cost": _cost(total_segments),
+            "price_unit": price_unit,
+        }
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
 # Keyword rules
 @router.get("/api/sms/keyword-rules", response_model=SmsKeywordRuleListResponse)
 @router.get("/api/sms/keywords", response_model=SmsKeywordRuleListResponse)
@@ -767,6 +1170,7 @@ def add_sms_opt_out(
     )
     db.add(opt_out)
     db.commit()
+    invalidate_suppression_index()
     db.refresh(opt_out)
     return SmsOptOutItem(
         id=opt_out.id,
@@ -819,6 +1223,7 @@ def add_sms_blacklist(
     )
     db.add(item)
     db.commit()
+    invalidate_suppression_index()
     db.refresh(item)
     return SmsBlacklistItem(
         id=item.id,
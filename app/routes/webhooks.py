@@ -12,8 +12,11 @@ from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.conversations import conversation_address, record_messages, record_reads
 from app.db import get_db, SessionLocal
+from app.events import queue_message_status, queue_messages_created
 from app.models import Customer, Message, SmsKeywordRule, SmsOptOut, AppSetting
+from app.suppression import invalidate_suppression_index
 from app.utils import get_form_value, match_keyword, normalize_sms_phone
 
 
@@ -94,6 +97,7 @@ async def twilio_whatsapp_webhook(request: Request, db: Session = Depends(get_db
                 message.error = f"{error_code}: {error_message or ''}"
             message.updated_at = now
             db.add(message)
+            queue_message_status(db, message)
             
             if message.customer_id:
                 customer = db.query(Customer).filter(Customer.id == message.customer_id).first()
@@ -117,6 +121,9 @@ async def twilio_whatsapp_webhook(request: Request, db: Session = Depends(get_db
             updated_at=now,
         )
         db.add(inbound)
+        db.flush()
+        record_messages(db, [inbound])
+        queue_messages_created(db, [inbound])
         db.commit()
     
     return PlainTextResponse("OK")
@@ -165,6 +172,7 @@ async def twilio_sms_status_webhook(request: Request, db: Session = Depends(get_
             pass
     message.updated_at = now
     db.add(message)
+    queue_message_status(db, message)
     
     if message.customer_id:
         customer = db.query(Customer).filter(Customer.id == message.customer_id).first()
@@ -206,6 +214,7 @@ async def twilio_sms_inbound_webhook(request: Request, db: Session = Depends(get
                 created_at=now,
             ))
             db.commit()
+            invalidate_suppression_index()
     
     # Store inbound message
     inbound = Message(
@@ -220,6 +229,9 @@ async def twilio_sms_inbound_webhook(request: Request, db: Session = Depends(get
         updated_at=now,
     )
     db.add(inbound)
+    db.flush()
+    record_messages(db, [inbound])
+    queue_messages_created(db, [inbound])
     db.commit()
     
     # Check for auto-reply rules
@@ -304,8 +316,10 @@ async def sendgrid_event_webhook(request: Request, db: Session = Depends(get_db)
             message.status = status_map[event_type]
             if event_type == "open" and not message.read_at:
                 message.read_at = now
+                record_reads(db, {(conversation_address(message), message.channel): 1})
             message.updated_at = now
             db.add(message)
+            queue_message_status(db, message)
             
             if message.customer_id:
                 customer = db.query(Customer).filter(Customer.id == message.customer_id).first()
@@ -346,6 +360,9 @@ async def sendgrid_inbound_webhook(request: Request, db: Session = Depends(get_d
         updated_at=now,
     )
     db.add(inbound)
+    db.flush()
+    record_messages(db, [inbound])
+    queue_messages_created(db, [inbound])
     db.commit()
     
     return PlainTextResponse("OK")
@@ -1,6 +1,6 @@
 """WhatsApp messaging routes."""
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 from urllib.parse import parse_qs, urlparse
 from uuid import uuid4
 import json
@@ -10,7 +10,7 @@ from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.db import get_db
-from app.models import ApiKey, CampaignStepExecution, Customer, Message, WhatsAppSender
+from app.models import ApiKey, Message, WhatsAppSender
 from app.schemas import (
     SendResponse,
     SendResult,
@@ -22,6 +22,17 @@ from app.schemas import (
     WhatsAppTemplatesResponse,
 )
 from app.dependencies import require_api_key, ensure_twilio
+from app.outbox import enqueue_messages
+from app.outbound import (
+    Delivery,
+    Mapper,
+    Outcome,
+    OutboundItem,
+    complete_deliveries,
+    failure_outcome,
+    insert_messages,
+    map_sequential,
+)
 from app.utils import normalize_whatsapp_sender, normalize_whatsapp_address
 from app.services.twilio_client import normalize_whatsapp
 
@@ -69,89 +80,150 @@ def send_whatsapp_outbound(
     message_template_id: Optional[int] = None,
     customer_id: Optional[int] = None,
 ) -> SendResult:
-    stored_body = body
-    if content_sid:
-        stored_body = f"template:{content_sid} variables:{json.dumps(content_variables or {}, ensure_ascii=True)}"
-    now = datetime.utcnow()
-    message = Message(
+    """Send one WhatsApp message through ``send_whatsapp_outbound_batch``."""
+    return send_whatsapp_outbound_batch(
+        db,
+        twilio=twilio,
+        items=[OutboundItem(recipient=recipient, body=body, customer_id=customer_id)],
         batch_id=batch_id,
-        channel="whatsapp",
-        to_address=recipient,
         from_address=from_address,
-        subject=None,
-        body=stored_body,
-        status="queued",
-        direction="outbound",
+        content_sid=content_sid,
+        content_variables=content_variables,
+        media_urls=media_urls,
+        use_proxy=use_proxy,
         marketing_campaign_id=marketing_campaign_id,
         campaign_step_id=campaign_step_id,
         message_template_id=message_template_id,
-        customer_id=customer_id,
-        created_at=now,
-        updated_at=now,
-    )
-    db.add(message)
-    db.commit()
-    db.refresh(message)
-
-    status_callback = None
-    if settings.public_base_url:
-        status_callback = (
-            f"{settings.public_base_url.rstrip('/')}/webhooks/twilio/whatsapp"
-            f"?local_id={message.id}"
-        )
+    )[0]
 
-    try:
-        message_sid = twilio.send_whatsapp(
-            to_number=recipient,
-            body=body if not content_sid else None,
-            media_urls=media_urls if not content_sid else None,
-            status_callback=status_callback,
-            from_number=from_address,
-            content_sid=content_sid,
-            content_variables=content_variables,
-            use_proxy=use_proxy,
-        )
-        message.provider_message_id = message_sid
-    except Exception as exc:
-        message.status = "failed"
-        message.error = str(exc)
-
-    message.updated_at = datetime.utcnow()
-    db.add(message)
-
-    if marketing_campaign_id and campaign_step_id and customer_id:
-        execution = CampaignStepExecution(
-            campaign_id=marketing_campaign_id,
-            step_id=campaign_step_id,
-            customer_id=customer_id,
-            channel="WHATSAPP",
-            status=message.status,
-            message_id=message.id,
+
+def send_whatsapp_outbound_batch(
+    db: Session,
+    *,
+    twilio,
+    items: Sequence[OutboundItem],
+    batch_id: str,
+    from_address: str,
+    content_sid: Optional[str] = None,
+    content_variables: Optional[Dict[str, Any]] = None,
+    media_urls: Optional[List[str]] = None,
+    use_proxy: Optional[bool] = None,
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    message_template_id: Optional[int] = None,
+    mapper: Mapper = map_sequential,
+    outbox: bool = False,
+) -> List[SendResult]:
+    """Batched ``send_whatsapp_outbound`` for a chunk of recipients.
+
+    With ``outbox`` the messages are only queued for the outbox workers.
+    """
+    stored_template = None
+    if content_sid:
+        stored_template = f"template:{content_sid} variables:{json.dumps(content_variables or {}, ensure_ascii=True)}"
+    now = datetime.utcnow()
+    messages = [
+        Message(
+            batch_id=batch_id,
+            channel="whatsapp",
+            to_address=item.recipient,
+            from_address=from_address,
+            subject=None,
+            body=stored_template or item.body,
+            status="queued",
+            direction="outbound",
+            marketing_campaign_id=marketing_campaign_id,
+            campaign_step_id=campaign_step_id,
+            message_template_id=message_template_id,
+            customer_id=item.customer_id,
             created_at=now,
-            updated_at=message.updated_at,
+            updated_at=now,
+        )
+        for item in items
+    ]
+    payloads = [
+        {
+            "body": item.body,
+            "media_urls": media_urls,
+            "from_address": from_address,
+            "content_sid": content_sid,
+            "content_variables": content_variables,
+            "use_proxy": use_proxy,
+        }
+        for item in items
+    ]
+    if outbox:
+        message_ids = enqueue_messages(db, "whatsapp", messages, payloads)
+        return [
+            SendResult(message_id=message_id, recipient=item.recipient, status="queued")
+            for item, message_id in zip(items, message_ids)
+        ]
+    message_ids = insert_messages(db, messages)
+
+    deliveries = [
+        Delivery(
+            message_id=message_id,
+            recipient=item.recipient,
+            customer_id=item.customer_id,
+            payload=payload,
         )
-        db.add(execution)
-
-    if customer_id:
-        customer = db.query(Customer).filter(Customer.id == customer_id).first()
-        if customer:
-            customer.whatsapp_sent_count = (customer.whatsapp_sent_count or 0) + 1
-            if marketing_campaign_id:
-                customer.has_marketed = True
-                customer.last_campaign_id = marketing_campaign_id
-                customer.last_marketed_at = now
-            customer.last_whatsapp_status = "failed" if message.status == "failed" else "sent"
-            customer.updated_at = datetime.utcnow()
-            db.add(customer)
-
-    db.commit()
-
-    return SendResult(
-        message_id=message.id,
-        recipient=recipient,
-        status=message.status,
-        provider_message_id=message.provider_message_id,
-        error=message.error,
+        for item, message_id, payload in zip(items, message_ids, payloads)
+    ]
+    return deliver_whatsapp(
+        db,
+        twilio=twilio,
+        deliveries=deliveries,
+        marketing_campaign_id=marketing_campaign_id,
+        campaign_step_id=campaign_step_id,
+        created_at=now,
+        mapper=mapper,
+    )
+
+
+def deliver_whatsapp(
+    db: Session,
+    *,
+    twilio,
+    deliveries: Sequence[Delivery],
+    marketing_campaign_id: Optional[int] = None,
+    campaign_step_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+    mapper: Mapper = map_sequential,
+) -> List[SendResult]:
+    """Send already-persisted queued WhatsApp messages and record the outcomes."""
+
+    def _send(delivery: Delivery) -> Outcome:
+        payload = delivery.payload
+        content_sid = payload.get("content_sid")
+        status_callback = None
+        if settings.public_base_url:
+            status_callback = (
+                f"{settings.public_base_url.rstrip('/')}/webhooks/twilio/whatsapp"
+                f"?local_id={delivery.message_id}"
+            )
+        try:
+            message_sid = twilio.send_whatsapp(
+                to_number=delivery.recipient,
+                body=payload.get("body") if not content_sid else None,
+                media_urls=payload.get("media_urls") if not content_sid else None,
+                status_callback=status_callback,
+                from_number=payload.get("from_address"),
+                content_sid=content_sid,
+                content_variables=payload.get("content_variables"),
+                use_proxy=payload.get("use_proxy"),
+            )
+            return Outcome("queued", message_sid, None)
+        except Exception as exc:
+            return failure_outcome(exc)
+
+    return complete_deliveries(
+        db,
+        channel="whatsapp",
+        deliveries=deliveries,
+        outcomes=mapper(deliveries, _send),
+        marketing_campaign_id=marketing_campaign_id,
+        campaign_step_id=campaign_step_id,
+        created_at=created_at,
     )
 
 
@@ -294,7 +366,6 @@ def send_whatsapp(
     db: Session = Depends(get_db),
     _: ApiKey = Depends(require_api_key("send")),
 ) -> SendResponse:
-    twilio = ensure_twilio()
     batch_id = uuid4().hex
     results: List[SendResult] = []
 
@@ -310,6 +381,30 @@ def send_whatsapp(
             status_code=400, detail="content_sid is required when content_variables is set"
         )
 
+    use_outbox = request.outbox if request.outbox is not None else settings.outbox_enabled
+    if use_outbox:
+        queued = send_whatsapp_outbound_batch(
+            db,
+            twilio=None,
+            items=[
+                OutboundItem(recipient=normalize_whatsapp_address(recipient), body=request.body)
+                for recipient in request.recipients
+            ],
+            batch_id=batch_id,
+            from_address=selected_from,
+            content_sid=request.content_sid,
+            content_variables=request.content_variables,
+            media_urls=request.media_urls,
+            use_proxy=request.use_proxy,
+            outbox=True,
+        )
+        results = [
+            SendResult(message_id=result.message_id, recipient=recipient, status=result.status)
+            for recipient, result in zip(request.recipients, queued)
+        ]
+        return SendResponse(batch_id=batch_id, channel="whatsapp", results=results)
+
+    twilio = ensure_twilio()
     for recipient in request.recipients:
         normalized_recipient = normalize_whatsapp_address(recipient)
         result = send_whatsapp_outbound(
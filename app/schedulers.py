@@ -1,17 +1,21 @@
-"""Background schedulers for email, SMS and marketing campaigns."""
+"""Background schedulers for campaigns, the outbox and API key usage writes."""
 import threading
 import time
 from datetime import datetime
 
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.db import SessionLocal
+from app.leases import claim_due_rows, hold_lease
 
 
 _sms_scheduler_started = False
 _email_scheduler_started = False
 _marketing_scheduler_started = False
+_outbox_workers_started = False
+_api_key_usage_flusher_started = False
 
 
 def _email_scheduler_loop() -> None:
@@ -24,25 +28,28 @@ def _email_scheduler_loop() -> None:
             with SessionLocal() as db:
                 from app.models import EmailCampaign
                 now = datetime.utcnow()
-                # Process scheduled campaigns
-                scheduled = (
-                    db.query(EmailCampaign)
-                    .filter(
-                        EmailCampaign.status == "scheduled",
-                        EmailCampaign.schedule_at <= now,
-                    )
-                    .all()
+                # Lease due and running campaigns so other workers skip them
+                campaigns = claim_due_rows(
+                    db,
+                    EmailCampaign,
+                    or_(
+                        and_(
+                            EmailCampaign.status == "scheduled",
+                            EmailCampaign.schedule_at <= now,
+                        ),
+                        EmailCampaign.status == "running",
+                    ),
                 )
-                for campaign in scheduled:
-                    campaign.status = "running"
-                    campaign.started_at = now
-                    db.add(campaign)
-                    db.commit()
-                    dispatch_email_campaign(db, campaign)
-                # Process running campaigns
-                running = db.query(EmailCampaign).filter(EmailCampaign.status == "running").all()
-                for campaign in running:
-                    dispatch_email_campaign(db, campaign)
+                for campaign in campaigns:
+                    with hold_lease(EmailCampaign, campaign.id) as held:
+                        if not held:
+                            continue
+                        if campaign.status == "scheduled":
+                            campaign.status = "running"
+                            campaign.started_at = now
+                            db.add(campaign)
+                            db.commit()
+                        dispatch_email_campaign(db, campaign, lost=held)
                 # Process followups
                 dispatch_email_followups(db, now)
         except Exception:  # pragma: no cover - scheduler safety
@@ -59,23 +66,27 @@ def _sms_scheduler_loop() -> None:
             with SessionLocal() as db:
                 from app.models import SmsCampaign
                 now = datetime.utcnow()
-                scheduled = (
-                    db.query(SmsCampaign)
-                    .filter(
-                        SmsCampaign.status == "scheduled",
-                        SmsCampaign.schedule_at <= now,
-                    )
-                    .all()
+                campaigns = claim_due_rows(
+                    db,
+                    SmsCampaign,
+                    or_(
+                        and_(
+                            SmsCampaign.status == "scheduled",
+                            SmsCampaign.schedule_at <= now,
+                        ),
+                        SmsCampaign.status == "running",
+                    ),
                 )
-                for campaign in scheduled:
-                    campaign.status = "running"
-                    campaign.started_at = now
-                    db.add(campaign)
-                    db.commit()
-                    dispatch_sms_campaign(db, campaign)
-                running = db.query(SmsCampaign).filter(SmsCampaign.status == "running").all()
-                for campaign in running:
-                    dispatch_sms_campaign(db, campaign)
+                for campaign in campaigns:
+                    with hold_lease(SmsCampaign, campaign.id) as held:
+                        if not held:
+                            continue
+                        if campaign.status == "scheduled":
+                            campaign.status = "running"
+                            campaign.started_at = now
+                            db.add(campaign)
+                            db.commit()
+                        dispatch_sms_campaign(db, campaign, lost=held)
         except Exception:  # pragma: no cover - scheduler safety
             pass
 
@@ -90,25 +101,54 @@ def _marketing_scheduler_loop() -> None:
             with SessionLocal() as db:
                 from app.models import MarketingCampaign
                 now = datetime.utcnow()
-                scheduled = (
-                    db.query(MarketingCampaign)
-                    .filter(
-                        MarketingCampaign.status == "SCHEDULED",
-                        MarketingCampaign.schedule_time <= now,
-                    )
-                    .all()
+                campaigns = claim_due_rows(
+                    db,
+                    MarketingCampaign,
+                    or_(
+                        and_(
+                            MarketingCampaign.status == "SCHEDULED",
+                            MarketingCampaign.schedule_time <= now,
+                        ),
+                        MarketingCampaign.status == "RUNNING",
+                    ),
                 )
-                for campaign in scheduled:
-                    campaign.status = "RUNNING"
-                    campaign.started_at = now
-                    db.add(campaign)
-                    db.commit()
-                    dispatch_marketing_campaign(db, campaign, now)
-                running = db.query(MarketingCampaign).filter(
-                    MarketingCampaign.status == "RUNNING"
-                ).all()
-                for campaign in running:
-                    dispatch_marketing_campaign(db, campaign, now)
+                for campaign in campaigns:
+                    with hold_lease(MarketingCampaign, campaign.id) as held:
+                        if not held:
+                            continue
+                        if campaign.status == "SCHEDULED":
+                            campaign.status = "RUNNING"
+                            campaign.started_at = now
+                            db.add(campaign)
+                            db.commit()
+                        dispatch_marketing_campaign(db, campaign, now, lost=held)
+        except Exception:  # pragma: no cover - scheduler safety
+            pass
+
+
+def _outbox_worker_loop(channel: str) -> None:
+    """Outbox worker loop for one channel; polls only while the queue is empty."""
+    from app.outbox import drain_outbox
+
+    while True:
+        try:
+            with SessionLocal() as db:
+                if drain_outbox(db, channel):
+                    continue
+        except Exception:  # pragma: no cover - worker safety
+            pass
+        time.sleep(settings.outbox_poll_interval_seconds)
+
+
+def _api_key_usage_loop() -> None:
+    """Periodically write buffered API key ``last_used_at`` values."""
+    from app.dependencies import flush_api_key_usage
+
+    while True:
+        try:
+            time.sleep(settings.api_key_usage_flush_seconds)
+            with SessionLocal() as db:
+                flush_api_key_usage(db)
         except Exception:  # pragma: no cover - scheduler safety
             pass
 
@@ -147,3 +187,28 @@ def start_marketing_scheduler() -> None:
     _marketing_scheduler_started = True
     thread = threading.Thread(target=_marketing_scheduler_loop, daemon=True)
     thread.start()
+
+
+def start_outbox_workers() -> None:
+    """Start one outbox worker thread per channel."""
+    global _outbox_workers_started
+    if _outbox_workers_started:
+        return
+    if not settings.outbox_worker_enabled:
+        return
+    _outbox_workers_started = True
+    from app.outbox import OUTBOX_CHANNELS
+
+    for channel in OUTBOX_CHANNELS:
+        thread = threading.Thread(target=_outbox_worker_loop, args=(channel,), daemon=True)
+        thread.start()
+
+
+def start_api_key_usage_flusher() -> None:
+    """Start the API key ``last_used_at`` flush thread."""
+    global _api_key_usage_flusher_started
+    if _api_key_usage_flusher_started:
+        return
+    _api_key_usage_flusher_started = True
+    thread = threading.Thread(target=_api_key_usage_loop, daemon=True)
+    thread.start()
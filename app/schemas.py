@@ -15,6 +15,7 @@ class EmailSendRequest(BaseModel):
     text: Optional[str] = None
     html: Optional[str] = None
     from_email: Optional[EmailStr] = None
+    outbox: Optional[bool] = None
 
 
 class EmailSenderCreate(BaseModel):
@@ -160,7 +161,8 @@ class CustomerItem(BaseModel):
 
 class CustomerListResponse(BaseModel):
     customers: List[CustomerItem]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class CustomerTagItem(BaseModel):
@@ -410,6 +412,7 @@ class WhatsAppSendRequest(BaseModel):
     content_sid: Optional[str] = None
     content_variables: Optional[Dict[str, str]] = None
     use_proxy: Optional[bool] = None
+    outbox: Optional[bool] = None
 
 
 class WhatsAppSenderCreate(BaseModel):
@@ -612,6 +615,7 @@ class ChatHistoryResponse(BaseModel):
     messages: List[ChatMessage]
     total: int
     unread_count: int
+    next_cursor: Optional[str] = None
 
 
 class MarkReadRequest(BaseModel):
@@ -627,6 +631,8 @@ class UserMessageStats(BaseModel):
     total_messages: int
     unread_count: int
     last_message_at: Optional[datetime] = None
+    last_message_id: Optional[int] = None
+    last_snippet: Optional[str] = None
     channels: List[str] = []
 
 
@@ -790,6 +796,18 @@ class SmsCampaignListResponse(BaseModel):
     campaigns: List[SmsCampaignItem]
 
 
+class SmsVariantStats(BaseModel):
+    total: int
+    delivered: int
+    failed: int
+    undelivered: int
+    queued: int
+    sent: int
+    blocked: int
+    segments: int
+    cost: Optional[float] = None
+
+
 class SmsCampaignStatsResponse(BaseModel):
     campaign_id: int
     total: int
@@ -802,7 +820,7 @@ class SmsCampaignStatsResponse(BaseModel):
     blocked: int
     cost: Optional[float] = None
     price_unit: Optional[str] = None
-    variants: Optional[Dict[str, Dict[str, int]]] = None
+    variants: Optional[Dict[str, SmsVariantStats]] = None
 
 
 class SmsSendRequest(BaseModel):
@@ -815,6 +833,7 @@ class SmsSendRequest(BaseModel):
     rate_per_minute: Optional[int] = None
     batch_size: Optional[int] = None
     append_opt_out: Optional[bool] = None
+    outbox: Optional[bool] = None
 
 
 class SmsKeywordRuleCreate(BaseModel):
@@ -0,0 +1,152 @@
+"""Per-provider, per-sender circuit breakers with adaptive (AIMD) concurrency."""
+from collections import deque
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from app.config import settings
+from app.retries import RETRYABLE, CircuitOpenError, classify_error
+
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+# Multiplicative decreases closer together than this count as one congestion event.
+_DECREASE_INTERVAL_SECONDS = 1.0
+
+
+class ProviderGuard:
+    """Circuit breaker and concurrency limit for one provider sender.
+
+    The breaker opens when transient failures reach
+    ``CIRCUIT_ERROR_RATE_PERCENT`` of the last ``CIRCUIT_WINDOW_SIZE`` calls,
+    rejects calls for ``CIRCUIT_OPEN_SECONDS`` and then lets a single probe
+    through. The in-flight limit grows by one per window of fast successes
+    and halves on a failure or a call slower than ``PROVIDER_LATENCY_TARGET_MS``.
+    """
+
+    def __init__(self, provider: str, sender: Optional[str]) -> None:
+        self.provider = provider
+        self.sender = sender
+        self._cond = threading.Condition()
+        self._results: Deque[bool] = deque(maxlen=max(settings.circuit_window_size, 1))
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._limit = float(max(settings.provider_initial_concurrency, 1))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), 1)
+
+    def _open_remaining(self, now: float) -> Optional[float]:
+        if self._opened_at is None:
+            return None
+        return max(settings.circuit_open_seconds - (now - self._opened_at), 0.0)
+
+    def is_open(self) -> bool:
+        with self._cond:
+            remaining = self._open_remaining(time.monotonic())
+            return remaining is not None and (remaining > 0 or self._probing)
+
+    def _admit(self) -> bool:
+        """Wait for an in-flight slot; returns whether this call is the half-open probe."""
+        with self._cond:
+            while True:
+                remaining = self._open_remaining(time.monotonic())
+                if remaining is not None and (remaining > 0 or self._probing):
+                    raise CircuitOpenError(
+                        self.provider, self.sender, max(remaining, 1.0)
+                    )
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    probe = remaining is not None
+                    if probe:
+                        self._probing = True
+                    return probe
+                self._cond.wait()
+
+    def _release(self, probe: bool, failed: bool, latency: float) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if probe:
+                self._probing = False
+                self._opened_at = now if failed else None
+                self._results.clear()
+                if not failed:
+                    logger.info("%s circuit closed for %s", self.provider, self.sender)
+            elif self._opened_at is None:
+                self._results.append(failed)
+                failures = sum(self._results)
+                if (
+                    len(self._results) >= settings.circuit_min_calls
+                    and failures * 100 >= settings.circuit_error_rate_percent * len(self._results)
+                ):
+                    self._opened_at = now
+                    self._results.clear()
+                    logger.warning(
+                        "%s circuit opened for %s after %d failures",
+                        self.provider,
+                        self.sender,
+                        failures,
+                    )
+
+            if failed or latency * 1000 > settings.provider_latency_target_ms:
+                if now - self._last_decrease >= _DECREASE_INTERVAL_SECONDS:
+                    self._limit = max(self._limit / 2, 1.0)
+                    self._last_decrease = now
+            else:
+                self._limit = min(
+                    self._limit + 1.0 / self._limit,
+                    float(max(settings.provider_max_concurrency, 1)),
+                )
+            self._cond.notify_all()
+
+    def call(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """Run ``fn`` under the breaker and limit; raises ``CircuitOpenError`` while open.
+
+        Only transient and rate-limited errors count as failures; a permanent
+        error such as an invalid recipient means the provider is healthy.
+        """
+        if not settings.circuit_breaker_enabled:
+            return fn(*args, **kwargs)
+        probe = self._admit()
+        started = time.monotonic()
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception as exc:
+            failed = classify_error(exc)[0] in RETRYABLE
+            raise
+        finally:
+            self._release(probe, failed, time.monotonic() - started)
+
+
+_GUARDS: Dict[Tuple[str, Optional[str]], ProviderGuard] = {}
+_GUARDS_LOCK = threading.Lock()
+
+
+def provider_guard(provider: str, sender: Optional[str]) -> ProviderGuard:
+    key = (provider, sender or None)
+    with _GUARDS_LOCK:
+        guard = _GUARDS.get(key)
+        if guard is None:
+            guard = _GUARDS[key] = ProviderGuard(provider, sender or None)
+        return guard
+
+
+def provider_paused(provider: str, sender: Optional[str] = None) -> bool:
+    """Whether sends to ``provider`` should wait; any sender's breaker when ``sender`` is None."""
+    if not settings.circuit_breaker_enabled:
+        return False
+    with _GUARDS_LOCK:
+        guards = [
+            guard
+            for (name, guard_sender), guard in _GUARDS.items()
+            if name == provider and (sender is None or guard_sender == sender)
+        ]
+    return any(guard.is_open() for guard in guards)
@@ -0,0 +1,14 @@
+"""Pooled keep-alive HTTP sessions shared by the provider clients."""
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+
+
+def pooled_session(trust_env: bool = True) -> requests.Session:
+    session = requests.Session()
+    session.trust_env = trust_env
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(settings.http_pool_size, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -1,6 +1,6 @@
-from typing import Dict, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence, Tuple
 
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.eventwebhook import EventWebhook
 from sendgrid.helpers.mail import (
     Content,
@@ -14,6 +14,14 @@ from sendgrid.helpers.mail import (
 )
 
 from app.config import settings
+from app.services.circuit_breaker import provider_guard
+from app.services.http_pool import pooled_session
+
+
+# SendGrid v3 mail/send limit.
+MAX_PERSONALIZATIONS = 1000
+
+_MAIL_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
 
 
 class SendGridService:
@@ -22,7 +30,13 @@ class SendGridService:
             raise RuntimeError("SENDGRID_API_KEY is not configured")
         if not settings.sendgrid_from_email:
             raise RuntimeError("SENDGRID_FROM_EMAIL is not configured")
-        self._client = SendGridAPIClient(settings.sendgrid_api_key)
+        self._session = pooled_session()
+        self._session.headers.update(
+            {
+                "Authorization": f"Bearer {settings.sendgrid_api_key}",
+                "Content-Type": "application/json",
+            }
+        )
 
     def _from_email(self, from_email: Optional[str], from_name: Optional[str]) -> Email:
         email = from_email or settings.sendgrid_from_email
@@ -40,16 +54,14 @@ class SendGridService:
             return Email(reply_to, name)
         return Email(reply_to)
 
-    def send_email(
+    def _build_mail(
         self,
-        to_email: str,
         subject: str,
         text: Optional[str],
         html: Optional[str],
-        custom_args: Optional[Dict[str, str]],
-        from_email: Optional[str] = None,
-        from_name: Optional[str] = None,
-    ) -> Tuple[int, Optional[str]]:
+        from_email: Optional[str],
+        from_name: Optional[str],
+    ) -> Mail:
         mail = Mail()
         mail.from_email = self._from_email(from_email, from_name)
         mail.subject = subject
@@ -64,19 +76,74 @@ class SendGridService:
         else:
             mail.add_content(Content("text/plain", text or ""))
 
+        tracking_settings = TrackingSettings()
+        tracking_settings.open_tracking = OpenTracking(enable=True)
+        mail.tracking_settings = tracking_settings
+        return mail
+
+    @staticmethod
+    def _personalization(to_email: str, custom_args: Optional[Dict[str, str]]) -> Personalization:
         personalization = Personalization()
         personalization.add_to(To(to_email))
         if custom_args:
             for key, value in custom_args.items():
                 personalization.add_custom_arg(CustomArg(key, value))
-        mail.add_personalization(personalization)
-        tracking_settings = TrackingSettings()
-        tracking_settings.open_tracking = OpenTracking(enable=True)
-        mail.tracking_settings = tracking_settings
+        return personalization
 
-        response = self._client.send(mail)
+    def _send(self, mail: Mail) -> Tuple[int, Optional[str]]:
+        response = provider_guard("sendgrid", mail.from_email.email).call(
+            self._post, mail.get()
+        )
         message_id = response.headers.get("X-Message-Id") or response.headers.get("X-Message-ID")
         return response.status_code, message_id
 
+    def _post(self, body: Dict) -> Any:
+        response = self._session.post(
+            _MAIL_SEND_URL, json=body, timeout=settings.http_timeout_seconds
+        )
+        response.raise_for_status()
+        return response
+
+    def send_email(
+        self,
+        to_email: str,
+        subject: str,
+        text: Optional[str],
+        html: Optional[str],
+        custom_args: Optional[Dict[str, str]],
+        from_email: Optional[str] = None,
+        from_name: Optional[str] = None,
+    ) -> Tuple[int, Optional[str]]:
+        mail = self._build_mail(subject, text, html, from_email, from_name)
+        mail.add_personalization(self._personalization(to_email, custom_args))
+        return self._send(mail)
+
+    def send_email_batch(
+        self,
+        recipients: Sequence[Tuple[str, Optional[Dict[str, str]]]],
+        subject: str,
+        text: Optional[str],
+        html: Optional[str],
+        from_email: Optional[str] = None,
+        from_name: Optional[str] = None,
+    ) -> Tuple[int, Optional[str]]:
+        """Send one request with a personalization per ``(to_email, custom_args)``.
+
+        Each personalization keeps its own ``custom_args`` so webhook events can
+        be matched back by ``local_message_id``.
+        """
+        if len(recipients) > MAX_PERSONALIZATIONS:
+            raise ValueError(f"at most {MAX_PERSONALIZATIONS} personalizations per request")
+        mail = self._build_mail(subject, text, html, from_email, from_name)
+        for to_email, custom_args in recipients:
+            mail.add_personalization(self._personalization(to_email, custom_args))
+        return self._send(mail)
+
     def verify_webhook(self, payload: bytes, signature: str, timestamp: str, public_key: str) -> bool:
         return EventWebhook().verify_signature(public_key, payload, signature, timestamp)
+
+
+@lru_cache(maxsize=1)
+def get_sendgrid_service() -> SendGridService:
+    """Process-wide ``SendGridService`` so connections are pooled across requests."""
+    return SendGridService()
@@ -1,14 +1,14 @@
-import base64
 import json
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
-from urllib.parse import urlencode
-from urllib.request import Request, ProxyHandler, build_opener, urlopen
 
 from twilio.http.http_client import TwilioHttpClient
 from twilio.request_validator import RequestValidator
 from twilio.rest import Client
 
 from app.config import settings
+from app.services.circuit_breaker import provider_guard
+from app.services.http_pool import pooled_session
 
 
 def normalize_whatsapp(value: str) -> str:
@@ -21,7 +21,7 @@ class TwilioService:
     def __init__(self) -> None:
         if not settings.twilio_account_sid or not settings.twilio_auth_token:
             raise RuntimeError("Twilio credentials are not configured")
-        self._client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
+        self._client = self._build_client(trust_env=True)
         self._client_no_proxy: Optional[Client] = None
         self._validator = RequestValidator(settings.twilio_auth_token)
 
@@ -36,17 +36,20 @@ class TwilioService:
             return settings.twilio_sms_from
         return None
 
+    @staticmethod
+    def _build_client(trust_env: bool) -> Client:
+        http_client = TwilioHttpClient(timeout=settings.http_timeout_seconds)
+        http_client.session = pooled_session(trust_env=trust_env)
+        return Client(
+            settings.twilio_account_sid,
+            settings.twilio_auth_token,
+            http_client=http_client,
+        )
+
     def _get_client(self, use_proxy: Optional[bool]) -> Client:
         if use_proxy is False:
             if self._client_no_proxy is None:
-                http_client = TwilioHttpClient()
-                if http_client.session is not None:
-                    http_client.session.trust_env = False
-                self._client_no_proxy = Client(
-                    settings.twilio_account_sid,
-                    settings.twilio_auth_token,
-                    http_client=http_client,
-                )
+                self._client_no_proxy = self._build_client(trust_env=False)
             return self._client_no_proxy
         return self._client
 
@@ -77,7 +80,7 @@ class TwilioService:
         if content_variables is not None:
             payload["content_variables"] = json.dumps(content_variables)
         client = self._get_client(use_proxy)
-        message = client.messages.create(**payload)
+        message = provider_guard("twilio", from_value).call(client.messages.create, **payload)
         return message.sid
 
     def send_sms(
@@ -95,15 +98,17 @@ class TwilioService:
         }
         if messaging_service_sid:
             payload["messaging_service_sid"] = messaging_service_sid
+            sender = messaging_service_sid
         else:
             from_value = from_number or self.sms_from_number()
             if not from_value:
                 raise RuntimeError("TWILIO_SMS_FROM is not configured")
             payload["from_"] = from_value
+            sender = from_value
         if status_callback:
             payload["status_callback"] = status_callback
         client = self._get_client(use_proxy)
-        message = client.messages.create(**payload)
+        message = provider_guard("twilio", sender).call(client.messages.create, **payload)
         return message.sid
 
     def fetch_message(self, message_sid: str, use_proxy: Optional[bool] = None) -> Any:
@@ -122,24 +127,19 @@ class TwilioService:
         query_params = {"PageSize": max(1, min(page_size, 200))}
         if page_token:
             query_params["PageToken"] = page_token
-        query = urlencode(query_params)
-        url = f"https://content.twilio.com/v1/Content?{query}"
-        auth_raw = f"{settings.twilio_account_sid}:{settings.twilio_auth_token}".encode("utf-8")
-        auth_value = base64.b64encode(auth_raw).decode("ascii")
-        request = Request(
-            url,
-            headers={
-                "Authorization": f"Basic {auth_value}",
-                "Accept": "application/json",
-            },
-            method="GET",
+        session = self._get_client(use_proxy).http_client.session
+        response = session.get(
+            "https://content.twilio.com/v1/Content",
+            params=query_params,
+            auth=(settings.twilio_account_sid, settings.twilio_auth_token),
+            headers={"Accept": "application/json"},
+            timeout=settings.http_timeout_seconds,
         )
-        if use_proxy is False:
-            opener = build_opener(ProxyHandler({}))
-            with opener.open(request, timeout=10) as response:
-                payload = response.read().decode("utf-8")
-        else:
-            with urlopen(request, timeout=10) as response:
-                payload = response.read().decode("utf-8")
-        data = json.loads(payload or "{}")
-        return data
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+
+@lru_cache(maxsize=1)
+def get_twilio_service() -> TwilioService:
+    """Process-wide ``TwilioService`` so connections are pooled across requests."""
+    return TwilioService()
@@ -0,0 +1,70 @@
+"""SMS encoding and segment counting, as carriers bill them.
+
+A body that fits the GSM 03.38 alphabet goes out as GSM-7: 160 septets in a
+single message, 153 per part once it needs a concatenation header, with the
+extension characters (``{}[]~|^\\€`` and form feed) taking two septets that are
+never split across parts. Anything else is UCS-2: 70 UTF-16 code units, 67 per
+part, and a surrogate pair is never split either. Results are cached per body,
+since a campaign renders the same text for most recipients.
+"""
+from functools import lru_cache
+from typing import Iterable, NamedTuple
+
+
+_CACHE_SIZE = 4096
+
+_GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+_GSM7_EXTENSION = frozenset("\f^{}\\[]~|€")
+_GSM7_CHARS = _GSM7_BASIC | _GSM7_EXTENSION
+
+GSM7 = "GSM-7"
+UCS2 = "UCS-2"
+
+# (single-message capacity, per-part capacity with a concatenation header)
+_CAPACITY = {GSM7: (160, 153), UCS2: (70, 67)}
+
+
+class SegmentInfo(NamedTuple):
+    encoding: str
+    # Septets for GSM-7, UTF-16 code units for UCS-2
+    units: int
+    segments: int
+
+
+def _pack(widths: Iterable[int], part_size: int) -> int:
+    """Parts needed for characters of ``widths`` when none may straddle two parts."""
+    parts = 1
+    used = 0
+    for width in widths:
+        if used + width > part_size:
+            parts += 1
+            used = 0
+        used += width
+    return parts
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def count_segments(body: str) -> SegmentInfo:
+    """Encoding, length and billable segments of an outgoing SMS ``body``."""
+    if not body:
+        return SegmentInfo(GSM7, 0, 0)
+    if _GSM7_CHARS.issuperset(body):
+        encoding = GSM7
+        wide = sum(body.count(char) for char in _GSM7_EXTENSION)
+    else:
+        encoding = UCS2
+        wide = sum(1 for char in body if ord(char) > 0xFFFF)
+    units = len(body) + wide
+    single, part_size = _CAPACITY[encoding]
+    if units <= single:
+        segments = 1
+    elif not wide:
+        segments = -(-units // part_size)
+    elif encoding == GSM7:
+        segments = _pack((2 if char in _GSM7_EXTENSION else 1 for char in body), part_size)
+    else:
+        segments = _pack((2 if ord(char) > 0xFFFF else 1 for char in body), part_size)
+    return SegmentInfo(encoding, units, segments)
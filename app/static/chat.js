@@ -28,7 +28,7 @@ const DISPLAY_TIME_ZONE = "Asia/Shanghai";
 const CHINA_UTC_OFFSET_MS = 8 * 60 * 60 * 1000;
 let currentUserAddress = "";
 let currentChannel = "";
-let currentOffset = 0;
+let currentCursor = null;
 let currentLimit = 50;
 let hasMore = false;
 let selectedMessageIds = new Set();
@@ -553,7 +553,7 @@ async function loadChatHistory(reset = true) {
   }
 
   if (reset) {
-    currentOffset = 0;
+    currentCursor = null;
     currentChannel = channelFilterEl.value;
   }
 
@@ -562,8 +562,10 @@ async function loadChatHistory(reset = true) {
   try {
     const params = new URLSearchParams({
       limit: currentLimit.toString(),
-      offset: currentOffset.toString(),
     });
+    if (currentCursor) {
+      params.set("cursor", currentCursor);
+    }
     if (currentChannel) {
       params.set("channel", currentChannel);
     }
@@ -580,7 +582,8 @@ async function loadChatHistory(reset = true) {
     renderMessages(data.messages || [], !reset);
     updateStats(data.total || 0, data.unread_count || 0);
 
-    hasMore = (data.messages || []).length === currentLimit;
+    currentCursor = data.next_cursor || null;
+    hasMore = Boolean(currentCursor);
     loadMoreBtn.style.display = hasMore ? "block" : "none";
 
     if (reset && (data.messages || []).length > 0) {
@@ -646,7 +649,6 @@ channelFilterEl.addEventListener("change", () => {
 markReadBtn.addEventListener("click", markMessagesRead);
 
 loadMoreBtn.addEventListener("click", () => {
-  currentOffset += currentLimit;
   loadChatHistory(false);
 });
 
@@ -686,6 +688,102 @@ userNextBtn.addEventListener("click", () => {
 // 初始加载用户列表
 loadUserList(true);
 
+// 实时事件：新消息、状态变化与已读由服务端推送，替代轮询
+const EVENTS_RECONNECT_MS = 3000;
+const EVENTS_REFRESH_DELAY_MS = 1000;
+let userListRefreshTimer = null;
+let chatHistoryRefreshTimer = null;
+
+function scheduleUserListRefresh() {
+  clearTimeout(userListRefreshTimer);
+  userListRefreshTimer = setTimeout(() => loadUserList(false), EVENTS_REFRESH_DELAY_MS);
+}
+
+function scheduleChatHistoryRefresh() {
+  if (!currentUserAddress) return;
+  clearTimeout(chatHistoryRefreshTimer);
+  chatHistoryRefreshTimer = setTimeout(() => loadChatHistory(true), EVENTS_REFRESH_DELAY_MS);
+}
+
+function handleServerEvent(type, data) {
+  if (type === "resync") {
+    scheduleUserListRefresh();
+    scheduleChatHistoryRefresh();
+  } else if (type === "message.created") {
+    scheduleUserListRefresh();
+    if (data.user_address === currentUserAddress) {
+      scheduleChatHistoryRefresh();
+    }
+  } else if (type === "message.status") {
+    const statusSpan = document.querySelector(
+      `tr[data-message-id="${data.id}"] .message-status`
+    );
+    if (statusSpan) {
+      statusSpan.className = `message-status ${getStatusClass(data.status)}`;
+      statusSpan.textContent = formatStatus(data.status);
+    }
+  } else if (type === "messages.read") {
+    (data.ids || []).forEach((id) => {
+      const messageRow = document.querySelector(`tr[data-message-id="${id}"]`);
+      if (messageRow) {
+        messageRow.classList.remove("unread");
+      }
+    });
+    scheduleUserListRefresh();
+  }
+}
+
+function dispatchServerEvent(chunk) {
+  let type = "message";
+  const dataLines = [];
+  chunk.split("\n").forEach((line) => {
+    if (line.startsWith("event:")) {
+      type = line.slice(6).trim();
+    } else if (line.startsWith("data:")) {
+      dataLines.push(line.slice(5).trim());
+    }
+  });
+  if (!dataLines.length) return;
+  try {
+    handleServerEvent(type, JSON.parse(dataLines.join("\n")));
+  } catch (error) {
+    console.error("事件解析失败", error);
+  }
+}
+
+// EventSource 无法携带 X-API-Key，这里用 fetch 读取 SSE 流
+async function connectEvents() {
+  if (!getStoredApiKey()) return;
+  try {
+    const response = await apiFetch("api/events", {
+      headers: { Accept: "text/event-stream" },
+    });
+    if (response.status === 401) return;
+    if (!response.ok || !response.body) {
+      throw new Error(`事件流连接失败: ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary = buffer.indexOf("\n\n");
+      while (boundary >= 0) {
+        dispatchServerEvent(buffer.slice(0, boundary));
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf("\n\n");
+      }
+    }
+  } catch (error) {
+    console.error(error);
+  }
+  setTimeout(connectEvents, EVENTS_RECONNECT_MS);
+}
+
+connectEvents();
+
 // 弹窗关闭事件
 modalCloseBtn.addEventListener("click", () => {
   messageModalEl.style.display = "none";
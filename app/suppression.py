@@ -0,0 +1,84 @@
+"""In-memory SMS suppression index over the opt-out and blacklist tables."""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import SmsBlacklist, SmsOptOut
+
+
+logger = logging.getLogger(__name__)
+
+_LOAD_CHUNK = 5000
+
+Version = Tuple[Tuple[int, Optional[int]], Tuple[int, Optional[int]]]
+
+
+class SuppressionIndex:
+    """Phone -> reason map for every suppressed number, shared by the process.
+
+    Writes through the API and the inbound STOP handler call ``invalidate``.
+    Rows written by other processes are picked up by a ``COUNT``/``MAX(id)``
+    probe of both tables, run at most every ``SMS_SUPPRESSION_CHECK_SECONDS``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reasons: Dict[str, str] = {}
+        self._version: Optional[Version] = None
+        self._checked_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+
+    @staticmethod
+    def _probe(db: Session) -> Version:
+        opt_outs = db.query(func.count(SmsOptOut.id), func.max(SmsOptOut.id)).one()
+        blacklist = db.query(func.count(SmsBlacklist.id), func.max(SmsBlacklist.id)).one()
+        return (tuple(opt_outs), tuple(blacklist))
+
+    def _load(self, db: Session) -> Dict[str, str]:
+        reasons: Dict[str, str] = {}
+        for (phone,) in db.query(SmsOptOut.phone).yield_per(_LOAD_CHUNK):
+            reasons[phone] = "opt_out"
+        # Blacklist wins over opt-out, as in ``is_opted_out``.
+        for (phone,) in db.query(SmsBlacklist.phone).yield_per(_LOAD_CHUNK):
+            reasons[phone] = "blacklist"
+        return reasons
+
+    def _refresh(self, db: Session) -> Dict[str, str]:
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._version is not None
+                and now - self._checked_at < settings.sms_suppression_check_seconds
+            ):
+                return self._reasons
+            version = self._probe(db)
+            if version != self._version:
+                self._reasons = self._load(db)
+                self._version = version
+                logger.info("loaded %d suppressed sms numbers", len(self._reasons))
+            self._checked_at = now
+            return self._reasons
+
+    def filter_suppressed(self, db: Session, phones: Iterable[str]) -> Dict[str, str]:
+        """Map each suppressed phone in ``phones`` to ``"blacklist"`` or ``"opt_out"``."""
+        reasons = self._refresh(db)
+        return {phone: reasons[phone] for phone in set(phones) if phone in reasons}
+
+
+suppression_index = SuppressionIndex()
+
+
+def filter_suppressed(db: Session, phones: Iterable[str]) -> Dict[str, str]:
+    return suppression_index.filter_suppressed(db, phones)
+
+
+def invalidate_suppression_index() -> None:
+    suppression_index.invalidate()
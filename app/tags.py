@@ -0,0 +1,175 @@
+"""Normalized tag index for customers and SMS contacts.
+
+``customers.tags`` and ``sms_contacts.tags`` keep the serialized list that the
+API returns; ``customer_tags`` and ``sms_contact_tags`` hold one row per
+(entity, lower-cased tag) with a ``(tag_lower, <entity>_id)`` index, which every
+tag filter, count, rename and delete goes through. Write paths assign tags with
+``set_tags`` so both stay in step.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Customer, CustomerTag, SmsContact, SmsContactTag
+from app.utils import deserialize_tags, serialize_tags
+
+
+TAG_LENGTH = 255
+
+_CHUNK = 1000
+
+# Tagged model -> (index model, index column holding the entity id)
+_INDEXES = {
+    Customer: (CustomerTag, CustomerTag.customer_id),
+    SmsContact: (SmsContactTag, SmsContactTag.contact_id),
+}
+
+
+def _index_for(model: Any) -> Tuple[Any, Any]:
+    return _INDEXES[model]
+
+
+def _lowered(tags: Iterable[str]) -> Set[str]:
+    return {tag.strip()[:TAG_LENGTH].lower() for tag in tags if tag and tag.strip()}
+
+
+def _index_rows(column: Any, entity_id: int, tags: Iterable[str]) -> List[Dict[str, Any]]:
+    rows: Dict[str, Dict[str, Any]] = {}
+    for tag in tags:
+        value = tag.strip()[:TAG_LENGTH]
+        if value and value.lower() not in rows:
+            rows[value.lower()] = {column.key: entity_id, "tag": value, "tag_lower": value.lower()}
+    return list(rows.values())
+
+
+def _chunks(values: Sequence[Any]) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(values), _CHUNK):
+        yield values[start : start + _CHUNK]
+
+
+def set_tags(db: Session, entity: Any, tags: Optional[List[str]]) -> None:
+    """Assign ``tags`` to a customer or SMS contact; flushes new entities for their id."""
+    entity.tags = serialize_tags(tags)
+    if entity.id is None:
+        db.add(entity)
+        db.flush()
+    tag_model, column = _index_for(type(entity))
+    db.query(tag_model).filter(column == entity.id).delete(synchronize_session=False)
+    rows = _index_rows(column, entity.id, deserialize_tags(entity.tags))
+    if rows:
+        db.execute(tag_model.__table__.insert(), rows)
+
+
+def clear_tags(db: Session, model: Any, entity_ids: Sequence[int]) -> None:
+    """Drop the index rows of deleted entities; the caller commits."""
+    tag_model, column = _index_for(model)
+    for chunk in _chunks(list(entity_ids)):
+        db.query(tag_model).filter(column.in_(chunk)).delete(synchronize_session=False)
+
+
+def has_any_tag(model: Any, tags: Iterable[str]) -> Optional[Any]:
+    """Filter clause for ``model`` rows carrying any of ``tags``; ``None`` without tags."""
+    lowered = _lowered(tags)
+    if not lowered:
+        return None
+    tag_model, column = _index_for(model)
+    return model.id.in_(select(column).where(tag_model.tag_lower.in_(lowered)))
+
+
+def tagged_ids(db: Session, model: Any, tags: Iterable[str]) -> Set[int]:
+    """Ids of ``model`` rows carrying any of ``tags``."""
+    lowered = _lowered(tags)
+    if not lowered:
+        return set()
+    tag_model, column = _index_for(model)
+    return {row[0] for row in db.query(column).filter(tag_model.tag_lower.in_(lowered))}
+
+
+def tag_counts(db: Session, model: Any) -> List[Tuple[str, int]]:
+    """Every tag in use with the number of entities carrying it, most used first."""
+    tag_model, column = _index_for(model)
+    rows = (
+        db.query(func.min(tag_model.tag), func.count(column))
+        .group_by(tag_model.tag_lower)
+        .all()
+    )
+    return sorted(((tag, count) for tag, count in rows), key=lambda row: (-row[1], row[0].lower()))
+
+
+def _sync_serialized(db: Session, model: Any, entity_ids: Sequence[int], now: datetime) -> None:
+    tag_model, column = _index_for(model)
+    tags: Dict[int, List[str]] = defaultdict(list)
+    for chunk in _chunks(list(entity_ids)):
+        for entity_id, tag in db.query(column, tag_model.tag).filter(column.in_(chunk)):
+            tags[entity_id].append(tag)
+    table = model.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(tags=bindparam("b_tags"), updated_at=now),
+        [{"b_id": entity_id, "b_tags": serialize_tags(tags.get(entity_id))} for entity_id in entity_ids],
+    )
+
+
+def _ids_with_tag(db: Session, model: Any, tag_lower: str) -> List[int]:
+    tag_model, column = _index_for(model)
+    return [row[0] for row in db.query(column).filter(tag_model.tag_lower == tag_lower)]
+
+
+def rename_tag(db: Session, model: Any, from_tag: str, to_tag: str) -> int:
+    """Rename ``from_tag`` (case-insensitively) on every entity; returns how many changed."""
+    tag_model, column = _index_for(model)
+    from_lower = from_tag.strip()[:TAG_LENGTH].lower()
+    to_value = to_tag.strip()[:TAG_LENGTH]
+    entity_ids = _ids_with_tag(db, model, from_lower)
+    if not entity_ids:
+        return 0
+    # Entities that already carry the new tag only lose the old one.
+    both = [
+        row[0]
+        for row in db.query(column)
+        .filter(tag_model.tag_lower.in_([from_lower, to_value.lower()]))
+        .group_by(column)
+        .having(func.count(column) > 1)
+    ]
+    for chunk in _chunks(both):
+        db.query(tag_model).filter(
+            tag_model.tag_lower == from_lower, column.in_(chunk)
+        ).delete(synchronize_session=False)
+    db.execute(
+        update(tag_model.__table__)
+        .where(tag_model.__table__.c.tag_lower == from_lower)
+        .values(tag=to_value, tag_lower=to_value.lower())
+    )
+    _sync_serialized(db, model, entity_ids, datetime.utcnow())
+    return len(entity_ids)
+
+
+def remove_tag(db: Session, model: Any, tag: str) -> int:
+    """Remove ``tag`` (case-insensitively) from every entity; returns how many changed."""
+    tag_model, _ = _index_for(model)
+    tag_lower = tag.strip()[:TAG_LENGTH].lower()
+    entity_ids = _ids_with_tag(db, model, tag_lower)
+    if not entity_ids:
+        return 0
+    db.query(tag_model).filter(tag_model.tag_lower == tag_lower).delete(synchronize_session=False)
+    _sync_serialized(db, model, entity_ids, datetime.utcnow())
+    return len(entity_ids)
+
+
+def rebuild_tag_index(db: Session) -> int:
+    """Recompute every tag index from the serialized columns; returns the row count."""
+    total = 0
+    for model, (tag_model, column) in _INDEXES.items():
+        db.query(tag_model).delete(synchronize_session=False)
+        rows: List[Dict[str, Any]] = []
+        for entity_id, value in db.query(model.id, model.tags).filter(model.tags.isnot(None)):
+            rows.extend(_index_rows(column, entity_id, deserialize_tags(value)))
+        for chunk in _chunks(rows):
+            db.execute(tag_model.__table__.insert(), list(chunk))
+        total += len(rows)
+    db.commit()
+    return total
@@ -0,0 +1,124 @@
+"""Templates parsed once into literal text and placeholders, rendered by ``join``.
+
+Two placeholder syntaxes are in use: marketing and message templates write
+``{{ key }}`` and leave unknown keys untouched; SMS bodies are ``str.format``
+strings (``{key}``, with optional ``!conversion`` and ``:spec``) that also
+leave unknown keys as ``{key}``. ``compile_message_template`` and
+``compile_sms_template`` parse each template text once (LRU-cached), and
+``render_many`` renders one template for a whole batch of contexts.
+"""
+from functools import lru_cache
+import re
+from string import Formatter
+from typing import Any, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+
+_CACHE_SIZE = 512
+
+_PLACEHOLDER_PATTERN = re.compile(r"{{\s*([a-zA-Z0-9_.-]+)\s*}}")
+_FORMAT_KEY_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+_MISSING = object()
+
+
+class _Field(NamedTuple):
+    key: str
+    # Emitted as-is when the key is missing (or ``None``, for message templates)
+    missing: str
+    conversion: Optional[str] = None
+    spec: str = ""
+
+
+class CompiledTemplate:
+    """A parsed template: ``literals`` interleaved with ``fields``, one more literal than fields."""
+
+    __slots__ = ("_literals", "_fields", "_formatted")
+
+    def __init__(self, literals: List[str], fields: List[_Field], formatted: bool) -> None:
+        self._literals = literals
+        self._fields = list(zip(fields, literals[1:]))
+        self._formatted = formatted
+
+    @property
+    def keys(self) -> Tuple[str, ...]:
+        return tuple(field.key for field, _ in self._fields)
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        if not self._fields:
+            return self._literals[0]
+        parts = [self._literals[0]]
+        append = parts.append
+        if self._formatted:
+            for field, literal in self._fields:
+                value = context.get(field.key, _MISSING)
+                value = field.missing if value is _MISSING else str(value)
+                if field.conversion == "r":
+                    value = repr(value)
+                elif field.conversion == "a":
+                    value = ascii(value)
+                append(format(value, field.spec) if field.spec else value)
+                append(literal)
+        else:
+            for field, literal in self._fields:
+                value = context.get(field.key)
+                append(field.missing if value is None else str(value))
+                append(literal)
+        return "".join(parts)
+
+    def render_many(self, contexts: Iterable[Mapping[str, Any]]) -> List[str]:
+        """Render for every context in ``contexts``, in order."""
+        if not self._fields:
+            text = self._literals[0]
+            return [text for _ in contexts]
+        render = self.render
+        return [render(context) for context in contexts]
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def compile_message_template(template: str) -> CompiledTemplate:
+    """Parse a ``{{ key }}`` template."""
+    literals: List[str] = []
+    fields: List[_Field] = []
+    position = 0
+    for match in _PLACEHOLDER_PATTERN.finditer(template):
+        literals.append(template[position:match.start()])
+        fields.append(_Field(key=match.group(1), missing=match.group(0)))
+        position = match.end()
+    literals.append(template[position:])
+    return CompiledTemplate(literals, fields, formatted=False)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def compile_sms_template(template: str) -> Optional[CompiledTemplate]:
+    """Parse a ``str.format`` template; ``None`` if it needs ``str.format`` itself.
+
+    That is the case for malformed braces and for positional, attribute, index
+    or nested-spec fields, which only ``format_map`` renders faithfully.
+    """
+    literals: List[str] = []
+    fields: List[_Field] = []
+    pending = ""
+    try:
+        parsed = list(Formatter().parse(template))
+    except ValueError:
+        return None
+    for literal, key, spec, conversion in parsed:
+        pending += literal
+        if key is None:
+            continue
+        if not _FORMAT_KEY_PATTERN.fullmatch(key) or "{" in (spec or ""):
+            return None
+        if conversion not in (None, "s", "r", "a"):
+            return None
+        literals.append(pending)
+        pending = ""
+        fields.append(
+            _Field(
+                key=key,
+                missing=f"{{{key}}}",
+                conversion=conversion if conversion in ("r", "a") else None,
+                spec=spec or "",
+            )
+        )
+    literals.append(pending)
+    return CompiledTemplate(literals, fields, formatted=True)
@@ -5,7 +5,7 @@ import json
 import posixpath
 import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from fastapi import HTTPException, Request
 from sqlalchemy.orm import Session
@@ -13,13 +13,13 @@ from sqlalchemy.orm import Session
 from app.config import settings
 from app.models import (
     Customer,
-    SmsBlacklist,
     SmsContact,
     SmsGroupMember,
     SmsKeywordRule,
-    SmsOptOut,
 )
 from app.services.twilio_client import normalize_whatsapp
+from app.suppression import filter_suppressed
+from app.templating import compile_message_template, compile_sms_template
 
 
 # URL utilities
@@ -192,21 +192,10 @@ def require_customer_contact(
 
 
 # Template rendering
-_PLACEHOLDER_PATTERN = re.compile(r"{{\s*([a-zA-Z0-9_.-]+)\s*}}")
-
-
 def render_message_template(template: str, context: Dict[str, Any]) -> str:
     if not template:
         return template
-
-    def replace(match: re.Match) -> str:
-        key = match.group(1)
-        value = context.get(key)
-        if value is None:
-            return match.group(0)
-        return str(value)
-
-    return _PLACEHOLDER_PATTERN.sub(replace, template)
+    return compile_message_template(template).render(context)
 
 
 class _SafeFormatDict(dict):
@@ -217,10 +206,25 @@ class _SafeFormatDict(dict):
 def render_sms_body(template: str, variables: Optional[Dict[str, Any]]) -> str:
     if not variables:
         return template
+    compiled = compile_sms_template(template)
+    if compiled is not None:
+        return compiled.render(variables)
     safe_vars = {str(key): str(value) for key, value in variables.items()}
     return template.format_map(_SafeFormatDict(safe_vars))
 
 
+def render_sms_bodies(
+    template: str, variables_list: List[Optional[Dict[str, Any]]]
+) -> List[str]:
+    """``render_sms_body`` for a batch of recipients, parsing ``template`` once."""
+    compiled = compile_sms_template(template)
+    if compiled is None:
+        return [render_sms_body(template, variables) for variables in variables_list]
+    return [
+        compiled.render(variables) if variables else template for variables in variables_list
+    ]
+
+
 # SMS utilities
 def append_opt_out_text(body: str, append_opt_out: bool) -> str:
     if not append_opt_out:
@@ -243,11 +247,12 @@ def build_sms_status_callback(message_id: int) -> Optional[str]:
 
 
 def is_opted_out(db: Session, phone: str) -> Optional[str]:
-    if db.query(SmsBlacklist).filter(SmsBlacklist.phone == phone).first():
-        return "blacklist"
-    if db.query(SmsOptOut).filter(SmsOptOut.phone == phone).first():
-        return "opt_out"
-    return None
+    return filter_suppressed(db, [phone]).get(phone)
+
+
+def opted_out_reasons(db: Session, phones: Iterable[str]) -> Dict[str, str]:
+    """Bulk form of ``is_opted_out``: maps each blocked phone to its reason."""
+    return filter_suppressed(db, (phone for phone in phones if phone))
 
 
 def match_keyword(rule: SmsKeywordRule, text: str) -> bool:
@@ -282,20 +287,26 @@ def collect_sms_recipients(
             db.query(SmsContact)
             .join(SmsGroupMember, SmsGroupMember.contact_id == SmsContact.id)
             .filter(SmsGroupMember.group_id.in_(group_ids), SmsContact.disabled_at.is_(None))
+            .order_by(SmsContact.id)
             .all()
         )
         for contact in members:
             phones.append(contact.phone)
             contact_map[contact.phone] = contact
     if tags:
-        tag_set = {tag.strip().lower() for tag in tags if tag and tag.strip()}
-        if tag_set:
-            contacts = db.query(SmsContact).filter(SmsContact.disabled_at.is_(None)).all()
+        from app.tags import has_any_tag
+
+        tag_filter = has_any_tag(SmsContact, tags)
+        if tag_filter is not None:
+            contacts = (
+                db.query(SmsContact)
+                .filter(tag_filter, SmsContact.disabled_at.is_(None))
+                .order_by(SmsContact.id)
+                .all()
+            )
             for contact in contacts:
-                contact_tags = {tag.lower() for tag in deserialize_tags(contact.tags)}
-                if contact_tags.intersection(tag_set):
-                    phones.append(contact.phone)
-                    contact_map[contact.phone] = contact
+                phones.append(contact.phone)
+                contact_map[contact.phone] = contact
     unique = []
     seen = set()
     for phone in phones:
@@ -318,51 +329,6 @@ def parse_rule_tags(value: Any) -> List[str]:
     return []
 
 
-def filter_customers_by_rules(
-    customers: List[Customer], rules: Optional[Dict[str, Any]]
-) -> List[Customer]:
-    if not rules:
-        return customers
-    country = str(rules.get("country") or "").strip().lower()
-    country_code = str(rules.get("country_code") or "").strip().lower()
-    has_marketed = rules.get("has_marketed")
-    tag_list = parse_rule_tags(rules.get("tags") or rules.get("tag"))
-    tag_set = {tag.lower() for tag in tag_list if tag}
-    last_email_status = str(rules.get("last_email_status") or "").strip().lower()
-    last_whatsapp_status = str(rules.get("last_whatsapp_status") or "").strip().lower()
-    last_sms_status = str(rules.get("last_sms_status") or "").strip().lower()
-    email_value = normalize_customer_email(rules.get("email"))
-    whatsapp_value = normalize_customer_whatsapp(rules.get("whatsapp"))
-    mobile_value = normalize_customer_mobile(rules.get("mobile"))
-
-    filtered: List[Customer] = []
-    for customer in customers:
-        if country and (customer.country or "").strip().lower() != country:
-            continue
-        if country_code and (customer.country_code or "").strip().lower() != country_code:
-            continue
-        if has_marketed is not None and bool(customer.has_marketed) != bool(has_marketed):
-            continue
-        if last_email_status and (customer.last_email_status or "").strip().lower() != last_email_status:
-            continue
-        if last_whatsapp_status and (customer.last_whatsapp_status or "").strip().lower() != last_whatsapp_status:
-            continue
-        if last_sms_status and (customer.last_sms_status or "").strip().lower() != last_sms_status:
-            continue
-        if email_value and (customer.email or "").strip().lower() != email_value:
-            continue
-        if whatsapp_value and (customer.whatsapp or "").strip().lower() != whatsapp_value:
-            continue
-        if mobile_value and (customer.mobile or "").strip().lower() != mobile_value:
-            continue
-        if tag_set:
-            customer_tags = {tag.lower() for tag in deserialize_tags(customer.tags)}
-            if not customer_tags.intersection(tag_set):
-                continue
-        filtered.append(customer)
-    return filtered
-
-
 def build_customer_context(customer: Customer) -> Dict[str, Any]:
     return {
         "id": customer.id,